@@ -0,0 +1,124 @@
+"""
+HTTP сервер для Flask API.
+
+Режимы (API_SERVER):
+- waitress — production WSGI сервер: пул потоков фиксированного размера,
+  лимит соединений, таймауты, keep-alive. Работает в том же процессе, что
+  и MQTT consumer, поэтому разделяет с ним WiFiDataStorage (gunicorn с
+  отдельными процессами-воркерами для этого не подходит)
+- werkzeug — встроенный сервер разработки Flask (поток на запрос)
+- auto — waitress, если установлен, иначе werkzeug
+"""
+import logging
+import threading
+from typing import Optional
+
+from flask import Flask
+
+logger = logging.getLogger("api_server")
+
+SERVER_MODES = ("auto", "waitress", "werkzeug")
+
+
+class APIServer:
+    """Обёртка над WSGI сервером: единый интерфейс run()/close() для обоих режимов"""
+
+    def __init__(
+        self,
+        app: Flask,
+        host: str,
+        port: int,
+        mode: str = "auto",
+        threads: int = 8,
+        connection_limit: int = 100,
+        channel_timeout: int = 120,
+    ):
+        """
+        Args:
+            app: Flask приложение
+            host: Адрес для прослушивания
+            port: Порт (0 — свободный порт, см. self.port после создания)
+            mode: auto | waitress | werkzeug
+            threads: Потоков обработки запросов (waitress)
+            connection_limit: Максимум одновременных соединений (waitress)
+            channel_timeout: Таймаут неактивного соединения, сек (waitress)
+        """
+        if mode not in SERVER_MODES:
+            raise ValueError(f"Неизвестный режим сервера: {mode} (допустимо: {', '.join(SERVER_MODES)})")
+
+        self.mode = mode
+        if mode in ("auto", "waitress"):
+            try:
+                import waitress  # noqa: F401
+                self.mode = "waitress"
+            except ImportError:
+                if mode == "waitress":
+                    raise
+                logger.warning("waitress не установлен — используется сервер разработки werkzeug")
+                self.mode = "werkzeug"
+
+        if self.mode == "waitress":
+            from waitress import create_server
+            self._server = create_server(
+                app,
+                host=host,
+                port=port,
+                threads=threads,
+                connection_limit=connection_limit,
+                channel_timeout=channel_timeout,
+                ident=None,
+            )
+            self.port: int = self._server.effective_port
+        else:
+            from werkzeug.serving import make_server
+            self._server = make_server(host, port, app, threaded=True)
+            self.port = self._server.server_port
+
+        self.host = host
+        self.threads: Optional[int] = threads if self.mode == "waitress" else None
+        # Цикл waitress запущен / завершён (close() ждёт выхода из него)
+        self._running = threading.Event()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        """Обработка запросов (блокирующий вызов — запускать в отдельном потоке)"""
+        if self.mode == "waitress":
+            self._running.set()
+            try:
+                self._server.run()
+            finally:
+                self._stopped.set()
+        else:
+            self._server.serve_forever()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        Остановка сервера
+
+        waitress: сначала останавливаются потоки обработки (текущие запросы
+        дорабатывают), затем сокеты закрываются внутри цикла select() через
+        trigger — закрытие из чужого потока, пока цикл ждёт на этих сокетах,
+        роняет его и потоки задач с EBADF на открытых keep-alive соединениях.
+
+        Args:
+            timeout: Ожидание завершения цикла waitress, сек
+        """
+        if self.mode != "waitress":
+            self._server.shutdown()
+            return
+
+        from waitress import wasyncore
+
+        server = self._server
+        server.task_dispatcher.shutdown()
+        if not self._running.is_set() or self._stopped.is_set():
+            wasyncore.close_all(server._map)
+            return
+        server.trigger.pull_trigger(lambda: wasyncore.close_all(server._map))
+        if not self._stopped.wait(timeout):
+            logger.warning("Цикл waitress не завершился за %.0f с", timeout)
+
+    def describe(self) -> str:
+        if self.mode == "waitress":
+            return f"waitress ({self.threads} потоков) на http://{self.host}:{self.port}"
+        return f"werkzeug (dev) на http://{self.host}:{self.port}"
@@ -0,0 +1,374 @@
+"""
+Массовый импорт (backfill) записанных MQTT payload в WiFiDataStorage.
+
+Парсинг и классификация (_parse_data/_enrich_devices) выполняются в пуле
+процессов (ProcessPoolExecutor) — это CPU-работа, которая в одном процессе
+упирается в GIL. Воркеры один раз загружают OUI базу и кеш классификации,
+а результаты возвращают пачками в компактном виде (массивы array + таблица
+строк вместо списков словарей), чтобы IPC оставался дешёвым.
+Применение к хранилищу — в главном процессе, строго в порядке входных батчей.
+
+Импорт пишет только в хранилище: кластеризация рандомных MAC
+(mac_clustering) и учёт свежести по сенсорам (freshness) — часть онлайн
+приёма MQTTConsumer и для записанных данных не выполняются.
+
+Формат входа: по одному payload на строку (формат A или B, как в MQTT),
+например вывод `mosquitto_sub -t wifi/probes > capture.ndjson`.
+
+Запуск:
+  python bulk_import.py capture.ndjson --workers 4
+  python bulk_import.py capture.ndjson --scaling           # пропускная способность 1..N ядер
+  python bulk_import.py --synthetic 2000 --scaling         # без записанных данных
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from config import CLASSIFICATION_CACHE_PATH, ENABLE_DEVICE_FILTERING
+from storage import WiFiDataStorage
+
+logger = logging.getLogger("bulk_import")
+
+# Кол-во payload (батчей) в одной задаче для воркера
+DEFAULT_CHUNK_SIZE = 64
+
+
+@dataclass
+class EnrichedChunk:
+    """
+    Обогащённые батчи одной задачи в колоночном виде.
+
+    Устройства всех батчей идут подряд; батч i занимает
+    [offsets[i], offsets[i + 1]). Пустой батч (в т.ч. ошибка JSON) —
+    пустой диапазон: к хранилищу он применяется как add_data([]).
+    vendor/device_type/device_brand — индексы в strings (0 — None).
+    """
+    offsets: array  # 'I', len = батчей + 1
+    macs: List[str]
+    rssi: array  # 'h'
+    ts: array  # 'q'
+    randomized: array  # 'b'
+    vendor: array  # 'H'
+    device_type: array  # 'H'
+    device_brand: array  # 'H'
+    strings: List[Optional[str]]
+
+    @property
+    def batches(self) -> int:
+        return len(self.offsets) - 1
+
+    def iter_batches(self) -> Iterator[List[Dict]]:
+        """Восстановление батчей в формате add_data()"""
+        strings = self.strings
+        for i in range(self.batches):
+            batch = []
+            for j in range(self.offsets[i], self.offsets[i + 1]):
+                batch.append({
+                    "m": self.macs[j],
+                    "r": self.rssi[j],
+                    "t": self.ts[j],
+                    "vendor": strings[self.vendor[j]],
+                    "device_type": strings[self.device_type[j]],
+                    "device_brand": strings[self.device_brand[j]],
+                    "randomized": bool(self.randomized[j]),
+                })
+            yield batch
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Воркер
+# ──────────────────────────────────────────────────────────────────────
+
+def _init_worker(oui_db_path: Optional[str], cache_path: Optional[str]) -> None:
+    """Однократная загрузка OUI базы и кеша классификации в процессе-воркере."""
+    from device_classifier import configure_classification_cache, configure_oui_database, _get_mac_lookup
+
+    # После fork унаследованный event loop родителя непригоден для
+    # MacLookup (run_until_complete зависает) — свой loop и свой singleton
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    configure_oui_database(oui_db_path or os.getenv("OUI_DB_PATH"))
+    configure_classification_cache(cache_path)
+    lookup = _get_mac_lookup()
+    if lookup is not None:
+        try:
+            lookup.load_vendors()
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить OUI базу в воркере: {e}")
+
+
+def _clamp_rssi(value: int) -> int:
+    return max(-32768, min(32767, value))
+
+
+def enrich_chunk(lines: List[str]) -> EnrichedChunk:
+    """Парсинг + классификация пачки payload → EnrichedChunk"""
+    from mqtt_consumer import MQTTConsumer
+
+    offsets = array('I', [0])
+    macs: List[str] = []
+    rssi, ts, randomized = array('h'), array('q'), array('b')
+    vendor, device_type, device_brand = array('H'), array('H'), array('H')
+    strings: List[Optional[str]] = [None]
+    string_index: Dict[Optional[str], int] = {None: 0}
+
+    def intern(value: Optional[str]) -> int:
+        idx = string_index.get(value)
+        if idx is None:
+            idx = string_index[value] = len(strings)
+            strings.append(value)
+        return idx
+
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                devices = MQTTConsumer._enrich_devices(MQTTConsumer._parse_data(json.loads(line)))
+            except json.JSONDecodeError:
+                devices = []
+            if ENABLE_DEVICE_FILTERING:
+                devices = MQTTConsumer._filter_devices(devices)
+            for d in devices:
+                macs.append(d["m"])
+                rssi.append(_clamp_rssi(d["r"]))
+                ts.append(d["t"])
+                randomized.append(1 if d["randomized"] else 0)
+                vendor.append(intern(d["vendor"]))
+                device_type.append(intern(d["device_type"]))
+                device_brand.append(intern(d["device_brand"]))
+        offsets.append(len(macs))
+
+    return EnrichedChunk(offsets, macs, rssi, ts, randomized, vendor, device_type, device_brand, strings)
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Импорт
+# ──────────────────────────────────────────────────────────────────────
+
+def _chunked(lines: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ordered_results(executor: ProcessPoolExecutor, chunks: Iterator[List[str]], window: int) -> Iterator[EnrichedChunk]:
+    """
+    Результаты воркеров в порядке входа. В полёте не более window задач —
+    вход любого размера не вычитывается в память целиком.
+    """
+    in_flight: "deque[Future]" = deque()
+    for chunk in chunks:
+        in_flight.append(executor.submit(enrich_chunk, chunk))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def iter_enriched(
+    lines: Iterable[str],
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    oui_db_path: Optional[str] = None,
+    cache_path: Optional[str] = CLASSIFICATION_CACHE_PATH,
+) -> Iterator[EnrichedChunk]:
+    """
+    Обогащённые пачки в порядке входа (фаза пула, без хранилища).
+
+    Args:
+        workers: Кол-во процессов (0 — без пула, в текущем процессе)
+        остальные — как у bulk_import()
+    """
+    if workers <= 0:
+        _init_worker(oui_db_path, cache_path)
+        yield from map(enrich_chunk, _chunked(lines, chunk_size))
+        return
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(oui_db_path, cache_path),
+    )
+    try:
+        yield from _ordered_results(executor, _chunked(lines, chunk_size), window=workers * 2)
+    finally:
+        executor.shutdown()
+
+
+def bulk_import(
+    lines: Iterable[str],
+    storage: WiFiDataStorage,
+    workers: int = os.cpu_count() or 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    oui_db_path: Optional[str] = None,
+    cache_path: Optional[str] = CLASSIFICATION_CACHE_PATH,
+) -> Dict:
+    """
+    Импорт payload в хранилище.
+
+    Args:
+        lines: Payload по одному на строку (в порядке поступления)
+        storage: Хранилище, в которое применяются батчи
+        workers: Кол-во процессов (0 — без пула, в текущем процессе)
+        chunk_size: Батчей в одной задаче воркера
+        oui_db_path: Файл OUI базы для воркеров (None — по умолчанию)
+        cache_path: SQLite кеш классификации (общий для воркеров)
+
+    Returns:
+        {"workers", "batches", "devices", "elapsed_sec", "apply_sec",
+         "batches_per_sec", "devices_per_sec"}; apply_sec — время add_data()
+        в главном процессе (однопоточная фаза)
+    """
+    batches = devices = 0
+    apply_sec = 0.0
+    t0 = time.perf_counter()
+
+    for chunk in iter_enriched(lines, workers, chunk_size, oui_db_path, cache_path):
+        for batch in chunk.iter_batches():
+            t_apply = time.perf_counter()
+            storage.add_data(batch)
+            apply_sec += time.perf_counter() - t_apply
+            batches += 1
+            devices += len(batch)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "workers": workers,
+        "batches": batches,
+        "devices": devices,
+        "elapsed_sec": elapsed,
+        "apply_sec": apply_sec,
+        "batches_per_sec": batches / elapsed if elapsed > 0 else 0.0,
+        "devices_per_sec": devices / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def measure_enrich(
+    lines: List[str],
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    oui_db_path: Optional[str] = None,
+) -> Dict:
+    """
+    Пропускная способность фазы пула (разбор + классификация) без применения
+    к хранилищу. Запуск воркеров и загрузка OUI базы в них — до замера
+    (startup_sec), в devices_per_sec не входят.
+    """
+    devices = 0
+    t0 = time.perf_counter()
+    if workers <= 0:
+        _init_worker(oui_db_path, None)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(oui_db_path, None))
+        for future in [executor.submit(enrich_chunk, []) for _ in range(workers)]:
+            future.result()
+    startup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    try:
+        if executor is None:
+            chunks = map(enrich_chunk, _chunked(lines, chunk_size))
+        else:
+            chunks = _ordered_results(executor, _chunked(lines, chunk_size), window=workers * 2)
+        for chunk in chunks:
+            devices += len(chunk.macs)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - t0
+    return {"workers": workers, "devices": devices, "elapsed_sec": elapsed, "startup_sec": startup,
+            "devices_per_sec": devices / elapsed if elapsed > 0 else 0.0}
+
+
+def synthetic_payloads(batches: int, devices_per_batch: int = 200, seed: int = 1) -> List[str]:
+    """Синтетические payload формата B (scanner.sh) для замеров без записи."""
+    rng = random.Random(seed)
+    start_ts = int(time.time()) - batches * 600
+    lines = []
+    for i in range(batches):
+        devices = []
+        for _ in range(devices_per_batch):
+            first = rng.randrange(256) & 0xFE
+            mac = ":".join(f"{o:02x}" for o in [first] + [rng.randrange(256) for _ in range(5)])
+            devices.append({"m": mac, "r": -rng.randint(30, 95), "x": (first >> 1) & 1})
+        lines.append(json.dumps({"t": start_ts + i * 600, "d": devices, "c": len(devices)}))
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Массовый импорт записанных MQTT payload")
+    parser.add_argument("files", nargs="*", help="Файлы с payload (по одному JSON на строку)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Кол-во процессов (0 — без пула)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--oui", default=os.getenv("OUI_DB_PATH"), help="Файл OUI базы")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Сгенерировать N синтетических батчей вместо файлов")
+    parser.add_argument("--scaling", action="store_true",
+                        help="Замер пропускной способности для 1..--workers процессов")
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        lines = synthetic_payloads(args.synthetic)
+    else:
+        lines = []
+        for path in args.files:
+            with open(path, encoding='utf-8') as f:
+                lines.extend(f)
+    if not lines:
+        parser.error("нет входных данных (укажите файлы или --synthetic N)")
+
+    if not args.scaling:
+        storage = WiFiDataStorage()
+        result = bulk_import(lines, storage, args.workers, args.chunk_size, args.oui)
+        logger.info(
+            f"Импортировано батчей: {result['batches']}, устройств: {result['devices']} "
+            f"за {result['elapsed_sec']:.2f} с ({result['devices_per_sec']:,.0f} устр/с), "
+            f"уникальных MAC: {storage.get_unique_devices_count()}"
+        )
+        return 0
+
+    # Кеш на диске отключён: каждый прогон классифицирует с нуля.
+    # Фаза пула (масштабируется по ядрам) и применение к хранилищу (один поток
+    # главного процесса) замеряются отдельно: сквозная скорость ограничена медленной из них
+    print("Разбор + классификация (пул процессов):")
+    print(f"{'workers':>8} {'devices/s':>14} {'speedup':>9} {'startup, s':>11}")
+    baseline = None
+    for workers in [0] + list(range(1, args.workers + 1)):
+        result = measure_enrich(lines, workers, args.chunk_size, args.oui)
+        if baseline is None:
+            baseline = result["devices_per_sec"]
+        speedup = result["devices_per_sec"] / baseline if baseline else 0.0
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>8} {result['devices_per_sec']:>14,.0f} {speedup:>8.2f}x {result['startup_sec']:>11.2f}")
+
+    result = bulk_import(lines, WiFiDataStorage(), args.workers, args.chunk_size, args.oui, cache_path=None)
+    apply_rate = result["devices"] / result["apply_sec"] if result["apply_sec"] > 0 else 0.0
+    print()
+    print(f"Применение к хранилищу (главный процесс): {apply_rate:>14,.0f} devices/s "
+          f"({result['apply_sec']:.2f} с из {result['elapsed_sec']:.2f} с)")
+    print(f"Сквозной импорт, {args.workers} workers: {result['devices_per_sec']:>14,.0f} devices/s")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    sys.exit(main())
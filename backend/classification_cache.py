@@ -0,0 +1,209 @@
+"""
+Кеш результатов классификации по OUI (OUI → vendor, device_type, device_brand).
+
+Два уровня:
+- in-memory dict (горячий путь classify)
+- SQLite файл (WAL) — переживает рестарт и разделяется между процессами
+
+Кеш версионирован: версия = отпечаток OUI базы + ревизия правил классификации.
+Строки хранятся с версией — процессы с разными версиями (например, во время
+горячей перезагрузки правил) не видят и не портят результаты друг друга.
+Для каждой версии хранится время последнего использования (открытие кеша,
+запись на диск); при открытии удаляются только строки версий, которые никто
+не использовал дольше _STALE_VERSION_SEC. Если процесс дольше не писал на
+диск и его строки удалены, он пересчитает и запишет их снова (память не
+затрагивается).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (vendor_display, device_type, device_brand); vendor_display=None — vendor не найден
+CacheEntry = Tuple[Optional[str], str, Optional[str]]
+
+# Сколько новых записей копить перед записью на диск
+_FLUSH_EVERY = 64
+
+# Версия схемы SQLite файла (при несовпадении таблица пересоздаётся)
+_SCHEMA_VERSION = "2"
+
+# Строки версии, не использовавшейся дольше этого (сек), удаляются при открытии кеша
+_STALE_VERSION_SEC = 7 * 86400
+
+
+class ClassificationCache:
+    """Потокобезопасный двухуровневый кеш классификации по OUI"""
+
+    def __init__(self, path: Optional[str], version: str):
+        """
+        Args:
+            path: Путь к SQLite файлу (None — только память)
+            version: Версия (OUI база + правила); строки других версий не видны
+        """
+        self.path = path
+        self.version = version
+        self._lock = threading.Lock()
+        self._memory: Dict[str, CacheEntry] = {}
+        self._pending: List[Tuple[str, str, Optional[str], str, Optional[str]]] = []
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # Счётчики обновляются из потоков consumer, API и пула переклассификации;
+        # отдельная блокировка — попадание в память не ждёт записи на диск
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.preloaded = 0
+
+        if path:
+            try:
+                self._open()
+            except sqlite3.Error as e:
+                logger.warning(f"Кеш классификации недоступен ({path}): {e} — работаем только в памяти")
+                self._conn = None
+
+    def _open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+        if row is None or row[0] != _SCHEMA_VERSION:
+            conn.execute("DROP TABLE IF EXISTS oui_cache")
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)", (_SCHEMA_VERSION,))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS oui_cache ("
+            "version TEXT NOT NULL, oui TEXT NOT NULL, vendor TEXT, device_type TEXT NOT NULL, "
+            "device_brand TEXT, PRIMARY KEY (version, oui))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS versions (version TEXT PRIMARY KEY, last_used REAL NOT NULL)")
+        now = time.time()
+        self._touch_version(conn, now)
+        # Строки других версий может читать живой процесс (старые правила во время
+        # перезагрузки, второй backend) — удаляются только давно не используемые
+        conn.execute("DELETE FROM versions WHERE last_used < ?", (now - _STALE_VERSION_SEC,))
+        stale = conn.execute(
+            "DELETE FROM oui_cache WHERE version NOT IN (SELECT version FROM versions)"
+        ).rowcount
+        conn.execute("COMMIT")
+        if stale:
+            logger.info(f"Кеш классификации: удалено {stale} записей неиспользуемых версий")
+
+        for oui, vendor, device_type, device_brand in conn.execute(
+            "SELECT oui, vendor, device_type, device_brand FROM oui_cache WHERE version = ?", (self.version,)
+        ):
+            self._memory[oui] = (vendor, device_type, device_brand)
+        self.preloaded = len(self._memory)
+        logger.info(f"Кеш классификации {self.version}: загружено {self.preloaded} OUI из {self.path}")
+
+        self._conn = conn
+
+    def _touch_version(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO versions (version, last_used) VALUES (?, ?)", (self.version, now)
+        )
+
+    def get(self, oui: str) -> Optional[CacheEntry]:
+        """Результат для OUI ("aa:bb:cc") или None"""
+        entry = self._memory.get(oui)
+        if entry is not None:
+            with self._stats_lock:
+                self.hits += 1
+            return entry
+
+        if self._conn is not None:
+            # Мог быть записан другим процессом после нашего старта
+            with self._lock:
+                try:
+                    row = self._conn.execute(
+                        "SELECT vendor, device_type, device_brand FROM oui_cache WHERE version = ? AND oui = ?",
+                        (self.version, oui),
+                    ).fetchone() if self._conn is not None else None
+                except sqlite3.Error:
+                    row = None
+            if row is not None:
+                entry = (row[0], row[1], row[2])
+                self._memory[oui] = entry
+                with self._stats_lock:
+                    self.disk_hits += 1
+                return entry
+
+        with self._stats_lock:
+            self.misses += 1
+        return None
+
+    def put(self, oui: str, entry: CacheEntry) -> None:
+        """Сохранение результата (на диск — пачками)"""
+        self._memory[oui] = entry
+        if self._conn is None:
+            return
+        with self._lock:
+            self._pending.append((self.version, oui, entry[0], entry[1], entry[2]))
+            if len(self._pending) >= _FLUSH_EVERY:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Запись накопленных результатов на диск"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending or self._conn is None:
+            return
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO oui_cache (version, oui, vendor, device_type, device_brand) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    self._pending,
+                )
+                self._touch_version(self._conn, time.time())
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось записать кеш классификации: {e}")
+        self._pending = []
+
+    def close(self) -> None:
+        """Сброс на диск и закрытие соединения"""
+        if self._conn is None:
+            return
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
+
+    def snapshot(self) -> Dict[str, CacheEntry]:
+        """Копия in-memory уровня (OUI → результат)"""
+        return dict(self._memory)
+
+    def get_stats(self) -> Dict:
+        """Статистика попаданий"""
+        with self._stats_lock:
+            hits, disk_hits, misses = self.hits, self.disk_hits, self.misses
+        lookups = hits + disk_hits + misses
+        return {
+            "path": self.path,
+            "version": self.version,
+            "entries": len(self._memory),
+            "preloaded": self.preloaded,
+            "hits": hits,
+            "disk_hits": disk_hits,
+            "misses": misses,
+            "hit_ratio": (hits + disk_hits) / lookups if lookups else 0.0,
+        }
@@ -12,11 +12,69 @@ MQTT_CLIENT_ID = os.getenv("MQTT_CLIENT_ID", "wifi_consumer")
 # API настройки
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "5000"))
+# HTTP сервер API (api_server.py): auto | waitress | werkzeug
+API_SERVER = os.getenv("API_SERVER", "auto").lower()
+API_THREADS = int(os.getenv("API_THREADS", "8"))  # Потоков обработки запросов (waitress)
+API_CONNECTION_LIMIT = int(os.getenv("API_CONNECTION_LIMIT", "100"))  # Максимум соединений (waitress)
+API_CHANNEL_TIMEOUT = int(os.getenv("API_CHANNEL_TIMEOUT", "120"))  # Таймаут неактивного соединения, сек
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))  # Размер кеша ответов API
+API_CACHE_TIME_BUCKET_SEC = int(os.getenv("API_CACHE_TIME_BUCKET_SEC", "5"))  # Шаг времени для окон «последний N»
+# Лимит запросов API на клиента (IP): token bucket, 0 — без ограничения (по умолчанию).
+# За NAT/обратным прокси все клиенты — один IP: включайте вместе с API_TRUSTED_PROXIES
+API_RATE_LIMIT = float(os.getenv("API_RATE_LIMIT", "0"))  # Запросов/сек в среднем
+API_RATE_BURST = int(os.getenv("API_RATE_BURST", "60"))  # Запросов подряд без ожидания
+# Число доверенных обратных прокси перед API: IP клиента берётся из X-Forwarded-For,
+# добавленного ими (0 — заголовок игнорируется, клиент — адрес соединения)
+API_TRUSTED_PROXIES = int(os.getenv("API_TRUSTED_PROXIES", "0"))
+
+# Временные ряды (/api/stats/devices_timeseries): точек в ответе по умолчанию и максимум
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "500"))
+TIMESERIES_MAX_POINTS_LIMIT = int(os.getenv("TIMESERIES_MAX_POINTS_LIMIT", "5000"))
+
+# Сжатие ответов API (br/gzip по Accept-Encoding; brotli — если установлен)
+API_COMPRESSION = os.getenv("API_COMPRESSION", "True").lower() == "true"
+API_COMPRESS_MIN_BYTES = int(os.getenv("API_COMPRESS_MIN_BYTES", "1024"))  # Меньшие ответы не сжимаются
+
+# Push-поток обновлений (Server-Sent Events, event_stream.py) — отдельный порт,
+# один поток asyncio на все подключения
+SSE_ENABLED = os.getenv("SSE_ENABLED", "True").lower() == "true"
+SSE_PORT = int(os.getenv("SSE_PORT", "5001"))
+SSE_KEEPALIVE_SEC = int(os.getenv("SSE_KEEPALIVE_SEC", "15"))  # Интервал keepalive-комментариев
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "1000"))  # Максимум одновременных подключений
 
 # Настройки хранения
 MAX_DEVICES_HISTORY = 10000  # Максимальное количество уникальных устройств в истории
+# Журнал изменений устройств для /api/devices?since=<version>: сколько последних батчей покрывает
+# (при батче раз в 10 с — около 3 часов между опросами клиента)
+DEVICE_JOURNAL_SIZE = int(os.getenv("DEVICE_JOURNAL_SIZE", "1000"))
 MAX_TIMESTAMPS = 1000  # Максимальное количество временных меток для хранения
+# Сенсор (роутер) считается молчащим, если его самые новые данные старше N сек
+# (/api/stats/freshness; по умолчанию 3 цикла scanner.sh с CYCLE_TIME=600)
+SENSOR_STALE_SEC = int(os.getenv("SENSOR_STALE_SEC", "1800"))
+# Профиль блокировки хранилища по вызывающим методам с запуска (/api/debug/lock-profile);
+# включается и на лету через POST /api/debug/lock-profile
+STORAGE_LOCK_PROFILING = os.getenv("STORAGE_LOCK_PROFILING", "False").lower() == "true"
 
 # Настройки фильтрации устройств
 ENABLE_DEVICE_FILTERING = os.getenv("ENABLE_DEVICE_FILTERING", "False").lower() == "true"
 ALLOWED_DEVICE_TYPES = ["smartphone", "laptop", "tablet", "smartwatch"]  # Типы устройств, которые сохраняются
+
+# Файл правил классификации (JSON; перезагружается без рестарта: SIGHUP или POST /api/rules/reload).
+# Переменная окружения CLASSIFICATION_RULES_PATH читается в device_classifier.py.
+# Переклассифицировать уже сохранённые устройства после перезагрузки правил
+RECLASSIFY_ON_RULES_RELOAD = os.getenv("RECLASSIFY_ON_RULES_RELOAD", "False").lower() == "true"
+RECLASSIFY_SLICE_SIZE = int(os.getenv("RECLASSIFY_SLICE_SIZE", "500"))
+
+# Кластеризация рандомизированных MAC в псевдо-устройства (mac_clustering.py)
+ENABLE_MAC_CLUSTERING = os.getenv("ENABLE_MAC_CLUSTERING", "False").lower() == "true"
+CLUSTER_WINDOW_SEC = int(os.getenv("CLUSTER_WINDOW_SEC", "1800"))  # Окно неактивности кластера
+CLUSTER_RSSI_TOLERANCE = int(os.getenv("CLUSTER_RSSI_TOLERANCE", "6"))  # Допуск RSSI, dB
+CLUSTER_MAX_ACTIVE = int(os.getenv("CLUSTER_MAX_ACTIVE", "5000"))  # Максимум активных кластеров
+
+# Каталог файлов данных сервиса (кеш классификации); относительные пути ниже — от него,
+# а не от рабочего каталога запуска
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+
+# Кеш классификации по OUI (SQLite, разделяется между процессами; пусто — только память)
+CLASSIFICATION_CACHE_PATH = os.getenv("CLASSIFICATION_CACHE_PATH", "classification_cache.sqlite3")
+CLASSIFICATION_CACHE_PATH = os.path.join(DATA_DIR, CLASSIFICATION_CACHE_PATH) if CLASSIFICATION_CACHE_PATH else None
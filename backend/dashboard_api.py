@@ -1,17 +1,48 @@
 """
 Flask API для дашборда Wi-Fi мониторинга
 """
+import functools
+import hashlib
 import logging
+import os
+import threading
 import time
-from datetime import datetime
-from flask import Flask, jsonify, request
+from datetime import datetime, timezone
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from flask import Flask, Response, g, jsonify, request
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 
-from config import API_HOST, API_PORT
+from config import (
+    API_HOST,
+    API_PORT,
+    API_CACHE_MAX_ENTRIES,
+    API_CACHE_TIME_BUCKET_SEC,
+    API_COMPRESSION,
+    API_COMPRESS_MIN_BYTES,
+    API_RATE_BURST,
+    API_RATE_LIMIT,
+    API_TRUSTED_PROXIES,
+    RECLASSIFY_ON_RULES_RELOAD,
+    RECLASSIFY_SLICE_SIZE,
+    SENSOR_STALE_SEC,
+    TIMESERIES_MAX_POINTS,
+    TIMESERIES_MAX_POINTS_LIMIT,
+)
+from device_classifier import classify, get_cache_stats, get_rules, reload_rules, reload_rules_async
+from device_index import DeviceQuery
+from downsampling import DOWNSAMPLE_METHODS, choose_rollup, downsample, rollup
+import export
+import freshness
+import metrics
+from fast_json import FastJSONProvider, choose_encoding, compress
+from rate_limit import RateLimiter
+from response_cache import ResponseCache, SingleFlight
 from storage import WiFiDataStorage
 
 app = Flask(__name__)
-CORS(app)  # Разрешаем CORS для дашборда
+app.json = FastJSONProvider(app)  # orjson, если установлен
+CORS(app, expose_headers=["ETag", "Last-Modified", "Retry-After"])  # Разрешаем CORS для дашборда
 
 # Логи (минимально, без спама)
 logger = logging.getLogger("dashboard_api")
@@ -19,6 +50,59 @@ logger = logging.getLogger("dashboard_api")
 # Глобальное хранилище (будет установлено извне)
 storage: WiFiDataStorage = None
 
+# Максимум MAC в одном запросе /api/devices/lookup
+LOOKUP_MAX_MACS = 1000
+
+# Кеш сериализованных ответов: (endpoint, аргументы, версия хранилища) -> JSON
+response_cache = ResponseCache(max_entries=API_CACHE_MAX_ENTRIES)
+
+# Одновременные одинаковые запросы (тот же ключ кеша) ждут один расчёт
+single_flight = SingleFlight()
+
+# Лимит запросов на клиента: всплески запросов не занимают блокировку хранилища,
+# которую делит с API поток MQTT ingest
+rate_limiter = RateLimiter(API_RATE_LIMIT, API_RATE_BURST)
+if API_TRUSTED_PROXIES > 0:
+    # request.remote_addr — адрес клиента из X-Forwarded-For доверенных прокси
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=API_TRUSTED_PROXIES)
+
+# Эпоха ETag: версия хранилища начинается с 0 после рестарта,
+# поэтому ETag'и разных процессов/хранилищ не должны совпадать
+_etag_epoch = os.urandom(8).hex()
+
+# Метрики HTTP: endpoint — шаблон маршрута (/api/devices/<mac>), а не путь,
+# чтобы число серий не зависело от аргументов запросов
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "wifi_http_request_seconds", "Длительность обработки HTTP запроса", ["endpoint", "method"]
+)
+HTTP_REQUESTS = metrics.counter("wifi_http_requests_total", "HTTP ответы", ["endpoint", "status"])
+
+
+def _storage_sizes() -> Dict:
+    sizes = storage.get_sizes()
+    return {(name,): value for name, value in sizes.items()}
+
+
+def _classification_cache_stats() -> Dict:
+    stats = get_cache_stats()
+    return {(kind,): stats[kind] for kind in ("hits", "disk_hits", "misses")}
+
+
+metrics.callback("wifi_storage_items", "Размеры структур хранилища", _storage_sizes, ["structure"])
+metrics.callback("wifi_storage_version", "Версия данных хранилища", lambda: storage.get_version())
+metrics.callback(
+    "wifi_classification_cache_lookups_total", "Обращения к кешу классификации по результату",
+    _classification_cache_stats, ["result"], kind="counter",
+)
+metrics.callback(
+    "wifi_classification_cache_hit_ratio", "Доля попаданий кеша классификации (память + диск)",
+    lambda: get_cache_stats()["hit_ratio"],
+)
+metrics.callback(
+    "wifi_response_cache_hit_ratio", "Доля попаданий кеша ответов API",
+    lambda: response_cache.get_stats()["hit_ratio"],
+)
+
 
 def init_api(data_storage: WiFiDataStorage):
     """
@@ -27,8 +111,203 @@ def init_api(data_storage: WiFiDataStorage):
     Args:
         data_storage: Экземпляр хранилища данных
     """
-    global storage
+    global storage, _etag_epoch
     storage = data_storage
+    response_cache.clear()
+    _etag_epoch = os.urandom(8).hex()
+
+
+def _cache_key(time_dependent: bool, view_kwargs: Dict) -> Hashable:
+    """
+    Ключ кеша: endpoint + нормализованные query-параметры + версия хранилища.
+    Для ответов, зависящих от текущего времени (окна «последний час» и т.п.),
+    добавляется номер временного бакета API_CACHE_TIME_BUCKET_SEC.
+    """
+    # Без lower(): значения вроде курсора /api/devices регистрозависимы
+    args = tuple(sorted(
+        (k, v.strip()) for k, v in request.args.items(multi=True)
+    ))
+    time_bucket = int(time.time() // API_CACHE_TIME_BUCKET_SEC) if time_dependent else None
+    return (request.endpoint, args, tuple(sorted(view_kwargs.items())), storage.get_version(), time_bucket)
+
+
+def _etag(key: Hashable) -> str:
+    """Сильный ETag из ключа кеша (эпоха процесса + версия хранилища + запрос)"""
+    digest = hashlib.blake2b(repr((_etag_epoch, key)).encode("utf-8"), digest_size=12)
+    return digest.hexdigest()
+
+
+def _last_modified(time_dependent: bool) -> float:
+    """Время изменения ответа: изменение хранилища или начало временного бакета"""
+    if time_dependent:
+        bucket_start = time.time() // API_CACHE_TIME_BUCKET_SEC * API_CACHE_TIME_BUCKET_SEC
+        return max(storage.modified_at, bucket_start)
+    return storage.modified_at
+
+
+def _is_not_modified(etag: str, last_modified: float) -> bool:
+    """
+    Проверка условного запроса (If-None-Match приоритетнее If-Modified-Since,
+    как в RFC 9110). Сравнение слабое: сжатые ответы отдаются со слабым ETag.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+def _set_validators(response, etag: str, last_modified: float, weak: bool = False):
+    response.set_etag(etag, weak=weak)
+    response.last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+    # Браузер обязан перепроверять ответ (иначе эвристическое кеширование по Last-Modified)
+    response.cache_control.no_cache = True
+    return response
+
+
+def _accepted_encoding() -> Optional[str]:
+    """Кодирование ответа по Accept-Encoding (None — без сжатия)"""
+    if not API_COMPRESSION:
+        return None
+    return choose_encoding(request.accept_encodings)
+
+
+def _encode_body(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Сжатие тела, если клиент принимает кодирование и ответ достаточно большой"""
+    if encoding is None or len(body) < API_COMPRESS_MIN_BYTES:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+def cached_response(time_dependent: bool = False, store: bool = True) -> Callable:
+    """
+    Декоратор для read-endpoint'ов: условные запросы + кеш сериализованного JSON.
+    
+    - ETag/Last-Modified выводятся из версии хранилища и параметров запроса;
+      если клиент прислал совпадающий If-None-Match — 304 без расчёта и сериализации
+    - при store=True успешный ответ кешируется (повторный запрос без новых
+      данных — попадание в словарь без пересчёта)
+    - тело сжимается (br/gzip) по Accept-Encoding; в кеше хранится уже сжатое
+    - одновременные запросы с одинаковым ключом объединяются (single_flight)
+    
+    Args:
+        time_dependent: Ответ зависит от текущего времени (см. _cache_key)
+        store: Хранить тело ответа в response_cache (False — для больших списков)
+    """
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not storage:
+                return view(*args, **kwargs)
+            
+            # Версия читается ДО расчёта: если данные изменятся во время расчёта,
+            # более свежий ответ окажется под старой версией, которую уже никто не запросит
+            key = _cache_key(time_dependent, kwargs)
+            etag = _etag(key)
+            last_modified = _last_modified(time_dependent)
+            if _is_not_modified(etag, last_modified):
+                return _set_validators(app.response_class(status=304), etag, last_modified)
+            
+            accepted = _accepted_encoding()
+            cached = response_cache.get((key, accepted)) if store else None
+            if cached is None:
+                def render():
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body_encoding = _encode_body(response.get_data(), accepted)
+                    if store:
+                        response_cache.put((key, accepted), *body_encoding)
+                    return body_encoding
+                
+                # Одинаковые одновременные запросы (промах кеша после нового батча,
+                # открытие многих дашборд) — один расчёт, остальные ждут его результат
+                result, shared = single_flight.do((key, accepted), render)
+                if not isinstance(result, tuple):
+                    # Не 200 — ответ принадлежит запросу-лидеру, ожидавшие считают сами
+                    return view(*args, **kwargs) if shared else result
+                body, encoding = result
+            else:
+                body, encoding = cached
+            
+            response = app.response_class(body, mimetype="application/json")
+            response.vary.add("Accept-Encoding")
+            if encoding:
+                response.content_encoding = encoding
+            # Сжатое представление — не байт-в-байт то же, что несжатое: ETag слабый
+            return _set_validators(response, etag, last_modified, weak=encoding is not None)
+        return wrapper
+    return decorator
+
+
+def _compact_requested(args=None) -> bool:
+    """?compact=1 — без дублирующих полей (m, r, latest_rssi)"""
+    if args is None:
+        args = request.args
+    return str(args.get("compact") or "").strip().lower() in ("1", "true")
+
+
+def format_device(device: Dict, compact: bool = False) -> Dict:
+    """
+    Формирует ответ по устройству с совместимостью со старым форматом
+    (старые поля m, r для фронтенда + новые поля классификации)
+    
+    Args:
+        device: Запись устройства из хранилища
+        compact: Без legacy полей m, r (дублируют mac, rssi)
+    """
+    rssi = device.get("latest_rssi", device.get("best_rssi", 0))
+    if compact:
+        device_dict = {"mac": device.get("mac", ""), "rssi": rssi}
+    else:
+        device_dict = {
+            "m": device.get("mac", ""),  # Старое поле для совместимости
+            "mac": device.get("mac", ""),  # Новое поле
+            "r": rssi,  # Старое поле
+            "rssi": rssi,  # Новое поле
+        }
+    device_dict["first_seen"] = device.get("first_seen", 0)
+    device_dict["last_seen"] = device.get("last_seen", 0)
+    device_dict["count"] = device.get("count", 0)
+    device_dict["best_rssi"] = device.get("best_rssi", 0)
+    # latest_rssi дублирует rssi — только в полном формате
+    if not compact:
+        device_dict["latest_rssi"] = device.get("latest_rssi", 0)
+    # Добавляем поля классификации (если есть)
+    for key in ("vendor", "device_type", "device_brand", "randomized", "members"):
+        if key in device:
+            device_dict[key] = device[key]
+    return device_dict
+
+
+@app.before_request
+def _start_timer():
+    # Регистрируется первым: в длительность входят и ответы 429
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "other"
+        HTTP_REQUEST_SECONDS.labels(endpoint, request.method).observe(time.perf_counter() - started)
+        HTTP_REQUESTS.labels(endpoint, response.status_code).inc()
+    return response
+
+
+@app.before_request
+def _limit_rate():
+    """429 Too Many Requests, если клиент превысил API_RATE_LIMIT"""
+    if not request.path.startswith("/api/") or request.path == "/api/health" or request.method == "OPTIONS":
+        return None
+    allowed, retry_after = rate_limiter.acquire(request.remote_addr)
+    if allowed:
+        return None
+    response = jsonify({"error": "Too many requests", "retry_after": retry_after})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
 
 
 @app.route('/api/health', methods=['GET'])
@@ -38,6 +317,7 @@ def health():
 
 
 @app.route('/api/statistics', methods=['GET'])
+@cached_response(store=False)
 def get_statistics():
     """Получение статистики"""
     if not storage:
@@ -48,89 +328,177 @@ def get_statistics():
 
 
 @app.route('/api/devices', methods=['GET'])
+@cached_response(store=False)
 def get_devices():
     """
-    Получение списка устройств
+    Получение списка устройств (постранично, с фильтрами и сортировкой)
     
     Query параметры:
-        limit: Максимальное количество устройств (по умолчанию: все)
+        limit: Размер страницы (по умолчанию: все)
+        cursor: Курсор следующей страницы (next_cursor из предыдущего ответа)
+        sort: last_seen | first_seen | rssi | count (по умолчанию: last_seen)
+        order: desc | asc (по умолчанию: desc)
+        device_type, device_brand, vendor: Значения через запятую
+        randomized: true | false
+        rssi_min, rssi_max: Диапазон RSSI (dBm, включительно)
+        last_seen_from, last_seen_to: Диапазон last_seen (unix time, включительно)
+        since: Версия из предыдущего ответа — только устройства, изменённые
+               после неё, и removed (full=true — журнал не покрывает since,
+               в ответе весь список)
     """
     if not storage:
         return jsonify({"error": "Storage not initialized"}), 500
     
-    limit = request.args.get('limit', type=int)
+    try:
+        return jsonify(_devices_panel(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+# Параметры /api/devices, совместимые с since (дельта — по всему списку устройств)
+_SINCE_COMPATIBLE_ARGS = {"since", "compact"}
+
+
+def _devices_panel(args) -> Dict:
+    """Страница устройств по параметрам /api/devices (ValueError при ошибке)"""
+    return _read_devices_panel(args)()
+
+
+def _read_devices_panel(args) -> Callable[[], Dict]:
+    """Чтение страницы устройств из хранилища; форматирование — в возвращаемой функции"""
+    compact = _compact_requested(args)
+    since = _int_arg(args, "since")
+    if since is not None:
+        extra = sorted(set(args.keys()) - _SINCE_COMPATIBLE_ARGS)
+        if extra:
+            raise ValueError(f"Параметр since не совмещается с: {', '.join(extra)}")
+        delta = storage.changes_since(since)
+        if delta is not None:
+            def render_delta() -> Dict:
+                devices_response = [format_device(device, compact) for device in delta["devices"]]
+                return {
+                    "devices": devices_response,
+                    "count": len(devices_response),
+                    "next_cursor": None,
+                    "removed": delta["removed"],
+                    "version": delta["version"],
+                    "full": False,
+                }
+            return render_delta
+        # since старше журнала изменений — полная выгрузка (клиент заменяет список целиком)
+        query = DeviceQuery()
+    else:
+        query = _parse_device_query(args)
     
-    devices = storage.get_devices(limit=limit)
+    with storage.consistent_read() as version:
+        devices, next_cursor = storage.query_devices(query)
     
-    # Формируем ответ с совместимостью со старым форматом
-    # Старые поля (m, r) для совместимости с фронтендом
-    devices_response = []
-    for device in devices:
-        device_dict = {
-            "m": device.get("mac", ""),  # Старое поле для совместимости
-            "mac": device.get("mac", ""),  # Новое поле
-            "r": device.get("latest_rssi", device.get("best_rssi", 0)),  # Старое поле
-            "rssi": device.get("latest_rssi", device.get("best_rssi", 0)),  # Новое поле
-            "first_seen": device.get("first_seen", 0),
-            "last_seen": device.get("last_seen", 0),
-            "count": device.get("count", 0),
-            "best_rssi": device.get("best_rssi", 0),
-            "latest_rssi": device.get("latest_rssi", 0)
+    def render() -> Dict:
+        # Формируем ответ с совместимостью со старым форматом
+        devices_response = [format_device(device, compact) for device in devices]
+        response = {
+            "devices": devices_response,
+            "count": len(devices_response),
+            "next_cursor": next_cursor,
+            "version": version,
         }
-        # Добавляем новые поля классификации
-        if "vendor" in device:
-            device_dict["vendor"] = device["vendor"]
-        if "device_type" in device:
-            device_dict["device_type"] = device["device_type"]
-        if "device_brand" in device:
-            device_dict["device_brand"] = device["device_brand"]
-        if "randomized" in device:
-            device_dict["randomized"] = device["randomized"]
-        devices_response.append(device_dict)
+        if since is not None:
+            response["removed"] = []
+            response["full"] = True
+        return response
+    return render
+
+
+def _int_arg(args, name: str) -> Optional[int]:
+    """Целочисленный query параметр (None — не задан; ValueError при ошибке)"""
+    value = args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть целым числом")
+
+
+def _parse_device_query(args) -> DeviceQuery:
+    """Query параметры /api/devices -> DeviceQuery (ValueError при ошибке)"""
+    limit = _int_arg(args, "limit")
+    if limit is not None and limit <= 0:
+        raise ValueError("Параметр limit должен быть больше 0")
     
-    return jsonify({
-        "devices": devices_response,
-        "count": len(devices_response)
-    })
+    order = (args.get("order") or "desc").strip().lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("Параметр order: asc | desc")
+    
+    equals = {}
+    for field in ("device_type", "device_brand", "vendor"):
+        value = args.get(field)
+        if value:
+            equals[field] = [v for v in value.split(",") if v.strip()]
+    randomized = args.get("randomized")
+    if randomized:
+        flag = randomized.strip().lower()
+        if flag not in ("true", "false", "1", "0"):
+            raise ValueError("Параметр randomized: true | false")
+        equals["randomized"] = [flag in ("true", "1")]
+    
+    return DeviceQuery(
+        sort=(args.get("sort") or "last_seen").strip().lower(),
+        descending=order == "desc",
+        limit=limit,
+        cursor=args.get("cursor") or None,
+        equals=equals,
+        rssi_min=_int_arg(args, "rssi_min"),
+        rssi_max=_int_arg(args, "rssi_max"),
+        last_seen_from=_int_arg(args, "last_seen_from"),
+        last_seen_to=_int_arg(args, "last_seen_to"),
+    )
 
 
 @app.route('/api/devices/<mac>', methods=['GET'])
+@cached_response(store=False)
 def get_device(mac: str):
     """Получение информации об устройстве по MAC адресу"""
     if not storage:
         return jsonify({"error": "Storage not initialized"}), 500
     
-    devices = storage.get_devices()
-    device = next((d for d in devices if d["mac"] == mac.lower()), None)
+    device = storage.get_device(mac)
     
     if device:
-        # Формируем ответ с совместимостью
-        device_dict = {
-            "m": device.get("mac", ""),  # Старое поле
-            "mac": device.get("mac", ""),  # Новое поле
-            "r": device.get("latest_rssi", device.get("best_rssi", 0)),  # Старое поле
-            "rssi": device.get("latest_rssi", device.get("best_rssi", 0)),  # Новое поле
-            "first_seen": device.get("first_seen", 0),
-            "last_seen": device.get("last_seen", 0),
-            "count": device.get("count", 0),
-            "best_rssi": device.get("best_rssi", 0),
-            "latest_rssi": device.get("latest_rssi", 0)
-        }
-        # Добавляем новые поля
-        if "vendor" in device:
-            device_dict["vendor"] = device["vendor"]
-        if "device_type" in device:
-            device_dict["device_type"] = device["device_type"]
-        if "device_brand" in device:
-            device_dict["device_brand"] = device["device_brand"]
-        if "randomized" in device:
-            device_dict["randomized"] = device["randomized"]
-        return jsonify(device_dict)
+        return jsonify(format_device(device, _compact_requested()))
     else:
         return jsonify({"error": "Device not found"}), 404
 
 
+@app.route('/api/devices/lookup', methods=['POST'])
+def lookup_devices():
+    """
+    Пакетный поиск устройств по списку MAC
+    
+    Тело: {"macs": ["aa:bb:cc:dd:ee:ff", ...]} (не более LOOKUP_MAX_MACS)
+    Ответ: {"devices": {mac: устройство}, "not_found": [mac, ...]}
+    """
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 500
+    
+    body = request.get_json(silent=True) or {}
+    macs = body.get("macs") if isinstance(body, dict) else None
+    if not isinstance(macs, list) or not all(isinstance(m, str) for m in macs):
+        return jsonify({"error": "Ожидается {\"macs\": [строки]}"}), 400
+    if len(macs) > LOOKUP_MAX_MACS:
+        return jsonify({"error": f"Не более {LOOKUP_MAX_MACS} MAC за запрос"}), 400
+    
+    found = storage.get_devices_by_mac(macs)
+    not_found = sorted({m.lower() for m in macs if m} - found.keys())
+    compact = _compact_requested()
+    return jsonify({
+        "devices": {mac: format_device(device, compact) for mac, device in found.items()},
+        "not_found": not_found,
+    })
+
+
 @app.route('/api/recent', methods=['GET'])
+@cached_response(store=False)
 def get_recent():
     """
     Получение последних данных
@@ -152,6 +520,7 @@ def get_recent():
 
 
 @app.route('/api/dashboard', methods=['GET'])
+@cached_response()
 def get_dashboard_data():
     """
     Получение данных для дашборда
@@ -164,49 +533,31 @@ def get_dashboard_data():
     from flask import request
     limit = request.args.get('limit', default=100, type=int)
     
-    # Получаем данные
-    stats = storage.get_statistics()
-    devices = storage.get_devices(limit=limit)
-    recent = storage.get_recent_data(limit=50)
-    
-    # Формируем устройства с совместимостью
-    top_devices_response = []
-    for device in devices[:20]:
-        device_dict = {
-            "m": device.get("mac", ""),  # Старое поле
-            "mac": device.get("mac", ""),  # Новое поле
-            "r": device.get("latest_rssi", device.get("best_rssi", 0)),  # Старое поле
-            "rssi": device.get("latest_rssi", device.get("best_rssi", 0)),  # Новое поле
-            "first_seen": device.get("first_seen", 0),
-            "last_seen": device.get("last_seen", 0),
-            "count": device.get("count", 0),
-            "best_rssi": device.get("best_rssi", 0),
-            "latest_rssi": device.get("latest_rssi", 0)
-        }
-        # Добавляем новые поля
-        if "vendor" in device:
-            device_dict["vendor"] = device["vendor"]
-        if "device_type" in device:
-            device_dict["device_type"] = device["device_type"]
-        if "device_brand" in device:
-            device_dict["device_brand"] = device["device_brand"]
-        if "randomized" in device:
-            device_dict["randomized"] = device["randomized"]
-        top_devices_response.append(device_dict)
+    # Одно согласованное чтение хранилища; агрегаты считаются инкрементально
+    # (в ответ попадают только топ-20 устройств — больше не копируем;
+    # limit <= 0 — как без ограничения, т.е. 20)
+    top_limit = min(limit, 20) if limit > 0 else 20
+    snapshot = storage.get_dashboard(limit=top_limit, recent_limit=20)
+    aggregates = snapshot["aggregates"]
+    compact = _compact_requested()
     
     # Агрегация для дашборда
     dashboard_data = {
-        "statistics": stats,
-        "top_devices": top_devices_response,  # Топ 20 устройств
-        "recent_activity": recent[-20:],  # Последние 20 записей
-        "unique_devices_count": len(devices),
-        "active_devices": len([d for d in devices if d["count"] > 1])
+        "statistics": snapshot["statistics"],
+        "top_devices": [format_device(device, compact) for device in snapshot["devices"]],  # Топ 20 устройств
+        "recent_activity": snapshot["recent"],  # Последние 20 записей
+        "unique_devices_count": aggregates["total"],
+        "active_devices": aggregates["active_devices"],
+        "devices_by_type": aggregates["by_type"],
+        "devices_by_vendor": aggregates["by_vendor"],
+        "randomized_ratio": aggregates["randomized_ratio"],
     }
     
     return jsonify(dashboard_data)
 
 
 @app.route('/api/stats/realtime', methods=['GET'])
+@cached_response(time_dependent=True, store=False)
 def get_realtime_stats():
     """
     Получение данных реального времени (последние 60 секунд)
@@ -226,50 +577,41 @@ def get_realtime_stats():
     """
     if not storage:
         return jsonify({"error": "Storage not initialized"}), 500
+    return jsonify(_realtime_panel())
 
-    # Берём последние точки и фильтруем окно 60 секунд (по unix ts источника).
-    # ВАЖНО: используем storage.get_recent_data() как источник истины (по задаче).
-    import time
-    now_ts = int(time.time())
-    cutoff_ts = now_ts - 60
-
-    recent = storage.get_recent_data(limit=500)
-    window = [e for e in recent if int(e.get("t", 0) or 0) >= cutoff_ts]
 
-    # Кешируем информацию об устройствах (чтобы не делать storage.get_devices() в цикле)
-    devices_index = {d.get("mac", "").lower(): d for d in storage.get_devices()}
+def _realtime_panel() -> Dict:
+    """Устройства живого окна 60 секунд в формате /api/stats/realtime"""
+    return _read_realtime_panel({})()
 
-    unique_macs = set()
-    devices_list = []
 
-    for ts_entry in window:
-        ts = int(ts_entry.get("t", 0) or 0)
-        devices = ts_entry.get("d", []) or []
+def _read_realtime_panel(args) -> Callable[[], Dict]:
+    # Живое окно 60 секунд из хранилища (колесо времени, обновляется в add_data):
+    # ни копии временных меток, ни обращения к таблице устройств
+    window = storage.get_realtime_window()
+    return lambda: _format_realtime(window)
 
-        # ISO 8601 (UTC) для этой временной метки
-        try:
-            timestamp_iso = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%SZ")
-        except (ValueError, OSError, OverflowError):
-            timestamp_iso = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        for device in devices:
-            mac = (device.get("m") or "").lower()
-            if not mac or mac in unique_macs:
-                continue
 
-            unique_macs.add(mac)
-            info = devices_index.get(mac, {})
-
-            devices_list.append(
-                {
-                    "mac": mac,
-                    "rssi": int(device.get("r", info.get("latest_rssi", info.get("best_rssi", 0))) or 0),
-                    "timestamp": timestamp_iso,
-                    "is_random": bool(info.get("randomized", False)),
-                }
-            )
+def _format_realtime(window) -> Dict:
+    # ISO 8601 (UTC) — одна строка на секунду
+    iso_by_ts: Dict[int, str] = {}
+    devices_list = []
+    for mac, ts, rssi, randomized in window:
+        timestamp_iso = iso_by_ts.get(ts)
+        if timestamp_iso is None:
+            try:
+                timestamp_iso = datetime.utcfromtimestamp(ts).strftime("%Y-%m-%dT%H:%M:%SZ")
+            except (ValueError, OSError, OverflowError):
+                timestamp_iso = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+            iso_by_ts[ts] = timestamp_iso
+        devices_list.append({
+            "mac": mac,
+            "rssi": int(rssi or 0),
+            "timestamp": timestamp_iso,
+            "is_random": randomized,
+        })
 
-    return jsonify({"unique_devices": len(unique_macs), "devices": devices_list})
+    return {"unique_devices": len(devices_list), "devices": devices_list}
 
 
 def _parse_timeframe(tf: str):
@@ -291,6 +633,7 @@ def _parse_timeframe(tf: str):
 
 
 @app.route('/api/stats/summary', methods=['GET'])
+@cached_response()
 def get_stats_summary():
     """
     Сводка метрик для верхних карточек дашборда:
@@ -306,6 +649,7 @@ def get_stats_summary():
 
 
 @app.route('/api/stats/count', methods=['GET'])
+@cached_response(time_dependent=True)
 def get_device_count():
     """
     Уникальные устройства за период (last_seen в [start_ts, end_ts]).
@@ -314,36 +658,41 @@ def get_device_count():
     if not storage:
         return jsonify({"error": "Storage not initialized"}), 500
 
-    tf_str = (request.args.get("timeframe", "1h") or "1h").strip().lower()
+    return jsonify(_count_panel(request.args))
+
+
+def _count_panel(args) -> Dict:
+    """Число устройств за timeframe в формате /api/stats/count"""
+    tf_str = str(args.get("timeframe", "1h") or "1h").strip().lower()
     timeframe_sec, _, _ = _parse_timeframe(tf_str)
 
-    now_ts = int(time.time())
-    devices = storage.get_devices()
-    recent = storage.get_recent_data(limit=500)
-
-    end_ts = now_ts
-    for d in devices:
-        ls = int(d.get("last_seen", 0) or 0)
-        if ls > 0 and ls > end_ts:
-            end_ts = ls
-    for e in recent:
-        t = int(e.get("t", 0) or 0)
-        if t > 0 and t > end_ts:
-            end_ts = t
-
-    start_ts = end_ts - timeframe_sec
-    count = 0
-    for d in devices:
-        ls = int(d.get("last_seen", 0) or 0)
-        if ls <= 0:
-            continue
-        if start_ts <= ls <= end_ts:
-            count += 1
-
-    return jsonify({"timeframe": tf_str, "count": count, "start_ts": start_ts, "end_ts": end_ts})
+    # Счёт по индексу last_seen хранилища — без копирования и обхода устройств
+    result = storage.count_seen_within(timeframe_sec)
+    return {"timeframe": tf_str, **result}
+
+
+def _read_count_panel(args) -> Callable[[], Dict]:
+    result = _count_panel(args)
+    return lambda: result
+
+
+@app.route('/api/stats/freshness', methods=['GET'])
+def get_freshness():
+    """
+    Свежесть данных: возраст последнего батча каждого сенсора и гистограммы
+    задержек от t батча до видимости в API
+    """
+    sensors = freshness.TRACKER.get_sensors(stale_after_sec=SENSOR_STALE_SEC)
+    return jsonify({
+        "stale_after_sec": SENSOR_STALE_SEC,
+        "stale": sum(1 for s in sensors if s["stale"]),
+        "sensors": sensors,
+        "histograms": {name: freshness.histogram_summary(h) for name, h in freshness.HISTOGRAMS.items()},
+    })
 
 
 @app.route('/api/stats/timeseries', methods=['GET'])
+@cached_response(time_dependent=True)
 def get_devices_timeseries():
     """
     Устаревший alias: редирект на devices_timeseries с числовым timeframe.
@@ -356,58 +705,393 @@ def get_devices_timeseries():
 
 
 @app.route('/api/stats/devices_timeseries', methods=['GET'])
+@cached_response(time_dependent=True)
 def get_devices_timeseries_new():
     """
     Временной ряд: количество уникальных устройств по бакетам времени.
     GET /api/stats/devices_timeseries?timeframe=1h|6h|12h|1d|30d
-    Ответ: { timeframe, start_ts, end_ts, bucket_sec, points: [{t, count}, ...] }
+    GET /api/stats/devices_timeseries?start=<ts>&end=<ts>&max_points=500&downsample=lttb|minmax
+    Ответ: { timeframe, start_ts, end_ts, bucket_sec, raw_points, downsampled, points: [{t, count}, ...] }
     """
     if not storage:
         return jsonify({"error": "Storage not initialized"}), 500
-    tf_str = (request.args.get("timeframe", "1h") or "1h").strip().lower()
-    return _devices_timeseries_impl(tf_str)
+    try:
+        return jsonify(_timeseries_panel(request.args))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+def _timeseries_panel(args) -> Dict:
+    """Временной ряд по параметрам /api/stats/devices_timeseries (ValueError при ошибке)"""
+    return _read_timeseries_panel(args)()
+
+
+def _read_timeseries_panel(args) -> Callable[[], Dict]:
+    """Чтение истории снимков; агрегация и прореживание — в возвращаемой функции"""
+    tf_str = str(args.get("timeframe", "1h") or "1h").strip().lower()
+    start_ts = _int_arg(args, "start")
+    end_ts = _int_arg(args, "end")
+    max_points = _int_arg(args, "max_points")
+    if max_points is not None and not 3 <= max_points <= TIMESERIES_MAX_POINTS_LIMIT:
+        raise ValueError(f"Параметр max_points: от 3 до {TIMESERIES_MAX_POINTS_LIMIT}")
+    method = str(args.get("downsample") or "lttb").strip().lower()
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Параметр downsample: {' | '.join(DOWNSAMPLE_METHODS)}")
+    if start_ts is not None and end_ts is not None and start_ts >= end_ts:
+        raise ValueError("Параметр start должен быть меньше end")
+    return _read_timeseries(tf_str, start_ts, end_ts, max_points, method)
 
 
 def _devices_timeseries_impl(timeframe_str: str):
-    timeframe_sec, bucket_sec, label = _parse_timeframe(timeframe_str)
+    return jsonify(_read_timeseries(timeframe_str)())
+
+
+def _read_timeseries(
+    timeframe_str: str,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+    max_points: Optional[int] = None,
+    method: str = "lttb",
+) -> Callable[[], Dict]:
+    """
+    Ряд снимков за диапазон, не больше max_points точек (под блокировкой —
+    только копия ссылок истории снимков, расчёт — в возвращаемой функции).
+
+    Диапазон: [start, end] если заданы (без start — end минус timeframe,
+    без end — текущее время), иначе последний timeframe. Если сырых снимков
+    больше, чем max_points * ROLLUP_OVERSAMPLE, — агрегация MAX по шагу из
+    ROLLUP_STEPS; если точек всё ещё больше max_points — LTTB / min-max.
+    """
+    timeframe_sec, min_bucket_sec, label = _parse_timeframe(timeframe_str)
+    if max_points is None:
+        max_points = TIMESERIES_MAX_POINTS
 
     now_ts = int(time.time())
-    start_ts = now_ts - timeframe_sec
-
-    # Берём реальные снимки из истории
-    snapshots = [
-        s for s in storage.snapshot_history
-        if s["t"] >= start_ts
-    ]
-
-    if bucket_sec == 0:
-        # Без агрегации — каждый снимок как отдельная точка.
-        # Сортировка по времени (при буферизации роутера порядок поступления != порядок по t).
-        snapshots_sorted = sorted(snapshots, key=lambda s: s["t"])
-        # Дедупликация по t: при совпадении t оставляем точку с макс. count
-        points = []
-        for s in snapshots_sorted:
-            if points and points[-1]["t"] == s["t"]:
-                if s["count"] > points[-1]["count"]:
-                    points[-1] = s
-            else:
-                points.append(s)
+    if start_ts is None and end_ts is None:
+        end_ts = now_ts
     else:
-        # Агрегация: MAX по бакету (для 30d)
-        buckets = {}
-        for s in snapshots:
-            b = (s["t"] // bucket_sec) * bucket_sec
-            if b not in buckets or s["count"] > buckets[b]:
-                buckets[b] = s["count"]
-        points = [{"t": b, "count": c} for b, c in sorted(buckets.items())]
-
-    logger.info("devices_timeseries timeframe=%s points=%s", label, len(points))
+        label = "custom"
+        min_bucket_sec = 0
+        if end_ts is None:
+            end_ts = now_ts
+    if start_ts is None:
+        start_ts = end_ts - timeframe_sec
+
+    history = storage.get_snapshot_history()
+
+    def render() -> Dict:
+        # Реальные снимки из истории (упорядочены по t, без дублей t)
+        snapshots = storage.select_snapshots(history, start_ts, end_ts)
+
+        bucket_sec = choose_rollup(end_ts - start_ts, len(snapshots), max_points, min_bucket_sec)
+        points = rollup(snapshots, bucket_sec)
+        downsampled = None
+        if len(points) > max_points:
+            points = downsample(points, max_points, method)
+            downsampled = method
+
+        logger.info(
+            "devices_timeseries timeframe=%s raw=%s bucket=%s points=%s",
+            label, len(snapshots), bucket_sec, len(points),
+        )
+        return {
+            "timeframe": label,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "bucket_sec": bucket_sec,
+            "raw_points": len(snapshots),
+            "downsampled": downsampled,
+            "points": points,
+        }
+    return render
+
+
+def _read_value(read: Callable[[], Dict]) -> Callable[[Dict], Callable[[], Dict]]:
+    """Панель, данные которой готовы сразу после чтения (небольшой dict)"""
+    def reader(params: Dict) -> Callable[[], Dict]:
+        value = read()
+        return lambda: value
+    return reader
+
+
+# Панели /api/query: имя -> чтение(params) -> форматирование() -> данные
+# (формат соответствующего GET endpoint'а). Чтение — под блокировкой хранилища
+# (копии записей и ссылок), форматирование и сериализация — после её освобождения
+QUERY_PANELS: Dict[str, Callable[[Dict], Callable[[], Dict]]] = {
+    "summary": _read_value(lambda: storage.get_snapshot_summary()),
+    "statistics": _read_value(lambda: storage.get_statistics()),
+    "count": _read_count_panel,
+    "timeseries": _read_timeseries_panel,
+    "realtime": _read_realtime_panel,
+    "devices": _read_devices_panel,
+}
+
+# Максимум панелей в одном запросе /api/query
+QUERY_MAX_PANELS = 20
+
+
+def _add_panel(panels: List[Tuple[str, str, Dict]], query_id: str, panel: str, params: Dict) -> None:
+    """Проверка панели запроса /api/query (ValueError при ошибке)"""
+    if panel not in QUERY_PANELS:
+        raise ValueError(f"Неизвестная панель: {panel} (допустимо: {', '.join(QUERY_PANELS)})")
+    if any(query_id == other for other, _, _ in panels):
+        raise ValueError(f"Повторяющийся id: {query_id}")
+    if len(panels) >= QUERY_MAX_PANELS:
+        raise ValueError(f"Не более {QUERY_MAX_PANELS} панелей за запрос")
+    panels.append((query_id, panel, params))
+
+
+def _query_panels(panels: List[Tuple[str, str, Dict]]) -> Dict:
+    """
+    Панели по одному согласованному состоянию хранилища: под одной блокировкой
+    панели только копируют данные, форматирование — после её освобождения
+    """
+    renders: Dict[str, Callable[[], Dict]] = {}
+    errors: Dict[str, str] = {}
+    with storage.consistent_read() as version:
+        for query_id, panel, params in panels:
+            try:
+                renders[query_id] = QUERY_PANELS[panel](params)
+            except ValueError as e:
+                errors[query_id] = str(e)
+    
+    results = {query_id: render() for query_id, render in renders.items()}
+    return {"version": version, "results": results, "errors": errors}
+
+
+@app.route('/api/query', methods=['GET'])
+@cached_response(time_dependent=True, store=False)
+def get_query_panels():
+    """
+    Несколько панелей дашборда одним запросом, по одному согласованному
+    состоянию хранилища (записи устройств, ссылки на снимки, окно realtime
+    копируются под одной блокировкой; форматирование и сериализация — после
+    её освобождения, ingest их не ждёт).
+    
+    GET — с ETag/304 по версии хранилища, как у остальных read-endpoint'ов:
+    повторный опрос без новых данных не берёт блокировку.
+    
+    Query параметры:
+        panels: Панели через запятую, "id:panel" или "panel" (id = panel);
+                panel: summary | statistics | count | timeseries | realtime | devices
+        <id>.<параметр>: Параметр GET endpoint'а панели, например chart.timeframe=1h
+    Ответ: {"version": N, "results": {id: данные}, "errors": {id: сообщение}}
+    """
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 500
+    
+    panels: List[Tuple[str, str, Dict]] = []
+    try:
+        for spec in (request.args.get("panels") or "").split(","):
+            spec = spec.strip()
+            if not spec:
+                continue
+            query_id, _, panel = spec.rpartition(":")
+            _add_panel(panels, query_id or panel, panel, {})
+        if not panels:
+            raise ValueError("Ожидается panels=id:panel,...")
+        params_by_id = {query_id: params for query_id, _, params in panels}
+        for key, value in request.args.items():
+            if key == "panels":
+                continue
+            query_id, _, name = key.rpartition(".")
+            if query_id not in params_by_id:
+                raise ValueError(f"Параметр {key}: ожидается <id>.<параметр> для одной из panels")
+            params_by_id[query_id][name] = value
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return jsonify(_query_panels(panels))
+
+
+@app.route('/api/query', methods=['POST'])
+def query_panels():
+    """
+    То же, что GET /api/query, с панелями в теле запроса (без ETag и кеша ответов).
+    
+    Тело: {"queries": [{"id": "chart", "panel": "timeseries", "params": {"timeframe": "1h"}}, ...]}
+        panel: summary | statistics | count | timeseries | realtime | devices
+        params: query параметры соответствующего GET endpoint'а
+        id: ключ результата (по умолчанию — panel)
+    Ответ: {"version": N, "results": {id: данные}, "errors": {id: сообщение}}
+    """
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 500
+    
+    body = request.get_json(silent=True)
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not all(isinstance(q, dict) for q in queries):
+        return jsonify({"error": "Ожидается {\"queries\": [{\"panel\": ..., \"params\": {...}}]}"}), 400
+    
+    panels: List[Tuple[str, str, Dict]] = []
+    for q in queries:
+        panel = q.get("panel")
+        query_id = str(q.get("id") or panel)
+        params = q.get("params") or {}
+        if not isinstance(params, dict):
+            return jsonify({"error": f"{query_id}: params должен быть объектом"}), 400
+        # Значения как в query string (строки), None — параметр не задан
+        params = {k: str(v).lower() if isinstance(v, bool) else str(v) for k, v in params.items() if v is not None}
+        try:
+            _add_panel(panels, query_id, panel, params)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    response = jsonify(_query_panels(panels))
+    body, encoding = _encode_body(response.get_data(), _accepted_encoding())
+    if encoding:
+        response.set_data(body)
+        response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+    return response
+
+
+def _reclassify_storage(rules) -> None:
+    """Переклассификация сохранённых устройств срезами по новым правилам"""
+    if not storage:
+        return
+    updated = storage.reclassify_devices(
+        lambda mac, randomized: classify(mac, 0, int(bool(randomized))),
+        slice_size=RECLASSIFY_SLICE_SIZE,
+    )
+    logger.info("Переклассифицировано устройств: %s (правила %s)", updated, rules.revision)
+
+
+def start_rules_reload(reclassify: Optional[bool] = None) -> threading.Thread:
+    """
+    Фоновая перезагрузка правил классификации из файла (по SIGHUP;
+    ошибки файла правил — только в лог).
+    
+    Args:
+        reclassify: Переклассифицировать сохранённые устройства срезами
+                    (None — RECLASSIFY_ON_RULES_RELOAD)
+    """
+    if reclassify is None:
+        reclassify = RECLASSIFY_ON_RULES_RELOAD
+    
+    def _on_reloaded(rules):
+        if reclassify:
+            _reclassify_storage(rules)
+    
+    return reload_rules_async(on_reloaded=_on_reloaded)
+
+
+@app.route('/api/export/<dataset>', methods=['GET'])
+def export_dataset(dataset: str):
+    """
+    Потоковая выгрузка набора данных (export.py)
+    
+    GET /api/export/devices|probes|snapshots?format=ndjson|csv|arrow|parquet
+    
+    Ответ кодируется пачками по мере чтения хранилища, без сборки
+    всего результата в памяти (без ETag и кеша ответов).
+    """
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 500
+    
+    fmt = (request.args.get("format") or "ndjson").strip().lower()
+    try:
+        body = export.export(storage, dataset, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    content_type, extension = export.FORMATS[fmt]
+    # content_type, а не mimetype: charset для csv уже указан в FORMATS
+    return Response(body, content_type=content_type, headers={
+        "Content-Disposition": f'attachment; filename="{dataset}.{extension}"',
+        "Cache-Control": "no-store",
+    })
+
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_response_cache_stats():
+    """Статистика кеша ответов API (размер, hit ratio), объединения запросов и лимита"""
+    stats = response_cache.get_stats()
+    stats["storage_version"] = storage.get_version() if storage else None
+    stats["single_flight"] = single_flight.get_stats()
+    stats["rate_limit"] = rate_limiter.get_stats()
+    return jsonify(stats)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus (вне /api/ — без лимита запросов)"""
+    return Response(metrics.REGISTRY.render(), mimetype=None, headers={
+        "Content-Type": metrics.CONTENT_TYPE,
+        "Cache-Control": "no-store",
+    })
+
+
+@app.route('/api/debug/lock-profile', methods=['GET'])
+def get_lock_profile():
+    """Профиль блокировки хранилища: ожидание/удержание по методам и кто кого блокирует"""
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 503
+    return jsonify(storage.get_lock_profile())
+
+
+@app.route('/api/debug/lock-profile', methods=['POST'])
+def set_lock_profile():
+    """
+    Включение/выключение профиля блокировки на лету
+
+    Тело: {"enabled": true|false, "reset": false}
+    """
+    if not storage:
+        return jsonify({"error": "Storage not initialized"}), 503
+    body = request.get_json(silent=True) or {}
+    enabled = body.get("enabled", True)
+    reset = body.get("reset", False)
+    if not isinstance(enabled, bool) or not isinstance(reset, bool):
+        return jsonify({"error": "enabled и reset должны быть boolean"}), 400
+    storage.set_lock_profiling(enabled, reset)
+    logger.info("Профиль блокировки хранилища: %s", "включён" if enabled else "выключен")
+    return jsonify(storage.get_lock_profile())
+
+
+@app.route('/api/rules', methods=['GET'])
+def get_classification_rules():
+    """Активные правила классификации и статистика кеша"""
+    rules = get_rules()
+    return jsonify({
+        "revision": rules.revision,
+        "source": rules.source,
+        "vendor_keywords": len(rules.vendor_keywords),
+        "allowed_device_types": (
+            sorted(rules.allowed_device_types) if rules.allowed_device_types is not None else None
+        ),
+        "cache": get_cache_stats(),
+    })
+
+
+@app.route('/api/rules/reload', methods=['POST'])
+def reload_classification_rules():
+    """
+    Перезагрузка правил классификации из файла (CLASSIFICATION_RULES_PATH) без рестарта
+    
+    Файл разбирается и правила переключаются синхронно: некорректный файл — 400
+    с ошибкой (активными остаются прежние правила). Переклассификация
+    сохранённых устройств — в фоне.
+    
+    Тело (опционально): {"reclassify": true} — переклассифицировать сохранённые устройства
+    """
+    body = request.get_json(silent=True) or {}
+    reclassify = body.get("reclassify")
+    reclassify = RECLASSIFY_ON_RULES_RELOAD if reclassify is None else bool(reclassify)
+    previous = get_rules().revision
+    try:
+        rules = reload_rules()
+    except (OSError, ValueError) as e:
+        logger.error(f"Перезагрузка правил классификации не удалась: {e}")
+        return jsonify({"error": str(e), "revision": previous}), 400
+    
+    if reclassify:
+        threading.Thread(target=_reclassify_storage, args=(rules,), name="rules-reclassify", daemon=True).start()
     return jsonify({
-        "timeframe": label,
-        "start_ts": start_ts,
-        "end_ts": now_ts,
-        "bucket_sec": bucket_sec,
-        "points": points,
+        "status": "reloaded",
+        "revision": rules.revision,
+        "previous_revision": previous,
+        "reclassifying": reclassify,
     })
 
 
@@ -6,8 +6,17 @@ OEM-производителей Wi-Fi чипов к типу устройств
 
 Типы устройств: smartphone, tablet, laptop, smartwatch, iot, other
 """
+import atexit
+import hashlib
+import json
 import logging
-from typing import Dict, Optional, Tuple
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+
+from classification_cache import CacheEntry, ClassificationCache
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +26,35 @@ logger = logging.getLogger(__name__)
 
 _mac_lookup = None
 
+# Путь к локальному файлу OUI в формате mac-vendor-lookup ("PREFIX:Vendor").
+# None — стандартный кеш библиотеки (~/.cache/mac-vendors.txt).
+_oui_db_path: Optional[str] = os.getenv("OUI_DB_PATH") or None
+
+
+def configure_oui_database(path: Optional[str]) -> None:
+    """
+    Переключение на другой файл OUI базы (например, вендоренный снимок
+    для офлайн-бенчмарков). Сбрасывает singleton MacLookup.
+
+    Args:
+        path: Путь к файлу "PREFIX:Vendor" или None (кеш библиотеки)
+    """
+    global _mac_lookup, _oui_db_path
+    _oui_db_path = path
+    _mac_lookup = None
+    # Другая база — другие результаты: пересоздаём кеш с новой версией
+    if _state is not None:
+        configure_classification_cache(_state.cache.path)
+
+
 def _get_mac_lookup():
     """Ленивая инициализация MacLookup (singleton)."""
     global _mac_lookup
     if _mac_lookup is None:
         try:
-            from mac_vendor_lookup import MacLookup
+            from mac_vendor_lookup import BaseMacLookup, MacLookup
+            if _oui_db_path:
+                BaseMacLookup.cache_path = os.path.abspath(_oui_db_path)
             _mac_lookup = MacLookup()
             logger.info("mac-vendor-lookup инициализирован (полная IEEE OUI база)")
         except ImportError:
@@ -112,6 +144,356 @@ _VENDOR_KEYWORDS: list[Tuple[str, str, Optional[str]]] = [
     ("ubiquiti",                "iot",         None),
 ]
 
+# Маппинг известных длинных названий vendor → коротких (первое вхождение побеждает)
+_SHORT_NAMES = {
+    "apple": "Apple",
+    "samsung electronics": "Samsung",
+    "samsung electro-mechanics": "Samsung",
+    "xiaomi": "Xiaomi",
+    "beijing xiaomi": "Xiaomi",
+    "huawei": "Huawei",
+    "honor device": "Honor",
+    "google": "Google",
+    "oneplus": "OnePlus",
+    "oppo": "OPPO",
+    "realme": "Realme",
+    "vivo mobile": "Vivo",
+    "vivo": "Vivo",
+    "motorola": "Motorola",
+    "lenovo": "Lenovo",
+    "sony": "Sony",
+    "lg electronics": "LG",
+    "lg innotek": "LG",
+    "zte": "ZTE",
+    "meizu": "Meizu",
+    "nokia": "Nokia",
+    "hmd global": "Nokia",
+    "asus": "ASUS",
+    "tcl": "TCL",
+    "nothing technology": "Nothing",
+    "intel corporate": "Intel",
+    "intel": "Intel",
+    "azurewave": "AzureWave",
+    "liteon": "Liteon",
+    "qualcomm": "Qualcomm",
+    "mediatek": "MediaTek",
+    "dell": "Dell",
+    "hewlett packard": "HP",
+    "hp inc": "HP",
+    "microsoft": "Microsoft",
+    "cloud network technology": "Foxconn",
+    "cloud network tech": "Foxconn",
+    "hon hai": "Foxconn",
+    "foxconn": "Foxconn",
+    "fibocom": "Fibocom",
+    "amazon": "Amazon",
+    "fitbit": "Fitbit",
+    "garmin": "Garmin",
+    "espressif": "Espressif",
+    "raspberry pi": "Raspberry Pi",
+    "hikvision": "Hikvision",
+    "dahua": "Dahua",
+    "tp-link": "TP-Link",
+    "ubiquiti": "Ubiquiti",
+}
+
+# Юридические суффиксы, обрезаемые у названий вне _SHORT_NAMES
+_LEGAL_SUFFIXES = (
+    " Co.,Ltd", " Co., Ltd.", " Inc.", " Corp.", " Corporation",
+    " PTE. LTD.", " Pte. Ltd.", " Ltd.", " Ltd", " LLC",
+    " GmbH", " AG", " S.A.", " Limited",
+)
+
+# Ревизия логики classify(), не выраженной в таблицах выше.
+# Увеличивать при изменении правил — это инвалидирует кеш классификации.
+_CLASSIFIER_LOGIC_REVISION = 1
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Правила классификации (загрузка из файла, горячая перезагрузка)
+#
+# Таблицы выше — встроенные правила по умолчанию. Файл правил (JSON,
+# CLASSIFICATION_RULES_PATH) может переопределить любую из секций:
+#   {"vendor_keywords": [["apple", "smartphone", "apple"], ...],
+#    "short_names": [["apple", "Apple"], ...],
+#    "legal_suffixes": [" Inc.", ...],
+#    "allowed_device_types": ["smartphone", "laptop", ...]}
+# Шаблон с текущими правилами: python device_classifier.py --dump-rules
+# ──────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class ClassificationRules:
+    """
+    Неизменяемый набор правил. Заменяется целиком вместе с кешем
+    (одно присваивание ссылки), поэтому classify() всегда видит
+    согласованные правила и результаты.
+    """
+    vendor_keywords: Tuple[Tuple[str, str, Optional[str]], ...]
+    short_names: Tuple[Tuple[str, str], ...]
+    legal_suffixes: Tuple[str, ...]
+    allowed_device_types: Optional[FrozenSet[str]] = None  # None — из config
+    source: Optional[str] = None
+    revision: str = field(init=False, default="")
+
+    def __post_init__(self):
+        # allowed_device_types на результат classify() не влияет — в ревизию не входит
+        payload = json.dumps(
+            [self.vendor_keywords, self.short_names, self.legal_suffixes, _CLASSIFIER_LOGIC_REVISION],
+            sort_keys=True,
+        )
+        object.__setattr__(self, "revision", hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12])
+
+    def to_json(self) -> Dict:
+        return {
+            "vendor_keywords": [list(k) for k in self.vendor_keywords],
+            "short_names": [list(n) for n in self.short_names],
+            "legal_suffixes": list(self.legal_suffixes),
+            "allowed_device_types": (
+                sorted(self.allowed_device_types) if self.allowed_device_types is not None else None
+            ),
+        }
+
+
+DEFAULT_RULES = ClassificationRules(
+    vendor_keywords=tuple(_VENDOR_KEYWORDS),
+    short_names=tuple(_SHORT_NAMES.items()),
+    legal_suffixes=_LEGAL_SUFFIXES,
+)
+
+_rules_path: Optional[str] = os.getenv("CLASSIFICATION_RULES_PATH") or None
+
+
+def load_rules(path: str) -> ClassificationRules:
+    """
+    Загрузка правил из JSON файла. Отсутствующие секции — встроенные.
+
+    Raises:
+        ValueError: некорректный формат файла
+        OSError: файл недоступен
+    """
+    with open(path, encoding="utf-8") as f:
+        try:
+            raw = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Некорректный JSON в {path}: {e}") from e
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: ожидается JSON объект")
+
+    try:
+        keywords = DEFAULT_RULES.vendor_keywords
+        if "vendor_keywords" in raw:
+            keywords = tuple(
+                (str(kw).lower(), str(device_type), brand if brand is None else str(brand))
+                for kw, device_type, brand in raw["vendor_keywords"]
+            )
+        short_names = DEFAULT_RULES.short_names
+        if "short_names" in raw:
+            pairs = raw["short_names"].items() if isinstance(raw["short_names"], dict) else raw["short_names"]
+            short_names = tuple((str(key).lower(), str(short)) for key, short in pairs)
+        suffixes = DEFAULT_RULES.legal_suffixes
+        if "legal_suffixes" in raw:
+            suffixes = tuple(str(x) for x in raw["legal_suffixes"])
+        allowed = raw.get("allowed_device_types")
+        if allowed is not None:
+            allowed = frozenset(str(x) for x in allowed)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"{path}: некорректная секция правил: {e}") from e
+
+    return ClassificationRules(keywords, short_names, suffixes, allowed, source=os.path.abspath(path))
+
+
+# ──────────────────────────────────────────────────────────────────────
+# Состояние классификатора: правила + кеш по OUI (память + SQLite,
+# см. classification_cache.py). Заменяется атомарно.
+# ──────────────────────────────────────────────────────────────────────
+
+class _ClassifierState:
+    __slots__ = ("rules", "cache")
+
+    def __init__(self, rules: ClassificationRules, cache: ClassificationCache):
+        self.rules = rules
+        self.cache = cache
+
+
+_state: Optional[_ClassifierState] = None
+_state_lock = threading.Lock()
+# Сериализует перезагрузки правил (построение нового кеша + переключение)
+_reload_lock = threading.Lock()
+
+
+def _initial_rules() -> ClassificationRules:
+    if not _rules_path:
+        return DEFAULT_RULES
+    try:
+        rules = load_rules(_rules_path)
+        logger.info(f"Правила классификации загружены из {_rules_path} (ревизия {rules.revision})")
+        return rules
+    except (OSError, ValueError) as e:
+        logger.warning(f"Не удалось загрузить правила {_rules_path}: {e} — используются встроенные")
+        return DEFAULT_RULES
+
+
+def _get_state() -> _ClassifierState:
+    state = _state
+    if state is None:
+        with _state_lock:
+            if _state is None:
+                rules = _initial_rules()
+                _swap_state(rules, ClassificationCache(None, cache_version(rules)))
+            state = _state
+    return state
+
+
+def _swap_state(rules: ClassificationRules, cache: ClassificationCache) -> None:
+    global _state
+    old = _state
+    _state = _ClassifierState(rules, cache)
+    if old is not None and old.cache is not cache:
+        old.cache.close()
+
+
+def get_rules() -> ClassificationRules:
+    """Активные правила классификации."""
+    return _get_state().rules
+
+
+def get_allowed_device_types() -> Optional[FrozenSet[str]]:
+    """Типы для фильтрации из файла правил (None — не заданы в файле)."""
+    return _get_state().rules.allowed_device_types
+
+
+def rules_revision() -> str:
+    """Хеш активных правил классификации (keywords, короткие имена, логика)."""
+    return _get_state().rules.revision
+
+
+def oui_database_fingerprint() -> str:
+    """
+    Отпечаток OUI базы (путь, размер, mtime) без её загрузки.
+    "none" — файл базы не найден.
+    """
+    path = _oui_db_path
+    if not path:
+        try:
+            from mac_vendor_lookup import BaseMacLookup
+            path = BaseMacLookup().find_vendors_list()
+        except ImportError:
+            path = None
+    if not path or not os.path.exists(path):
+        return "none"
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}:{st.st_size}:{int(st.st_mtime)}"
+
+
+def cache_version(rules: Optional[ClassificationRules] = None) -> str:
+    """Версия кеша классификации: OUI база + ревизия правил."""
+    rules = rules or _get_state().rules
+    fingerprint = hashlib.sha1(oui_database_fingerprint().encode("utf-8")).hexdigest()[:12]
+    return f"oui-{fingerprint}.rules-{rules.revision}"
+
+
+def configure_classification_cache(path: Optional[str]) -> ClassificationCache:
+    """
+    Включение кеша классификации.
+
+    Args:
+        path: SQLite файл (разделяется между процессами) или None — только память
+
+    Returns:
+        Активный экземпляр кеша
+    """
+    rules = _state.rules if _state is not None else _initial_rules()
+    cache = ClassificationCache(path, cache_version(rules))
+    with _state_lock:
+        _swap_state(rules, cache)
+    return cache
+
+
+def reload_rules(path: Optional[str] = None) -> ClassificationRules:
+    """
+    Перезагрузка правил из файла без остановки classify().
+
+    Новый кеш строится и прогревается (OUI, уже встречавшиеся под старыми
+    правилами, классифицируются заново) до переключения; само переключение —
+    одно присваивание ссылки на состояние.
+
+    Args:
+        path: Файл правил (None — ранее заданный / CLASSIFICATION_RULES_PATH)
+
+    Returns:
+        Новые активные правила
+
+    Raises:
+        ValueError, OSError: файл правил некорректен или недоступен
+    """
+    global _rules_path
+    with _reload_lock:
+        path = path or _rules_path
+        rules = load_rules(path) if path else DEFAULT_RULES
+
+        old = _get_state()
+        cache = ClassificationCache(old.cache.path, cache_version(rules))
+        warmed = 0
+        for oui, entry in old.cache.snapshot().items():
+            if cache.get(oui) is not None:
+                continue
+            if entry[0] is None:
+                # Vendor не найден в OUI базе — от правил не зависит
+                cache.put(oui, entry)
+            else:
+                cache.put(oui, _lookup_oui(f"{oui}:00:00:00", rules))
+            warmed += 1
+        cache.flush()
+
+        _rules_path = path
+        with _state_lock:
+            _swap_state(rules, cache)
+    logger.info(
+        f"Правила классификации перезагружены (ревизия {old.rules.revision} → {rules.revision}, "
+        f"прогрето OUI: {warmed})"
+    )
+    return rules
+
+
+def reload_rules_async(
+    path: Optional[str] = None,
+    on_reloaded: Optional[Callable[[ClassificationRules], None]] = None,
+) -> threading.Thread:
+    """
+    reload_rules() в фоновом потоке; ingest продолжает работать на старых
+    правилах до переключения.
+
+    Args:
+        path: Файл правил
+        on_reloaded: Вызывается после переключения (например, переклассификация хранилища)
+    """
+    def _run():
+        try:
+            rules = reload_rules(path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Перезагрузка правил классификации не удалась: {e}")
+            return
+        if on_reloaded is not None:
+            try:
+                on_reloaded(rules)
+            except Exception as e:
+                logger.error(f"Ошибка после перезагрузки правил: {e}", exc_info=True)
+
+    thread = threading.Thread(target=_run, name="rules-reload", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_cache_stats() -> Dict:
+    """Статистика кеша классификации (hits/misses)."""
+    return _get_state().cache.get_stats()
+
+
+@atexit.register
+def _flush_cache_at_exit() -> None:
+    if _state is not None:
+        _state.cache.close()
+
 
 # ──────────────────────────────────────────────────────────────────────
 # Функции
@@ -189,7 +571,7 @@ def vendor_by_oui(mac: str) -> Optional[str]:
         return None
 
 
-def _classify_by_vendor(vendor_raw: str) -> Tuple[str, Optional[str]]:
+def _classify_by_vendor(vendor_raw: str, rules: Optional[ClassificationRules] = None) -> Tuple[str, Optional[str]]:
     """
     Определение типа устройства и бренда по строке vendor.
 
@@ -197,19 +579,55 @@ def _classify_by_vendor(vendor_raw: str) -> Tuple[str, Optional[str]]:
 
     Args:
         vendor_raw: Полное название вендора из IEEE базы
+        rules: Набор правил (None — активные)
 
     Returns:
         (device_type, device_brand)
     """
     vendor_lower = vendor_raw.lower()
 
-    for keyword, device_type, device_brand in _VENDOR_KEYWORDS:
+    rules = rules or _get_state().rules
+    for keyword, device_type, device_brand in rules.vendor_keywords:
         if keyword in vendor_lower:
             return device_type, device_brand
 
     return "other", None
 
 
+def _lookup_oui(mac_normalized: str, rules: ClassificationRules) -> CacheEntry:
+    """
+    Классификация по OUI без учёта рандомизации.
+
+    Returns:
+        (vendor_display, device_type, device_brand); vendor_display=None — vendor не найден
+    """
+    vendor_raw = vendor_by_oui(mac_normalized)
+    if not vendor_raw:
+        return None, "other", None
+    device_type, device_brand = _classify_by_vendor(vendor_raw, rules)
+    return _short_vendor_name(vendor_raw, rules), device_type, device_brand
+
+
+def _classify_oui(mac_normalized: str) -> CacheEntry:
+    """
+    _lookup_oui() через кеш классификации.
+
+    MAC с LAA-битом (рандомные) не кешируются: их "OUI" случайны
+    и только раздували бы кеш.
+    """
+    # Правила и кеш берутся из одного снимка состояния
+    state = _get_state()
+    if int(mac_normalized[:2], 16) & 0x02:
+        return _lookup_oui(mac_normalized, state.rules)
+
+    oui = mac_normalized[:8]
+    entry = state.cache.get(oui)
+    if entry is None:
+        entry = _lookup_oui(mac_normalized, state.rules)
+        state.cache.put(oui, entry)
+    return entry
+
+
 def classify(mac: str, rssi: int, flag_r: Optional[int] = None) -> Dict:
     """
     Классификация устройства по MAC адресу.
@@ -240,14 +658,9 @@ def classify(mac: str, rssi: int, flag_r: Optional[int] = None) -> Dict:
         }
 
     randomized = is_randomized(mac_normalized, flag_r)
-    vendor_raw = vendor_by_oui(mac_normalized)
-
-    device_type = "other"
-    device_brand = None
-
-    if vendor_raw:
-        device_type, device_brand = _classify_by_vendor(vendor_raw)
+    vendor_display, device_type, device_brand = _classify_oui(mac_normalized)
 
+    if vendor_display is not None:
         # Laptop-OEM (Intel, AzureWave, Foxconn и т.д.) — тип "laptop"
         # только если MAC реальный. Рандомный MAC с OUI чипмейкера → "other".
         if device_type == "laptop" and randomized:
@@ -260,9 +673,6 @@ def classify(mac: str, rssi: int, flag_r: Optional[int] = None) -> Dict:
             # от смартфонов (iOS 14+, Android 10+).
             device_type = "smartphone"
 
-    # Формируем короткое имя вендора для отображения
-    vendor_display = _short_vendor_name(vendor_raw) if vendor_raw else None
-
     return {
         "mac": mac_normalized,
         "rssi": rssi,
@@ -273,7 +683,7 @@ def classify(mac: str, rssi: int, flag_r: Optional[int] = None) -> Dict:
     }
 
 
-def _short_vendor_name(vendor_raw: str) -> str:
+def _short_vendor_name(vendor_raw: str, rules: Optional[ClassificationRules] = None) -> str:
     """
     Сокращение длинного юридического названия вендора до короткого.
 
@@ -281,71 +691,17 @@ def _short_vendor_name(vendor_raw: str) -> str:
     'Samsung Electronics Co.,Ltd' → 'Samsung'
     'Apple, Inc.' → 'Apple'
     """
-    # Маппинг известных длинных → коротких
-    _SHORT_NAMES = {
-        "apple": "Apple",
-        "samsung electronics": "Samsung",
-        "samsung electro-mechanics": "Samsung",
-        "xiaomi": "Xiaomi",
-        "beijing xiaomi": "Xiaomi",
-        "huawei": "Huawei",
-        "honor device": "Honor",
-        "google": "Google",
-        "oneplus": "OnePlus",
-        "oppo": "OPPO",
-        "realme": "Realme",
-        "vivo mobile": "Vivo",
-        "vivo": "Vivo",
-        "motorola": "Motorola",
-        "lenovo": "Lenovo",
-        "sony": "Sony",
-        "lg electronics": "LG",
-        "lg innotek": "LG",
-        "zte": "ZTE",
-        "meizu": "Meizu",
-        "nokia": "Nokia",
-        "hmd global": "Nokia",
-        "asus": "ASUS",
-        "tcl": "TCL",
-        "nothing technology": "Nothing",
-        "intel corporate": "Intel",
-        "intel": "Intel",
-        "azurewave": "AzureWave",
-        "liteon": "Liteon",
-        "qualcomm": "Qualcomm",
-        "mediatek": "MediaTek",
-        "dell": "Dell",
-        "hewlett packard": "HP",
-        "hp inc": "HP",
-        "microsoft": "Microsoft",
-        "cloud network technology": "Foxconn",
-        "cloud network tech": "Foxconn",
-        "hon hai": "Foxconn",
-        "foxconn": "Foxconn",
-        "fibocom": "Fibocom",
-        "amazon": "Amazon",
-        "fitbit": "Fitbit",
-        "garmin": "Garmin",
-        "espressif": "Espressif",
-        "raspberry pi": "Raspberry Pi",
-        "hikvision": "Hikvision",
-        "dahua": "Dahua",
-        "tp-link": "TP-Link",
-        "ubiquiti": "Ubiquiti",
-    }
 
+    rules = rules or _get_state().rules
     vendor_lower = vendor_raw.lower()
-    for key, short in _SHORT_NAMES.items():
+    for key, short in rules.short_names:
         if key in vendor_lower:
             return short
 
     # Если не нашли в маппинге — обрезаем юридические суффиксы
-    import re
     # Заменяем unicode-пробелы на обычные
     name = re.sub(r'\s+', ' ', vendor_raw)
-    for suffix in [" Co.,Ltd", " Co., Ltd.", " Inc.", " Corp.", " Corporation",
-                   " PTE. LTD.", " Pte. Ltd.", " Ltd.", " Ltd", " LLC",
-                   " GmbH", " AG", " S.A.", " Limited"]:
+    for suffix in rules.legal_suffixes:
         if name.endswith(suffix):
             name = name[: -len(suffix)]
             break
@@ -354,6 +710,13 @@ def _short_vendor_name(vendor_raw: str) -> str:
 
 
 if __name__ == "__main__":
+    import sys
+
+    if "--dump-rules" in sys.argv:
+        # Шаблон файла правил (CLASSIFICATION_RULES_PATH) с активными правилами
+        print(json.dumps(get_rules().to_json(), ensure_ascii=False, indent=2))
+        sys.exit(0)
+
     # Self-test
     print("=== Device Classifier Self-Test ===\n")
 
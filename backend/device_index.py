@@ -0,0 +1,285 @@
+"""
+Индексы устройств WiFiDataStorage для постраничной выдачи /api/devices.
+
+- для каждого ключа сортировки — отсортированный список (значение, mac)
+  (bisect: вставка/удаление O(log n) поиска + сдвиг массива)
+- для полей фильтрации по равенству (device_type, device_brand, vendor,
+  randomized) — {значение: set(mac)}
+- агрегаты для дашборда (активные, по типам, по вендорам, доля рандомных
+  MAC) — счётчики, обновляемые в add()/remove()
+- число устройств с last_seen в диапазоне — два bisect по списку last_seen
+
+Индекс не потокобезопасен сам по себе: все вызовы идут под _lock хранилища.
+
+Пагинация — keyset (курсор = ключ сортировки + MAC последнего элемента
+страницы), поэтому новые устройства между запросами не сдвигают страницы.
+Стоимость страницы пропорциональна её размеру: проход по списку сортировки
+с проверкой фильтров, а при селективном фильтре по равенству — сортировка
+только подходящих MAC.
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# Ключ сортировки API -> поле записи устройства
+SORT_FIELDS = {
+    "last_seen": "last_seen",
+    "first_seen": "first_seen",
+    "rssi": "latest_rssi",
+    "count": "count",
+}
+
+# Ключи сортировки с числовыми значениями (значение в курсоре — int/float, иначе str)
+NUMERIC_SORTS = frozenset({"last_seen", "first_seen", "rssi", "count"})
+
+# Поля фильтрации по равенству (значения нормализуются: lower())
+EQUALITY_FIELDS = ("device_type", "device_brand", "vendor", "randomized")
+
+# Поля, по которым ведутся счётчики для дашборда (исходные значения, без нормализации)
+COUNTED_FIELDS = ("device_type", "vendor")
+
+# Если подходящих по равенству MAC меньше len(devices) / _SELECTIVE_RATIO —
+# сортируем их напрямую вместо прохода по общему списку
+_SELECTIVE_RATIO = 8
+
+
+def _norm(value: Any) -> Any:
+    if isinstance(value, bool) or value is None:
+        return value
+    return str(value).strip().lower()
+
+
+class DeviceQuery:
+    """Параметры выборки устройств (фильтры, сортировка, курсор)"""
+
+    def __init__(
+        self,
+        sort: str = "last_seen",
+        descending: bool = True,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        equals: Optional[Dict[str, Iterable[Any]]] = None,
+        rssi_min: Optional[int] = None,
+        rssi_max: Optional[int] = None,
+        last_seen_from: Optional[int] = None,
+        last_seen_to: Optional[int] = None,
+    ):
+        """
+        Args:
+            sort: Ключ сортировки (см. SORT_FIELDS)
+            descending: Порядок по убыванию
+            limit: Размер страницы (None — все подходящие)
+            cursor: Курсор из next_cursor предыдущей страницы
+            equals: {поле: допустимые значения} для полей EQUALITY_FIELDS
+            rssi_min/rssi_max: Диапазон latest_rssi (включительно)
+            last_seen_from/last_seen_to: Диапазон last_seen (включительно)
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Неизвестный ключ сортировки: {sort}")
+        for field in (equals or {}):
+            if field not in EQUALITY_FIELDS:
+                raise ValueError(f"Фильтр по полю {field} не поддерживается")
+        self.sort = sort
+        self.descending = descending
+        self.limit = limit
+        self.after = decode_cursor(cursor, sort, descending) if cursor else None
+        self.equals = {field: {_norm(v) for v in values} for field, values in (equals or {}).items()}
+        self.rssi_min = rssi_min
+        self.rssi_max = rssi_max
+        self.last_seen_from = last_seen_from
+        self.last_seen_to = last_seen_to
+
+    def matches(self, info: Dict) -> bool:
+        """Проверка диапазонных фильтров (равенство проверяется по индексу)"""
+        rssi = info.get("latest_rssi", 0)
+        if self.rssi_min is not None and rssi < self.rssi_min:
+            return False
+        if self.rssi_max is not None and rssi > self.rssi_max:
+            return False
+        last_seen = info.get("last_seen", 0)
+        if self.last_seen_from is not None and last_seen < self.last_seen_from:
+            return False
+        if self.last_seen_to is not None and last_seen > self.last_seen_to:
+            return False
+        return True
+
+
+def encode_cursor(sort: str, descending: bool, key: Tuple[Any, str]) -> str:
+    """Непрозрачный курсор (base64url JSON)"""
+    raw = json.dumps([sort, descending, key[0], key[1]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, descending: bool) -> Tuple[Any, str]:
+    """Ключ (значение, mac) из курсора; ValueError при несовпадении сортировки или типов"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        c_sort, c_desc, value, mac = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if c_sort != sort or c_desc != descending:
+        raise ValueError("Курсор выдан для другой сортировки")
+    # Ключ сравнивается с ключами индекса в bisect — тип должен совпадать
+    if sort in NUMERIC_SORTS:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = isinstance(value, str)
+    if not valid or not isinstance(mac, str):
+        raise ValueError("Некорректный курсор")
+    return (value, mac)
+
+
+class DeviceIndex:
+    """Вторичные индексы по устройствам хранилища"""
+
+    def __init__(self):
+        self._sorted: Dict[str, List[Tuple[Any, str]]] = {field: [] for field in SORT_FIELDS.values()}
+        self._equals: Dict[str, Dict[Any, Set[str]]] = {field: {} for field in EQUALITY_FIELDS}
+        # Агрегаты: устройства с count > 1, счётчики по полям, рандомные MAC
+        self._active = 0
+        self._counts: Dict[str, Counter] = {field: Counter() for field in COUNTED_FIELDS}
+        self._randomized = 0
+
+    def __len__(self) -> int:
+        return len(self._sorted["last_seen"])
+
+    def add(self, mac: str, info: Dict) -> None:
+        for field, keys in self._sorted.items():
+            insort(keys, (info.get(field, 0), mac))
+        for field, values in self._equals.items():
+            values.setdefault(_norm(info.get(field)), set()).add(mac)
+        if info.get("count", 0) > 1:
+            self._active += 1
+        for field, counter in self._counts.items():
+            counter[info.get(field)] += 1
+        if info.get("randomized"):
+            self._randomized += 1
+
+    def remove(self, mac: str, info: Dict) -> None:
+        for field, keys in self._sorted.items():
+            key = (info.get(field, 0), mac)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        for field, values in self._equals.items():
+            value = _norm(info.get(field))
+            macs = values.get(value)
+            if macs is not None:
+                macs.discard(mac)
+                if not macs:
+                    del values[value]
+        if info.get("count", 0) > 1:
+            self._active -= 1
+        for field, counter in self._counts.items():
+            value = info.get(field)
+            counter[value] -= 1
+            if counter[value] <= 0:
+                del counter[value]
+        if info.get("randomized"):
+            self._randomized -= 1
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def aggregates(self, top_vendors: int = 20) -> Dict:
+        """
+        Агрегаты по всем устройствам (без прохода по устройствам)
+
+        Returns:
+            {"total", "active_devices", "randomized", "randomized_ratio",
+             "by_type": {тип: кол-во}, "by_vendor": {vendor: кол-во} (top_vendors крупнейших)}
+        """
+        total = len(self)
+        return {
+            "total": total,
+            "active_devices": self._active,
+            "randomized": self._randomized,
+            "randomized_ratio": self._randomized / total if total else 0.0,
+            "by_type": {(k or "unknown"): v for k, v in self._counts["device_type"].items()},
+            "by_vendor": {(k or "unknown"): v for k, v in self._counts["vendor"].most_common(top_vendors)},
+        }
+
+    def count_last_seen(self, start_ts: int, end_ts: int) -> int:
+        """Количество устройств с last_seen в [start_ts, end_ts] (O(log n))"""
+        keys = self._sorted["last_seen"]
+        return bisect_left(keys, (end_ts + 1, "")) - bisect_left(keys, (start_ts, ""))
+
+    def oldest(self) -> Optional[str]:
+        """MAC с минимальным last_seen (кандидат на вытеснение)"""
+        keys = self._sorted["last_seen"]
+        return keys[0][1] if keys else None
+
+    def _candidates(self, query: DeviceQuery) -> Optional[Set[str]]:
+        """Пересечение фильтров по равенству (None — фильтров нет)"""
+        result: Optional[Set[str]] = None
+        for field, wanted in sorted(query.equals.items(), key=lambda kv: len(kv[1])):
+            index = self._equals[field]
+            macs: Set[str] = set()
+            for value in wanted:
+                macs |= index.get(value, set())
+            result = macs if result is None else result & macs
+            if not result:
+                break
+        return result
+
+    def _ordered_keys(self, query: DeviceQuery, candidates: Optional[Set[str]], devices: Dict[str, Dict]) -> Iterator[Tuple[Any, str]]:
+        """Ключи (значение, mac) в порядке выдачи, начиная после курсора"""
+        field = SORT_FIELDS[query.sort]
+        if candidates is not None and len(candidates) * _SELECTIVE_RATIO < len(self):
+            keys = sorted((devices[mac].get(field, 0), mac) for mac in candidates)
+        else:
+            keys = self._sorted[field]
+
+        lo, hi = 0, len(keys)
+        # Диапазон по полю сортировки — сразу границы bisect
+        if field == "last_seen":
+            if query.last_seen_from is not None:
+                lo = bisect_left(keys, (query.last_seen_from, ""))
+            if query.last_seen_to is not None:
+                hi = bisect_left(keys, (query.last_seen_to + 1, ""))
+        if query.after is not None:
+            if query.descending:
+                hi = min(hi, bisect_left(keys, query.after))
+            else:
+                lo = max(lo, bisect_right(keys, query.after))
+
+        indices = range(hi - 1, lo - 1, -1) if query.descending else range(lo, hi)
+        for i in indices:
+            yield keys[i]
+
+    def query(self, query: DeviceQuery, devices: Dict[str, Dict]) -> Tuple[List[str], Optional[str]]:
+        """
+        Страница MAC по запросу.
+
+        Args:
+            query: Параметры выборки
+            devices: Записи устройств хранилища (mac -> info)
+
+        Returns:
+            (MAC страницы, курсор следующей страницы или None);
+            limit <= 0 — пустая страница без курсора
+        """
+        if query.limit is not None and query.limit <= 0:
+            return [], None
+        candidates = self._candidates(query)
+        if candidates is not None and not candidates:
+            return [], None
+
+        page: List[str] = []
+        last_key: Optional[Tuple[Any, str]] = None
+        for key in self._ordered_keys(query, candidates, devices):
+            mac = key[1]
+            if candidates is not None and mac not in candidates:
+                continue
+            if not query.matches(devices[mac]):
+                continue
+            if query.limit is not None and len(page) >= query.limit:
+                if last_key is None:
+                    return page, None
+                return page, encode_cursor(query.sort, query.descending, last_key)
+            page.append(mac)
+            last_key = key
+        return page, None
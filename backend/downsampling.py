@@ -0,0 +1,129 @@
+"""
+Прореживание временных рядов для графиков (/api/stats/devices_timeseries).
+
+Ряд — список точек {"t": unix ts, "count": N}, упорядоченный по t.
+
+1. rollup() — агрегация MAX по бакетам фиксированного шага (лестница
+   ROLLUP_STEPS): пики числа устройств не теряются
+2. lttb() — Largest-Triangle-Three-Buckets: ровно max_points точек,
+   визуально сохраняет форму ряда
+   minmax() — альтернатива: минимум и максимум каждого бакета (сохраняет
+   экстремумы, до max_points точек)
+
+Стоимость — O(n) от числа точек в диапазоне.
+"""
+from typing import Dict, List
+
+# Шаги агрегации (сек); 0 — сырые снимки
+ROLLUP_STEPS = (0, 60, 300, 900, 3600, 6 * 3600, 86400)
+
+# Агрегация до max_points * ROLLUP_OVERSAMPLE точек, дальше — прореживание:
+# запас точек сохраняет форму ряда для LTTB
+ROLLUP_OVERSAMPLE = 4
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def choose_rollup(span_sec: int, points: int, max_points: int, min_step: int = 0) -> int:
+    """
+    Шаг агрегации для диапазона
+
+    Args:
+        span_sec: Длина диапазона, сек
+        points: Число сырых точек в диапазоне
+        max_points: Максимум точек в ответе
+        min_step: Минимальный шаг (например, 1 день для 30d)
+
+    Returns:
+        Шаг в секундах (0 — без агрегации)
+    """
+    budget = max_points * ROLLUP_OVERSAMPLE
+    for step in ROLLUP_STEPS:
+        if step < min_step:
+            continue
+        if step == 0:
+            if points <= budget:
+                return 0
+        elif span_sec // step + 1 <= budget:
+            return step
+    return max(ROLLUP_STEPS[-1], min_step)
+
+
+def rollup(points: List[Dict], step: int) -> List[Dict]:
+    """MAX count по бакетам шага step (t точки — начало бакета)"""
+    if step <= 0:
+        return points
+    buckets: Dict[int, int] = {}
+    for p in points:
+        b = (p["t"] // step) * step
+        if b not in buckets or p["count"] > buckets[b]:
+            buckets[b] = p["count"]
+    return [{"t": b, "count": c} for b, c in sorted(buckets.items())]
+
+
+def lttb(points: List[Dict], max_points: int) -> List[Dict]:
+    """
+    Largest-Triangle-Three-Buckets (Steinarsson, 2013)
+
+    Первая и последняя точки сохраняются; из каждого из max_points - 2
+    бакетов берётся точка, образующая наибольший треугольник с выбранной
+    точкой предыдущего бакета и средним следующего.
+    """
+    n = len(points)
+    if max_points >= n or max_points < 3:
+        return points
+
+    every = (n - 2) / (max_points - 2)
+    sampled = [points[0]]
+    a = 0
+    for i in range(max_points - 2):
+        # Среднее следующего бакета
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        next_len = next_end - next_start
+        avg_t = sum(points[j]["t"] for j in range(next_start, next_end)) / next_len
+        avg_c = sum(points[j]["count"] for j in range(next_start, next_end)) / next_len
+
+        # Точка текущего бакета с максимальной площадью треугольника
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        at, ac = points[a]["t"], points[a]["count"]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((at - avg_t) * (points[j]["count"] - ac) - (at - points[j]["t"]) * (avg_c - ac))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points: List[Dict], max_points: int) -> List[Dict]:
+    """Минимум и максимум count в каждом из max_points // 2 бакетов (в порядке t)"""
+    n = len(points)
+    if max_points >= n or max_points < 2:
+        return points
+    buckets = max_points // 2
+    every = n / buckets
+    sampled = []
+    for i in range(buckets):
+        chunk = points[int(i * every):int((i + 1) * every)]
+        if not chunk:
+            continue
+        lo = min(chunk, key=lambda p: p["count"])
+        hi = max(chunk, key=lambda p: p["count"])
+        if lo is hi:
+            sampled.append(lo)
+        else:
+            sampled.extend((lo, hi) if lo["t"] <= hi["t"] else (hi, lo))
+    return sampled
+
+
+def downsample(points: List[Dict], max_points: int, method: str = "lttb") -> List[Dict]:
+    """Прореживание до max_points точек выбранным методом (DOWNSAMPLE_METHODS)"""
+    if method == "minmax":
+        return minmax(points, max_points)
+    return lttb(points, max_points)
@@ -0,0 +1,271 @@
+"""
+Push-поток обновлений для дашборда (Server-Sent Events).
+
+После каждого add_data() хранилище отдаёт дельту (изменённые устройства,
+новая точка снимка, счётчики сводки). Дельта сериализуется ОДИН раз в
+готовый SSE кадр (bytes) и рассылается всем подключениям.
+
+Сервер — asyncio в одном отдельном потоке и на отдельном порту (SSE_PORT):
+сотни простаивающих подключений — это сокеты в одном event loop, а не
+поток на клиента, как у потокового ответа Flask/werkzeug. Медленный клиент,
+у которого буфер отправки превысил max_buffer, отключается и при
+переподключении (EventSource делает это сам) получает свежее состояние.
+
+Протокол:
+  GET /api/stream        text/event-stream
+    event: hello  — при подключении: {"version", "summary"}; клиент
+                    загружает полное состояние через REST API
+    event: batch  — дельта после каждого батча (id: версия хранилища)
+    ": keepalive" — комментарий раз в keepalive_sec
+  GET /api/stream/stats  JSON: подключения, события, байты
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Callable, Dict, Optional, Set
+
+import fast_json
+from storage import WiFiDataStorage
+
+logger = logging.getLogger("event_stream")
+
+# Максимальный размер заголовков запроса
+_MAX_REQUEST_BYTES = 8192
+
+_CORS_HEADERS = "Access-Control-Allow-Origin: *\r\n"
+
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    """SSE кадр (data — одна строка JSON)"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: ".encode("utf-8") + fast_json.dumps(data) + b"\n\n"
+
+
+class EventStreamServer:
+    """SSE сервер на asyncio: одна сериализация на батч, рассылка всем клиентам"""
+
+    def __init__(
+        self,
+        storage: WiFiDataStorage,
+        host: str = "0.0.0.0",
+        port: int = 5001,
+        keepalive_sec: int = 15,
+        max_clients: int = 1000,
+        max_buffer: int = 1 << 20,
+        device_formatter: Optional[Callable[[Dict], Dict]] = None,
+    ):
+        """
+        Args:
+            storage: Хранилище (источник дельт)
+            host: Адрес для прослушивания
+            port: Порт SSE
+            keepalive_sec: Интервал keepalive-комментариев
+            max_clients: Максимум одновременных подключений (сверх — 503)
+            max_buffer: Порог буфера отправки клиента (байт), после которого он отключается
+            device_formatter: Преобразование записи устройства для клиента (формат REST API)
+        """
+        self.storage = storage
+        self.host = host
+        self.port = port
+        self.keepalive_sec = keepalive_sec
+        self.max_clients = max_clients
+        self.max_buffer = max_buffer
+        self.device_formatter = device_formatter
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+        self.events_published = 0
+        self.bytes_serialized = 0
+        self.clients_total = 0
+        self.clients_dropped = 0
+
+    # ──────────────────────────────────────────────────────────────────
+    # Жизненный цикл
+    # ──────────────────────────────────────────────────────────────────
+
+    def start(self) -> None:
+        """Запуск сервера в отдельном потоке и подписка на дельты хранилища"""
+        self._thread = threading.Thread(target=self._run, name="event-stream", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5)
+        # Без подключённых клиентов хранилище не собирает дельту под блокировкой
+        self.storage.add_listener(self.publish, active=self.has_clients)
+
+    def stop(self) -> None:
+        """Отписка от хранилища и остановка event loop"""
+        self.storage.remove_listener(self.publish)
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, limit=_MAX_REQUEST_BYTES)
+            )
+            self._keepalive_task = loop.create_task(self._keepalive())
+            logger.info(f"SSE поток обновлений: http://{self.host}:{self.port}/api/stream")
+        except OSError as e:
+            logger.error(f"Не удалось запустить SSE сервер на порту {self.port}: {e}")
+            self._ready.set()
+            loop.close()
+            self._loop = None
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _shutdown(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._clients):
+            self._drop(writer)
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+        # Обработчики подключений завершатся сами по закрытию сокетов
+        current = asyncio.current_task()
+        tasks = [t for t in asyncio.all_tasks() if t is not current]
+        if tasks:
+            await asyncio.wait(tasks, timeout=2)
+        asyncio.get_running_loop().stop()
+
+    # ──────────────────────────────────────────────────────────────────
+    # Публикация
+    # ──────────────────────────────────────────────────────────────────
+
+    def has_clients(self) -> bool:
+        """Есть ли подключённые клиенты (вызывается хранилищем на каждом батче)"""
+        return self._loop is not None and bool(self._clients)
+
+    def publish(self, delta: Dict) -> None:
+        """
+        Слушатель хранилища (поток ingest): сериализация дельты и передача
+        кадра в event loop. Без подключённых клиентов ничего не делает.
+        """
+        loop = self._loop
+        if loop is None or not self._clients:
+            return
+        try:
+            if self.device_formatter is not None:
+                delta = dict(delta, devices=[self.device_formatter(d) for d in delta["devices"]])
+            frame = format_event("batch", delta, event_id=delta.get("version"))
+            loop.call_soon_threadsafe(self._fanout, frame)
+        except Exception as e:  # не ломаем ingest из-за клиентов
+            logger.warning(f"Ошибка публикации SSE события: {e}")
+            return
+        self.events_published += 1
+        self.bytes_serialized += len(frame)
+
+    def _fanout(self, frame: bytes) -> None:
+        """Рассылка готового кадра (в потоке event loop)"""
+        for writer in list(self._clients):
+            if writer.is_closing():
+                self._drop(writer, forced=False)
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self._drop(writer)
+                continue
+            writer.write(frame)
+
+    async def _keepalive(self) -> None:
+        frame = b": keepalive\n\n"
+        while True:
+            await asyncio.sleep(self.keepalive_sec)
+            self._fanout(frame)
+
+    def _drop(self, writer: asyncio.StreamWriter, forced: bool = True) -> None:
+        """Отключение клиента (forced — по инициативе сервера)"""
+        if writer in self._clients:
+            self._clients.discard(writer)
+            if forced:
+                self.clients_dropped += 1
+        writer.close()
+
+    # ──────────────────────────────────────────────────────────────────
+    # HTTP
+    # ──────────────────────────────────────────────────────────────────
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+
+        request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+        parts = request_line.split()
+        method = parts[0] if parts else ""
+        path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+
+        if method != "GET":
+            self._respond(writer, "405 Method Not Allowed", "text/plain", b"method not allowed")
+        elif path == "/api/stream/stats":
+            body = json.dumps(self.get_stats()).encode("utf-8")
+            self._respond(writer, "200 OK", "application/json", body)
+        elif path != "/api/stream":
+            self._respond(writer, "404 Not Found", "text/plain", b"not found")
+        elif len(self._clients) >= self.max_clients:
+            self._respond(writer, "503 Service Unavailable", "text/plain", b"too many clients")
+        else:
+            await self._serve_stream(reader, writer)
+            return
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    @staticmethod
+    def _respond(writer: asyncio.StreamWriter, status: str, content_type: str, body: bytes) -> None:
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            f"{_CORS_HEADERS}Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+
+    async def _serve_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            (
+                "HTTP/1.1 200 OK\r\n"
+                "Content-Type: text/event-stream\r\n"
+                "Cache-Control: no-cache\r\n"
+                "X-Accel-Buffering: no\r\n"
+                f"{_CORS_HEADERS}"
+                "Connection: keep-alive\r\n\r\n"
+                "retry: 3000\n\n"
+            ).encode("latin-1")
+        )
+        hello = {"version": self.storage.get_version(), "summary": self.storage.get_snapshot_summary()}
+        writer.write(format_event("hello", hello, event_id=hello["version"]))
+        self._clients.add(writer)
+        self.clients_total += 1
+        try:
+            # Клиент ничего не присылает: ждём закрытия соединения
+            while await reader.read(1024):
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            self._drop(writer, forced=False)
+
+    def get_stats(self) -> Dict:
+        """Статистика потока"""
+        return {
+            "clients": len(self._clients),
+            "clients_total": self.clients_total,
+            "clients_dropped": self.clients_dropped,
+            "events_published": self.events_published,
+            "bytes_serialized": self.bytes_serialized,
+        }
@@ -0,0 +1,224 @@
+"""
+Потоковая выгрузка данных хранилища для офлайн-анализа.
+
+Наборы данных:
+- devices   — записи устройств (пачками по keyset-курсору хранилища)
+- probes    — временные метки с устройствами (строка = t, mac, rssi)
+- snapshots — история снимков (t, count)
+
+Форматы: ndjson, csv (stdlib), arrow (Arrow IPC stream), parquet — два
+последних только при установленном pyarrow.
+
+Данные кодируются генератором по пачкам: в памяти одновременно одна пачка
+строк и её закодированные байты, независимо от размера выгрузки.
+
+Endpoint: GET /api/export/<dataset>?format=ndjson|csv|arrow|parquet
+
+CLI (выгрузка с работающего API в файл потоком):
+  python export.py devices --format csv -o devices.csv
+  python export.py probes --format parquet -o probes.parquet --url http://localhost:5000
+"""
+import argparse
+import csv
+import io
+import shutil
+import sys
+import urllib.request
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fast_json import dumps
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Колонки наборов данных: (имя, тип Arrow)
+DATASETS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "devices": (
+        ("mac", "string"),
+        ("first_seen", "int64"),
+        ("last_seen", "int64"),
+        ("count", "int64"),
+        ("best_rssi", "int16"),
+        ("latest_rssi", "int16"),
+        ("vendor", "string"),
+        ("device_type", "string"),
+        ("device_brand", "string"),
+        ("randomized", "bool"),
+        ("members", "int64"),
+    ),
+    "probes": (("t", "int64"), ("mac", "string"), ("rssi", "int16")),
+    "snapshots": (("t", "int64"), ("count", "int64")),
+}
+
+# Формат -> (Content-Type целиком, с charset; расширение файла)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def supported_formats() -> Tuple[str, ...]:
+    if pyarrow is None:
+        return ("ndjson", "csv")
+    return tuple(FORMATS)
+
+
+def iter_chunks(storage, dataset: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """
+    Строки набора данных пачками
+
+    Args:
+        storage: WiFiDataStorage
+        dataset: devices | probes | snapshots
+        chunk_size: Строк в пачке
+    """
+    if dataset == "devices":
+        yield from storage.iter_devices(chunk_size)
+    elif dataset == "probes":
+        # Временные метки ограничены max_timestamps — копия deque под блокировкой
+        chunk: List[Dict] = []
+        for entry in storage.get_recent_data(limit=storage.max_timestamps):
+            for device in entry.get("d", ()):
+                chunk.append({"t": entry["t"], "mac": device.get("m"), "rssi": device.get("r")})
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
+    elif dataset == "snapshots":
+        history = storage.get_snapshot_history()
+        for start in range(0, len(history), chunk_size):
+            yield history[start:start + chunk_size]
+    else:
+        raise ValueError(f"Неизвестный набор данных: {dataset}")
+
+
+def _encode_ndjson(chunks: Iterable[List[Dict]], columns: List[str]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield b"".join(dumps({c: row.get(c) for c in columns}) + b"\n" for row in chunk)
+
+
+def _encode_csv(chunks: Iterable[List[Dict]], columns: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainSink:
+    """Файлоподобный приёмник pyarrow: накопленные байты забираются drain()"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _encode_arrow(chunks: Iterable[List[Dict]], dataset: str, fmt: str) -> Iterator[bytes]:
+    schema = pyarrow.schema([
+        (name, pyarrow.type_for_alias(type_name)) for name, type_name in DATASETS[dataset]
+    ])
+    sink = _DrainSink()
+    if fmt == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    try:
+        for chunk in chunks:
+            # Пачка -> record batch (в parquet — отдельная row group)
+            writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode(chunks: Iterable[List[Dict]], dataset: str, fmt: str) -> Iterator[bytes]:
+    """
+    Кодирование пачек строк в поток байтов
+
+    Args:
+        chunks: Пачки строк (iter_chunks)
+        dataset: Набор данных (задаёт колонки)
+        fmt: ndjson | csv | arrow | parquet
+    """
+    if fmt not in supported_formats():
+        if fmt in FORMATS:
+            raise ValueError(f"Формат {fmt} требует pyarrow (pip install pyarrow)")
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    columns = [name for name, _ in DATASETS[dataset]]
+    if fmt == "ndjson":
+        return _encode_ndjson(chunks, columns)
+    if fmt == "csv":
+        return _encode_csv(chunks, columns)
+    return _encode_arrow(chunks, dataset, fmt)
+
+
+def export(storage, dataset: str, fmt: str = "ndjson", chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Поток байтов выгрузки набора данных (ValueError — неизвестный набор/формат)"""
+    if dataset not in DATASETS:
+        raise ValueError(f"Неизвестный набор данных: {dataset} (допустимо: {', '.join(DATASETS)})")
+    return encode(iter_chunks(storage, dataset, chunk_size), dataset, fmt)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка данных с работающего API")
+    parser.add_argument("dataset", choices=list(DATASETS))
+    parser.add_argument("--format", default="ndjson", choices=list(FORMATS))
+    parser.add_argument("--url", default="http://localhost:5000", help="Адрес API")
+    parser.add_argument("-o", "--output", help="Файл (по умолчанию <dataset>.<расширение>, '-' — stdout)")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"{args.dataset}.{FORMATS[args.format][1]}"
+    url = f"{args.url.rstrip('/')}/api/export/{args.dataset}?format={args.format}"
+    with urllib.request.urlopen(url) as response:
+        if output == "-":
+            shutil.copyfileobj(response, sys.stdout.buffer, 64 * 1024)
+        else:
+            with open(output, "wb") as f:
+                shutil.copyfileobj(response, f, 64 * 1024)
+            print(f"{args.dataset} ({args.format}) -> {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
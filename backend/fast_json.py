@@ -0,0 +1,93 @@
+"""
+Быстрая сериализация JSON и сжатие ответов API.
+
+- orjson (requirements.txt): в разы быстрее stdlib json на больших списках
+  устройств. Если не установлен — stdlib json с тем же компактным выводом
+- gzip (stdlib) / brotli (requirements.txt; без него — только gzip):
+  сжатие по Accept-Encoding
+
+Вывод совпадает с провайдером Flask по умолчанию по смыслу: datetime
+сериализуется так же (HTTP-date), порядок ключей не гарантируется.
+"""
+import gzip
+import json
+from typing import Any, List, Optional, Tuple
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уровни сжатия: компромисс скорость/размер для ответов, которые строятся на каждый запрос
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+if orjson is not None:
+    # datetime — через default Flask (HTTP-date), как у стандартного провайдера
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """JSON -> bytes (UTF-8, компактно)"""
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """JSON -> bytes (UTF-8, компактно)"""
+        return json.dumps(
+            obj, default=DefaultJSONProvider.default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+def backend_name() -> str:
+    return "orjson" if orjson is not None else "json"
+
+
+def missing_speedups() -> List[str]:
+    """Не установленные пакеты ускорения из requirements.txt"""
+    return [name for name, module in (("orjson", orjson), ("brotli", brotli)) if module is None]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON провайдер Flask на orjson (jsonify/response.json и т.д.)"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode("utf-8")
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    """Поддерживаемые Content-Encoding в порядке предпочтения"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding) -> Optional[str]:
+    """
+    Выбор кодирования по заголовку Accept-Encoding (werkzeug MIMEAccept/Accept)
+
+    Returns:
+        "br" | "gzip" | None
+    """
+    for encoding in supported_encodings():
+        if accept_encoding[encoding] > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """Сжатие тела ответа выбранным кодированием (None — без изменений)"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
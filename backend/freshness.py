@@ -0,0 +1,175 @@
+"""
+Свежесть данных: от timestamp батча роутера ("t") до видимости в API.
+
+На каждый батч MQTT consumer передаёт время приёма сообщения и время
+завершения add_data() — после него новая версия хранилища видна
+/api/stats/summary и остальным endpoint'ам. Отсюда:
+
+- transport — t батча -> приём сообщения (цикл сканирования scanner.sh,
+  ожидание сети, брокер; для досланных из буфера батчей — время обрыва)
+- pipeline  — приём -> видимость (разбор, классификация, add_data)
+- freshness — t батча -> видимость (их сумма)
+
+Гистограммы — в /metrics; по сенсорам — время последнего батча и его
+возраст (для алертов на молчащие роутеры) в /api/stats/freshness.
+Сенсор — id роутера из payload (ROUTER_ID в scanner.sh); без него — MQTT
+топик, и все роутеры общего топика считаются одним сенсором.
+
+t ставит роутер по своим часам: при расхождении часов задержка может
+выйти отрицательной — в гистограммы пишется 0, в данные сенсора — как есть.
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+import metrics
+
+# Бакеты задержек от t батча (сек): t ставится в начале цикла сканирования
+# (CYCLE_TIME по умолчанию 600 с), поэтому шкала — до суток
+FRESHNESS_BUCKETS = (
+    1, 5, 15, 30, 60, 120, 300, 600, 900, 1200, 1800, 3600, 7200, 21600, 86400,
+)
+
+FRESHNESS_SECONDS = metrics.histogram(
+    "wifi_batch_freshness_seconds", "От t батча роутера до видимости в API", buckets=FRESHNESS_BUCKETS
+)
+TRANSPORT_SECONDS = metrics.histogram(
+    "wifi_batch_transport_seconds", "От t батча роутера до приёма MQTT сообщения", buckets=FRESHNESS_BUCKETS
+)
+PIPELINE_SECONDS = metrics.histogram(
+    "wifi_batch_pipeline_seconds", "От приёма MQTT сообщения до видимости в API"
+)
+
+HISTOGRAMS = {
+    "freshness": FRESHNESS_SECONDS,
+    "transport": TRANSPORT_SECONDS,
+    "pipeline": PIPELINE_SECONDS,
+}
+
+
+class FreshnessTracker:
+    """Последний батч каждого сенсора (роутера)"""
+
+    def __init__(self, max_sensors: int = 1000):
+        """
+        Args:
+            max_sensors: Максимум сенсоров (id приходит из payload); при превышении
+                забывается сенсор, дольше всех не присылавший батчей
+        """
+        self.max_sensors = max_sensors
+        self._lock = threading.Lock()
+        self._sensors: Dict[str, Dict] = {}
+
+    def record(
+        self,
+        sensor: str,
+        batch_ts: Optional[int],
+        received_at: float,
+        visible_at: float,
+        devices: int,
+    ) -> None:
+        """
+        Батч сенсора обработан
+
+        Args:
+            sensor: Идентификатор сенсора (id из payload или MQTT топик)
+            batch_ts: t батча (unix time роутера), None — в payload нет времени
+            received_at: Приём MQTT сообщения (unix time)
+            visible_at: Завершение add_data() (unix time)
+            devices: Устройств в батче
+        """
+        PIPELINE_SECONDS.observe(max(0.0, visible_at - received_at))
+        freshness = None
+        if batch_ts:
+            freshness = visible_at - batch_ts
+            FRESHNESS_SECONDS.observe(max(0.0, freshness))
+            TRANSPORT_SECONDS.observe(max(0.0, received_at - batch_ts))
+
+        with self._lock:
+            state = self._sensors.get(sensor)
+            if state is None:
+                if len(self._sensors) >= self.max_sensors:
+                    oldest = min(self._sensors, key=lambda s: self._sensors[s]["last_received_at"])
+                    del self._sensors[oldest]
+                state = self._sensors[sensor] = {
+                    "batches": 0,
+                    "out_of_order": 0,
+                    "newest_batch_t": None,
+                }
+            state["batches"] += 1
+            state["last_batch_t"] = batch_ts
+            state["last_received_at"] = received_at
+            state["last_visible_at"] = visible_at
+            state["last_devices"] = devices
+            state["last_freshness_sec"] = freshness
+            if batch_ts:
+                newest = state["newest_batch_t"]
+                if newest is not None and batch_ts < newest:
+                    # Досылка из буфера роутера после обрыва связи
+                    state["out_of_order"] += 1
+                else:
+                    state["newest_batch_t"] = batch_ts
+
+    def get_sensors(self, now: Optional[float] = None, stale_after_sec: Optional[float] = None) -> List[Dict]:
+        """
+        Состояние сенсоров по убыванию возраста данных
+
+        Args:
+            now: Текущее время (unix time), по умолчанию time.time()
+            stale_after_sec: Порог "stale" по возрасту данных (None — без флага)
+
+        Returns:
+            [{"sensor", "batches", "out_of_order", "last_devices",
+              "newest_batch_t", "last_batch_t", "last_received_at", "last_visible_at",
+              "last_freshness_sec", "data_age_sec", "receive_age_sec", "stale"}]
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            sensors = [{"sensor": sensor, **state} for sensor, state in self._sensors.items()]
+        for state in sensors:
+            newest = state["newest_batch_t"]
+            # Возраст самых новых данных сенсора; без t батча — возраст последнего приёма
+            state["receive_age_sec"] = round(now - state["last_received_at"], 3)
+            state["data_age_sec"] = round(now - newest, 3) if newest else state["receive_age_sec"]
+            if state["last_freshness_sec"] is not None:
+                state["last_freshness_sec"] = round(state["last_freshness_sec"], 3)
+            if stale_after_sec is not None:
+                state["stale"] = state["data_age_sec"] > stale_after_sec
+        sensors.sort(key=lambda s: s["data_age_sec"], reverse=True)
+        return sensors
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sensors.clear()
+
+
+def histogram_summary(histogram: metrics.Histogram) -> Dict:
+    """{"count", "sum_sec", "p50_le_sec", "p99_le_sec", "buckets": [{"le", "count"}]} (счётчики не накопительные)"""
+    counts, total = histogram.snapshot()
+    bounds = [*histogram.buckets, "+Inf"]
+
+    def quantile(q: float):
+        value = histogram.quantile(q)
+        return "+Inf" if value == float("inf") else value
+
+    return {
+        "count": sum(counts),
+        "sum_sec": round(total, 3),
+        "p50_le_sec": quantile(0.5),
+        "p99_le_sec": quantile(0.99),
+        "buckets": [{"le": le, "count": count} for le, count in zip(bounds, counts)],
+    }
+
+
+# Общий для consumer (запись) и API (чтение)
+TRACKER = FreshnessTracker()
+
+
+def _sensor_ages() -> Dict:
+    return {(s["sensor"],): s["data_age_sec"] for s in TRACKER.get_sensors()}
+
+
+metrics.callback(
+    "wifi_sensor_data_age_seconds", "Возраст самых новых данных сенсора (now - t последнего батча)",
+    _sensor_ages, ["sensor"],
+)
@@ -0,0 +1,218 @@
+"""
+Потоковая кластеризация рандомизированных MAC в псевдо-устройства.
+
+Телефоны периодически меняют рандомный MAC, поэтому каждый новый MAC
+раздувает total_unique и вытесняет реальные устройства из хранилища.
+Кластеризатор (стадия после _enrich_devices) объединяет короткоживущие
+рандомные MAC одного сенсора с близким профилем RSSI в один кластер:
+
+- MAC, уже привязанный к активному кластеру, остаётся в нём
+- новый MAC присоединяется к кластеру того же сенсора, у которого
+  |RSSI - средний RSSI кластера| <= rssi_tolerance, активному в пределах
+  window_sec и не замеченному в том же снимке под другим MAC
+  (два MAC одновременно — два разных устройства)
+- иначе создаётся новый кластер
+
+Сенсор — id роутера из payload (scanner.sh ROUTER_ID): RSSI разных
+роутеров несравнимы, поэтому кластеры и их средний RSSI ведутся по сенсору.
+MAC, замеченный другим сенсором, остаётся в своём кластере, но его RSSI
+не смешивается со средним кластера.
+
+Память фиксирована на кластер (__slots__, без списка участников);
+кластеры и привязки MAC истекают через window_sec неактивности.
+raw_macs_total считает MAC один раз, пока жива его привязка — в том числе
+если кластер вытеснен и MAC присоединяется к другому.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Префикс ключа псевдо-устройства в хранилище
+CLUSTER_KEY_PREFIX = "cluster-"
+
+# Вес нового измерения в скользящем среднем RSSI кластера
+_RSSI_ALPHA = 0.3
+
+
+class _Cluster:
+    """Состояние одного кластера (фиксированный размер)"""
+
+    __slots__ = ("cid", "sensor", "rssi", "first_seen", "last_seen", "last_mac", "members", "rssi_bin")
+
+    def __init__(self, cid: int, sensor: str, rssi: int, ts: int, mac: str, rssi_bin: int):
+        self.cid = cid
+        self.sensor = sensor
+        self.rssi = float(rssi)
+        self.first_seen = ts
+        self.last_seen = ts
+        self.last_mac = mac
+        self.members = 0
+        self.rssi_bin = rssi_bin
+
+    @property
+    def key(self) -> str:
+        return f"{CLUSTER_KEY_PREFIX}{self.cid:08x}"
+
+
+class RandomizedMacClusterer:
+    """Инкрементальная кластеризация рандомизированных MAC"""
+
+    def __init__(self, window_sec: int = 1800, rssi_tolerance: int = 6, max_clusters: int = 5000):
+        """
+        Args:
+            window_sec: Окно неактивности, после которого кластер закрывается
+            rssi_tolerance: Допуск по RSSI (dB) для присоединения MAC к кластеру
+            max_clusters: Максимум активных кластеров (старейшие вытесняются)
+        """
+        self.window_sec = window_sec
+        self.rssi_tolerance = max(1, rssi_tolerance)
+        self.max_clusters = max_clusters
+
+        # cid -> кластер, порядок = по последней активности (старейший первым)
+        self._clusters: "OrderedDict[int, _Cluster]" = OrderedDict()
+        # mac -> (cid, last_ts), порядок = по последней активности
+        self._mac_to_cluster: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        # (sensor, rssi_bin) -> {cid}
+        self._bins: Dict[Tuple[str, int], Set[int]] = {}
+
+        self._next_cid = 1
+        self._now = 0
+
+        self.raw_macs_total = 0
+        self.clusters_total = 0
+        self.clusters_expired = 0
+
+    def process(self, devices: List[Dict[str, Any]], sensor: str = "") -> List[Dict[str, Any]]:
+        """
+        Замена рандомных MAC на ключи кластеров (in-place).
+
+        Для кластеризованных элементов: "m" — ключ кластера, "raw_mac" — исходный MAC,
+        "cluster_new_member" — True, если MAC впервые присоединён к кластеру.
+
+        Args:
+            devices: Обогащённые устройства (поля m, r, t, randomized)
+            sensor: Идентификатор сенсора (роутера)
+
+        Returns:
+            Тот же список
+        """
+        for d in devices:
+            if not d.get("randomized"):
+                continue
+            mac = (d.get("m") or "").lower()
+            if not mac:
+                continue
+            ts = int(d.get("t", 0) or 0)
+            rssi = int(d.get("r", 0) or 0)
+            if ts > self._now:
+                self._now = ts
+
+            cluster, new_member = self._assign(mac, sensor, rssi, ts)
+            d["raw_mac"] = mac
+            d["m"] = cluster.key
+            d["cluster_new_member"] = new_member
+
+        self._expire()
+        return devices
+
+    def _bin(self, rssi: float) -> int:
+        return int(rssi // self.rssi_tolerance)
+
+    def _assign(self, mac: str, sensor: str, rssi: int, ts: int) -> Tuple[_Cluster, bool]:
+        entry = self._mac_to_cluster.get(mac)
+        cluster = self._clusters.get(entry[0]) if entry else None
+        new_member = cluster is None
+
+        if cluster is None:
+            cluster = self._match(sensor, rssi, ts, mac)
+            if cluster is None:
+                cluster = self._create(sensor, rssi, ts, mac)
+            cluster.members += 1
+            # Привязка жива, а кластер вытеснен — тот же MAC, не новый
+            if entry is None:
+                self.raw_macs_total += 1
+
+        self._touch(cluster, sensor, rssi, ts, mac)
+        self._mac_to_cluster[mac] = (cluster.cid, ts)
+        self._mac_to_cluster.move_to_end(mac)
+        return cluster, new_member
+
+    def _match(self, sensor: str, rssi: int, ts: int, mac: str) -> Optional[_Cluster]:
+        cutoff = ts - self.window_sec
+        center = self._bin(rssi)
+        best: Optional[_Cluster] = None
+        best_diff = self.rssi_tolerance + 1.0
+        for b in (center - 1, center, center + 1):
+            for cid in self._bins.get((sensor, b), ()):
+                c = self._clusters[cid]
+                if c.last_seen < cutoff:
+                    continue
+                # В этом снимке кластер уже представлен другим MAC
+                if c.last_seen == ts and c.last_mac != mac:
+                    continue
+                diff = abs(c.rssi - rssi)
+                if diff <= self.rssi_tolerance and diff < best_diff:
+                    best, best_diff = c, diff
+        return best
+
+    def _create(self, sensor: str, rssi: int, ts: int, mac: str) -> _Cluster:
+        if len(self._clusters) >= self.max_clusters:
+            _, oldest = self._clusters.popitem(last=False)
+            self._unbin(oldest)
+            self.clusters_expired += 1
+
+        cluster = _Cluster(self._next_cid, sensor, rssi, ts, mac, self._bin(rssi))
+        self._next_cid += 1
+        self._clusters[cluster.cid] = cluster
+        self._bins.setdefault((sensor, cluster.rssi_bin), set()).add(cluster.cid)
+        self.clusters_total += 1
+        return cluster
+
+    def _touch(self, cluster: _Cluster, sensor: str, rssi: int, ts: int, mac: str) -> None:
+        if ts >= cluster.last_seen:
+            cluster.last_seen = ts
+            cluster.last_mac = mac
+        self._clusters.move_to_end(cluster.cid)
+        if sensor != cluster.sensor:
+            # RSSI другого роутера не сравним со средним кластера
+            return
+        cluster.rssi += _RSSI_ALPHA * (rssi - cluster.rssi)
+
+        new_bin = self._bin(cluster.rssi)
+        if new_bin != cluster.rssi_bin:
+            self._unbin(cluster)
+            cluster.rssi_bin = new_bin
+            self._bins.setdefault((cluster.sensor, new_bin), set()).add(cluster.cid)
+
+    def _unbin(self, cluster: _Cluster) -> None:
+        key = (cluster.sensor, cluster.rssi_bin)
+        members = self._bins.get(key)
+        if members is not None:
+            members.discard(cluster.cid)
+            if not members:
+                del self._bins[key]
+
+    def _expire(self) -> None:
+        """Закрытие неактивных кластеров и привязок MAC (амортизированно O(1))."""
+        cutoff = self._now - self.window_sec
+        while self._clusters:
+            cid, cluster = next(iter(self._clusters.items()))
+            if cluster.last_seen >= cutoff:
+                break
+            self._clusters.popitem(last=False)
+            self._unbin(cluster)
+            self.clusters_expired += 1
+        while self._mac_to_cluster:
+            mac, (_, last_ts) = next(iter(self._mac_to_cluster.items()))
+            if last_ts >= cutoff:
+                break
+            self._mac_to_cluster.popitem(last=False)
+
+    def get_stats(self) -> Dict:
+        """Счётчики: сырые рандомные MAC против кластеров"""
+        return {
+            "raw_macs_total": self.raw_macs_total,
+            "clusters_total": self.clusters_total,
+            "active_clusters": len(self._clusters),
+            "active_macs": len(self._mac_to_cluster),
+            "clusters_expired": self.clusters_expired,
+        }
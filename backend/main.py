@@ -7,10 +7,26 @@ import sys
 import threading
 from typing import Optional
 
+import fast_json
 from storage import WiFiDataStorage
 from mqtt_consumer import MQTTConsumer
-from dashboard_api import app, init_api
-from config import API_HOST, API_PORT
+from api_server import APIServer
+from dashboard_api import app, format_device, init_api, start_rules_reload
+from event_stream import EventStreamServer
+from config import (
+    API_CHANNEL_TIMEOUT,
+    API_CONNECTION_LIMIT,
+    API_HOST,
+    API_PORT,
+    API_SERVER,
+    API_THREADS,
+    DEVICE_JOURNAL_SIZE,
+    SSE_ENABLED,
+    SSE_KEEPALIVE_SEC,
+    SSE_MAX_CLIENTS,
+    SSE_PORT,
+    STORAGE_LOCK_PROFILING,
+)
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,9 +41,12 @@ class WiFiMonitoringService:
     
     def __init__(self):
         """Инициализация сервиса"""
-        self.storage = WiFiDataStorage()
+        self.storage = WiFiDataStorage(journal_size=DEVICE_JOURNAL_SIZE)
+        self.storage.set_lock_profiling(STORAGE_LOCK_PROFILING)
         self.consumer: Optional[MQTTConsumer] = None
+        self.api_server: Optional[APIServer] = None
         self.api_thread: Optional[threading.Thread] = None
+        self.event_stream: Optional[EventStreamServer] = None
         self.running = False
     
     def start(self):
@@ -41,13 +60,37 @@ class WiFiMonitoringService:
         self.consumer = MQTTConsumer(self.storage)
         self.consumer.start()
         
-        # Запуск API в отдельном потоке
-        self.api_thread = threading.Thread(
-            target=lambda: app.run(host=API_HOST, port=API_PORT, debug=False),
-            daemon=True
+        # Запуск API в отдельном потоке (хранилище общее с MQTT consumer)
+        self.api_server = APIServer(
+            app,
+            host=API_HOST,
+            port=API_PORT,
+            mode=API_SERVER,
+            threads=API_THREADS,
+            connection_limit=API_CONNECTION_LIMIT,
+            channel_timeout=API_CHANNEL_TIMEOUT,
         )
+        self.api_thread = threading.Thread(target=self.api_server.run, daemon=True)
         self.api_thread.start()
-        logger.info(f"API запущен на http://{API_HOST}:{API_PORT}")
+        logger.info(f"API запущен: {self.api_server.describe()}")
+        missing = fast_json.missing_speedups()
+        if missing:
+            logger.warning(
+                f"Не установлены {', '.join(missing)} — ответы API через stdlib json/gzip "
+                f"(pip install -r backend/requirements.txt)"
+            )
+        
+        # Push-поток обновлений (SSE) для дашборда
+        if SSE_ENABLED:
+            self.event_stream = EventStreamServer(
+                self.storage,
+                host=API_HOST,
+                port=SSE_PORT,
+                keepalive_sec=SSE_KEEPALIVE_SEC,
+                max_clients=SSE_MAX_CLIENTS,
+                device_formatter=format_device,
+            )
+            self.event_stream.start()
         
         self.running = True
         logger.info("Сервис Wi-Fi мониторинга запущен")
@@ -60,6 +103,14 @@ class WiFiMonitoringService:
         if self.consumer:
             self.consumer.stop()
         
+        if self.event_stream:
+            self.event_stream.stop()
+            self.event_stream = None
+        
+        if self.api_server:
+            self.api_server.close()
+            self.api_server = None
+        
         logger.info("Сервис Wi-Fi мониторинга остановлен")
 
 
@@ -76,6 +127,11 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    # Перезагрузка правил классификации без рестарта (на Windows SIGHUP нет —
+    # там используется POST /api/rules/reload)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda sig, frame: start_rules_reload())
+    
     try:
         service.start()
         
@@ -0,0 +1,459 @@
+"""
+Метрики процесса в формате Prometheus (GET /metrics).
+
+Без внешних зависимостей: счётчики, гистограммы с фиксированными бакетами
+и метрики-колбэки (значение читается в момент scrape — размеры хранилища,
+статистика кешей). Запись — инкремент под коротким Lock (гистограмма —
+ещё bisect по бакетам), поэтому её можно держать включённой в production.
+
+Метрики регистрируются в глобальном REGISTRY на уровне модулей, которые их
+пишут (mqtt_consumer, dashboard_api, storage).
+"""
+import contextlib
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# Бакеты задержек (сек): от 100 мкс до 10 с
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[LabelValues, "_Metric"] = {}
+
+    def labels(self, *values: str):
+        """Дочерняя метрика для значений меток (ссылку стоит сохранить — без поиска на каждую запись)"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[Tuple[LabelValues, "_Metric"]]:
+        if self.labelnames:
+            with self._lock:
+                return list(self._children.items())
+        return [((), self)]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._series():
+            lines.extend(child._render_samples(self.name, self.labelnames, values))
+        return lines
+
+    def _render_samples(self, name: str, labelnames: Sequence[str], values: LabelValues) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонный счётчик"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help_text, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.help)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def _render_samples(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными бакетами (le — включительно)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Последний элемент — +Inf
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.help, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """with histogram.time(): ... — длительность блока в секундах"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        """(счётчики по бакетам + +Inf, сумма)"""
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля сверху: граница бакета, в который попадает q-я доля (None — нет данных)"""
+        counts, _ = self.snapshot()
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def _render_samples(self, name, labelnames, values):
+        counts, total = self.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, values, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, values)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._histogram.observe(time.perf_counter() - self._start)
+
+
+CallbackValue = Union[float, Dict[LabelValues, float]]
+
+
+class CallbackMetric(_Metric):
+    """Значение читается колбэком при scrape (число или {значения меток: число})"""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], CallbackValue],
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, help_text, labelnames)
+        self.kind = kind
+        self._fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self._fn()
+        except Exception:
+            # Источник ещё не инициализирован (например, хранилище) — метрика пропускается
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if isinstance(value, dict):
+            for values, v in value.items():
+                lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(v)}")
+        elif value is not None:
+            lines.append(f"{self.name} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Повторный импорт модуля (тесты, reload) — та же метрика
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def unregister(self, name: str) -> None:
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help_text, labelnames))
+
+
+def histogram(name: str, help_text: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help_text, labelnames, buckets))
+
+
+def callback(name: str, help_text: str, fn: Callable[[], CallbackValue],
+             labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+    """Метрика-колбэк; повторная регистрация с тем же именем заменяет колбэк"""
+    metric = CallbackMetric(name, help_text, fn, labelnames, kind)
+    REGISTRY.unregister(name)
+    return REGISTRY.register(metric)
+
+
+# Кадры этих файлов пропускаются при определении вызывающего метода
+_SKIP_FILES = frozenset((__file__, contextlib.__file__))
+
+
+def _caller_name(depth: int = 1) -> str:
+    """Имя функции, захватывающей блокировку (первый кадр вне metrics/contextlib)"""
+    frame = sys._getframe(depth)
+    while frame is not None and frame.f_code.co_filename in _SKIP_FILES:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "?"
+
+
+class _Durations:
+    """Число, сумма, максимум и гистограмма длительностей"""
+
+    __slots__ = ("count", "total", "max", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = Histogram("", "")
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.histogram.observe(value)
+
+    def to_dict(self) -> Dict:
+        p50 = self.histogram.quantile(0.5)
+        p99 = self.histogram.quantile(0.99)
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else 0.0,
+            # Верхняя граница бакета (оценка сверху)
+            "p50_us_le": round(p50 * 1e6, 1) if p50 is not None and p50 != float("inf") else None,
+            "p99_us_le": round(p99 * 1e6, 1) if p99 is not None and p99 != float("inf") else None,
+            "max_us": round(self.max * 1e6, 1),
+        }
+
+
+class LockProfile:
+    """
+    Профиль конкуренции за блокировку по вызывающим методам
+
+    - ожидание и удержание по методу, захватившему блокировку
+    - пары (ожидающий, владелец): кто кого блокировал и сколько ждал
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self._wait: Dict[str, _Durations] = {}
+        self._hold: Dict[str, _Durations] = {}
+        self._contention: Dict[Tuple[str, str], _Durations] = {}
+
+    @staticmethod
+    def _add(table: Dict, key, value: float) -> None:
+        durations = table.get(key)
+        if durations is None:
+            durations = table[key] = _Durations()
+        durations.observe(value)
+
+    def record_acquire(self, caller: str, wait: float, holder: Optional[str]) -> None:
+        with self._lock:
+            self._add(self._wait, caller, wait)
+            if holder is not None:
+                self._add(self._contention, (caller, holder), wait)
+
+    def record_hold(self, caller: str, hold: float) -> None:
+        with self._lock:
+            self._add(self._hold, caller, hold)
+
+    def report(self) -> Dict:
+        """
+        Returns:
+            {"since", "duration_sec",
+             "callers": [{"caller", "wait": {...}, "hold": {...}}] — по убыванию суммарного удержания,
+             "contention": [{"waiter", "holder", "wait": {...}}] — по убыванию суммарного ожидания}
+        """
+        with self._lock:
+            callers = sorted(
+                set(self._wait) | set(self._hold),
+                key=lambda c: self._hold[c].total if c in self._hold else 0.0,
+                reverse=True,
+            )
+            empty = _Durations().to_dict()
+            return {
+                "since": self.started_at,
+                "duration_sec": round(time.time() - self.started_at, 3),
+                "callers": [
+                    {
+                        "caller": caller,
+                        "wait": self._wait[caller].to_dict() if caller in self._wait else empty,
+                        "hold": self._hold[caller].to_dict() if caller in self._hold else empty,
+                    }
+                    for caller in callers
+                ],
+                "contention": [
+                    {"waiter": waiter, "holder": holder, "wait": durations.to_dict()}
+                    for (waiter, holder), durations in sorted(
+                        self._contention.items(), key=lambda kv: kv[1].total, reverse=True
+                    )
+                ],
+            }
+
+
+class InstrumentedLock:
+    """
+    threading.RLock с гистограммами ожидания и удержания
+
+    Учитывается только внешний захват: повторный вход того же потока
+    не измеряется и не продлевает удержание.
+
+    Профилирование по вызывающим методам (LockProfile) включается
+    и выключается на лету (set_profiling); выключенное стоит одну проверку
+    атрибута на захват.
+    """
+
+    def __init__(self, wait_histogram: Optional[Histogram], hold_histogram: Optional[Histogram]):
+        self._lock = threading.RLock()
+        self._wait = wait_histogram
+        self._hold = hold_histogram
+        self.profile: Optional[LockProfile] = None
+        # Поля ниже меняет только поток-владелец под блокировкой
+        self._depth = 0
+        self._acquired_at = 0.0
+        # Метод-владелец и последний освободивший (при профилировании): их читают
+        # ожидающие потоки
+        self._holder: Optional[str] = None
+        self._released_by: Optional[str] = None
+
+    def set_profiling(self, enabled: bool, reset: bool = False) -> None:
+        """Включение/выключение профиля по вызывающим методам (reset — начать новый профиль)"""
+        if not enabled:
+            self.profile = None
+        elif reset or self.profile is None:
+            self.profile = LockProfile()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        profile = self.profile
+        if profile is not None:
+            return self._acquire_profiled(profile, blocking, timeout)
+        start = time.perf_counter()
+        if not self._lock.acquire(blocking, timeout):
+            return False
+        self._depth += 1
+        if self._depth == 1:
+            now = time.perf_counter()
+            self._acquired_at = now
+            if self._wait is not None:
+                self._wait.observe(now - start)
+        return True
+
+    def _acquire_profiled(self, profile: LockProfile, blocking: bool, timeout: float) -> bool:
+        caller = _caller_name()
+        start = time.perf_counter()
+        holder = None
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            # Занято: владелец на момент начала ожидания
+            holder = self._holder
+            if not self._lock.acquire(True, timeout):
+                return False
+            if holder is None:
+                # Начало ожидания пришлось на передачу блокировки (новый владелец
+                # ещё не записал себя) — блокировавшим считается освободивший перед нами
+                holder = self._released_by or "?"
+        self._depth += 1
+        if self._depth == 1:
+            now = time.perf_counter()
+            self._acquired_at = now
+            self._holder = caller
+            if self._wait is not None:
+                self._wait.observe(now - start)
+            profile.record_acquire(caller, now - start, holder)
+        return True
+
+    def release(self) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            hold = time.perf_counter() - self._acquired_at
+            if self._hold is not None:
+                self._hold.observe(hold)
+            holder = self._holder
+            if holder is not None:
+                self._holder = None
+                self._released_by = holder
+                profile = self.profile
+                if profile is not None:
+                    profile.record_hold(holder, hold)
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self.release()
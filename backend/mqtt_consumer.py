@@ -22,9 +22,17 @@ from config import (
     MQTT_CLIENT_ID,
     ENABLE_DEVICE_FILTERING,
     ALLOWED_DEVICE_TYPES,
+    CLASSIFICATION_CACHE_PATH,
+    ENABLE_MAC_CLUSTERING,
+    CLUSTER_WINDOW_SEC,
+    CLUSTER_RSSI_TOLERANCE,
+    CLUSTER_MAX_ACTIVE,
 )
+import freshness
+import metrics
 from storage import WiFiDataStorage
-from device_classifier import classify
+from device_classifier import classify, configure_classification_cache, get_allowed_device_types
+from mac_clustering import RandomizedMacClusterer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +40,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger("mqtt_consumer")
 
+MESSAGES = metrics.counter("wifi_mqtt_messages_total", "Принятые MQTT сообщения")
+INGESTED_DEVICES = metrics.counter(
+    "wifi_ingested_devices_total", "Записи устройств, переданные в хранилище (после фильтра)"
+)
+ERRORS = metrics.counter("wifi_mqtt_errors_total", "Ошибки обработки MQTT сообщений", ["kind"])
+ERRORS_JSON = ERRORS.labels("json")
+ERRORS_PROCESSING = ERRORS.labels("processing")
+ERRORS_EMPTY = ERRORS.labels("empty")
+STAGE_SECONDS = metrics.histogram(
+    "wifi_ingest_stage_seconds", "Длительность этапов обработки MQTT сообщения", ["stage"]
+)
+STAGE_DECODE = STAGE_SECONDS.labels("decode")
+STAGE_PARSE = STAGE_SECONDS.labels("parse")
+STAGE_ENRICH = STAGE_SECONDS.labels("enrich")
+STAGE_CLUSTER = STAGE_SECONDS.labels("cluster")
+STAGE_FILTER = STAGE_SECONDS.labels("filter")
+STAGE_ADD_DATA = STAGE_SECONDS.labels("add_data")
+
 
 def _safe_int(value: Any, default: int = 0) -> int:
     try:
@@ -46,6 +72,19 @@ class MQTTConsumer:
     def __init__(self, storage: WiFiDataStorage):
         self.storage = storage
         self.running = False
+        self._warned_no_sensor_id = False
+
+        # Тёплый старт классификатора: результаты по OUI с прошлых запусков
+        configure_classification_cache(CLASSIFICATION_CACHE_PATH)
+
+        # Кластеризация рандомных MAC (опционально)
+        self.clusterer: Optional[RandomizedMacClusterer] = None
+        if ENABLE_MAC_CLUSTERING:
+            self.clusterer = RandomizedMacClusterer(
+                window_sec=CLUSTER_WINDOW_SEC,
+                rssi_tolerance=CLUSTER_RSSI_TOLERANCE,
+                max_clusters=CLUSTER_MAX_ACTIVE,
+            )
 
         # Поддержка paho-mqtt v1 и v2 (убирает DeprecationWarning на новых версиях)
         self.client = self._create_client()
@@ -128,44 +167,78 @@ class MQTTConsumer:
             logger.info("Отключено от MQTT брокера")
 
     def _on_message(self, client: mqtt.Client, userdata: Any, msg: mqtt.MQTTMessage) -> None:
+        MESSAGES.inc()
+        received_at = time.time()
         payload_raw = ""
         try:
+            t0 = time.perf_counter()
             payload_raw = msg.payload.decode("utf-8", errors="replace").strip()
             if not payload_raw:
                 # Пустое сообщение — всё равно обновим статистику
+                ERRORS_EMPTY.inc()
                 self.storage.add_data([])
                 logger.warning("Получено пустое MQTT сообщение (payload пустой)")
                 return
 
             data = json.loads(payload_raw)
+            t1 = time.perf_counter()
+            STAGE_DECODE.observe(t1 - t0)
+
             devices_data = self._parse_data(data)
+            t0 = time.perf_counter()
+            STAGE_PARSE.observe(t0 - t1)
 
             # ВСЕГДА обогащаем данные классификацией (до фильтрации)
             enriched_data = self._enrich_devices(devices_data)
+            t1 = time.perf_counter()
+            STAGE_ENRICH.observe(t1 - t0)
+
+            sensor_id = self._sensor_id(data, msg.topic)
+
+            # Рандомные MAC → псевдо-устройства (если включено)
+            if self.clusterer is not None:
+                self.clusterer.process(enriched_data, sensor_id)
+                t0, t1 = t1, time.perf_counter()
+                STAGE_CLUSTER.observe(t1 - t0)
 
             # Фильтрация (если включена) - применяется после enrichment
             if ENABLE_DEVICE_FILTERING:
                 filtered = self._filter_devices(enriched_data)
-                # ВАЖНО: обновляем статистику ВСЕГДА
-                self.storage.add_data(filtered)
-                logger.info(f"Устройства: получено {len(devices_data)}, обогащено {len(enriched_data)}, после фильтра {len(filtered)}")
+                t0, t1 = t1, time.perf_counter()
+                STAGE_FILTER.observe(t1 - t0)
             else:
-                self.storage.add_data(enriched_data)
-                logger.info(f"Устройства: получено {len(devices_data)}, обогащено {len(enriched_data)}")
+                filtered = enriched_data
+
+            # ВАЖНО: обновляем статистику ВСЕГДА
+            self.storage.add_data(filtered)
+            STAGE_ADD_DATA.observe(time.perf_counter() - t1)
+            # Данные батча видны API (новая версия хранилища)
+            freshness.TRACKER.record(
+                sensor_id, self._batch_timestamp(data, devices_data), received_at, time.time(), len(devices_data)
+            )
+            INGESTED_DEVICES.inc(len(filtered))
+            # Итог по каждому сообщению — в debug (счётчики — в /metrics)
+            logger.debug(
+                "Устройства: получено %s, обогащено %s, сохранено %s",
+                len(devices_data), len(enriched_data), len(filtered),
+            )
 
         except json.JSONDecodeError as e:
             # Если в MQTT прилетает НЕ-JSON (например {m:aa...} без кавычек) — это будет сюда
+            ERRORS_JSON.inc()
             logger.error(f"Ошибка парсинга JSON: {e}. Первые 120 символов: {payload_raw[:120]!r}")
             # Всё равно двигаем статистику, чтобы API не “стоял”
             self.storage.add_data([])
         except Exception as e:
+            ERRORS_PROCESSING.inc()
             logger.error(f"Ошибка обработки сообщения: {e}", exc_info=True)
             # Всё равно двигаем статистику
             self.storage.add_data([])
 
     # --- parsing / filtering ---
 
-    def _parse_data(self, data: Any) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _parse_data(data: Any) -> List[Dict[str, Any]]:
         """
         Возвращает список элементов вида:
         {"m": "...", "r": -63, "t": 170..., "x": 0}
@@ -175,7 +248,7 @@ class MQTTConsumer:
         # Формат A: list[dict]
         if isinstance(data, list):
             for item in data:
-                parsed = self._parse_item(item, root_timestamp=None)
+                parsed = MQTTConsumer._parse_item(item, root_timestamp=None)
                 if parsed is not None:
                     out.append(parsed)
             return out
@@ -186,14 +259,45 @@ class MQTTConsumer:
             devices = data.get("d", [])
             if isinstance(devices, list):
                 for item in devices:
-                    parsed = self._parse_item(item, root_timestamp=root_ts)
+                    parsed = MQTTConsumer._parse_item(item, root_timestamp=root_ts)
                     if parsed is not None:
                         out.append(parsed)
             return out
 
         return out
 
-    def _parse_item(self, item: Any, root_timestamp: Optional[Any]) -> Optional[Dict[str, Any]]:
+    @staticmethod
+    def _batch_timestamp(data: Any, devices_data: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Время батча по часам роутера: "t" формата B, иначе самый поздний
+        "t" устройств (формат A; без "t" разбор подставляет время приёма).
+        None — пустой батч без времени.
+        """
+        if isinstance(data, dict):
+            root_ts = _safe_int(data.get("t"), 0)
+            if root_ts > 0:
+                return root_ts
+        latest = max((_safe_int(item.get("t"), 0) for item in devices_data), default=0)
+        return latest or None
+
+    def _sensor_id(self, data: Any, topic: str) -> str:
+        """
+        Идентификатор сенсора (роутера): поле "id" в payload формата B
+        (ROUTER_ID в scanner.sh), иначе MQTT топик.
+        """
+        if isinstance(data, dict) and data.get("id"):
+            return str(data["id"])
+        if not self._warned_no_sensor_id:
+            # Без id все роутеры общего топика — один сенсор
+            self._warned_no_sensor_id = True
+            logger.warning(
+                f"Payload без поля \"id\" (топик {topic}): роутеры неразличимы для свежести "
+                f"и кластеризации — задайте ROUTER_ID в scanner.conf"
+            )
+        return topic or ""
+
+    @staticmethod
+    def _parse_item(item: Any, root_timestamp: Optional[Any]) -> Optional[Dict[str, Any]]:
         if not isinstance(item, dict):
             return None
 
@@ -218,7 +322,8 @@ class MQTTConsumer:
 
         return {"m": mac, "r": rssi, "t": ts, "x": x}
 
-    def _enrich_devices(self, devices_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _enrich_devices(devices_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Обогащение данных классификацией устройств.
         Вызывается ВСЕГДА после парсинга и ДО фильтрации.
@@ -250,7 +355,8 @@ class MQTTConsumer:
         
         return enriched
 
-    def _filter_devices(self, devices_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _filter_devices(devices_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Фильтрация устройств по типу.
         Вызывается ПОСЛЕ enrichment, использует уже обогащенные данные.
@@ -262,12 +368,17 @@ class MQTTConsumer:
             Отфильтрованный список устройств (только разрешенные типы)
         """
         filtered: List[Dict[str, Any]] = []
+        # Файл правил может переопределить список типов (горячая перезагрузка);
+        # пустой список в файле — не сохранять ничего, из config — только если ключа нет
+        allowed_types = get_allowed_device_types()
+        if allowed_types is None:
+            allowed_types = ALLOWED_DEVICE_TYPES
 
         for d in devices_data:
             device_type = d.get("device_type", "other")
             
             # Фильтруем только по типу устройства (данные уже обогащены)
-            if device_type in ALLOWED_DEVICE_TYPES:
+            if device_type in allowed_types:
                 filtered.append(d)
 
         return filtered
@@ -0,0 +1,76 @@
+"""
+Ограничение частоты запросов API по клиенту (token bucket).
+
+API и MQTT ingest работают в одном процессе и делят блокировку
+WiFiDataStorage: лимит не даёт одному клиенту (или десятку открытых
+вкладок дашборда) занять хранилище запросами и задержать приём данных.
+
+Каждому клиенту (IP) — корзина на burst токенов, пополняемая со
+скоростью rate токенов/сек; запрос без токена получает 429 с Retry-After.
+Число отслеживаемых клиентов ограничено (LRU), память не растёт.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+
+class RateLimiter:
+    """Потокобезопасный token bucket на клиента"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        """
+        Args:
+            rate: Пополнение, запросов/сек на клиента (<= 0 — без ограничения)
+            burst: Размер корзины (запросов подряд без ожидания)
+            max_clients: Максимум отслеживаемых клиентов (LRU)
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max(1, max_clients)
+        self._lock = threading.Lock()
+        # клиент -> (токены, время последнего пополнения)
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, client: Hashable) -> Tuple[bool, int]:
+        """
+        Взять токен для запроса клиента
+
+        Returns:
+            (разрешено, через сколько секунд появится токен — для Retry-After)
+        """
+        if not self.enabled:
+            return True, 0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+                self.allowed += 1
+            else:
+                self.rejected += 1
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else max(1, math.ceil((1.0 - tokens) / self.rate))
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "rate": self.rate,
+                "burst": self.burst,
+                "clients": len(self._buckets),
+                "allowed": self.allowed,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,148 @@
+"""
+Кеш сериализованных ответов API.
+
+Ключ включает версию хранилища (WiFiDataStorage.version), поэтому
+инвалидация не нужна: после add_data() версия меняется и старые записи
+просто перестают запрашиваться, а затем вытесняются по LRU.
+
+SingleFlight — объединение одновременных одинаковых запросов: пока ответ
+по ключу считается, остальные запросы с тем же ключом ждут его результат
+вместо параллельного пересчёта (и конкуренции за блокировку хранилища).
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# (тело ответа, Content-Encoding или None)
+CachedBody = Tuple[bytes, Optional[str]]
+
+
+class ResponseCache:
+    """Потокобезопасный LRU-кеш с ограниченным размером и статистикой попаданий"""
+
+    def __init__(self, max_entries: int = 256):
+        """
+        Args:
+            max_entries: Максимальное количество ответов в кеше
+        """
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        """(сериализованный ответ, Content-Encoding) или None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, body: bytes, encoding: Optional[str] = None) -> None:
+        """Сохранение ответа (с вытеснением давно не использованных)"""
+        with self._lock:
+            self._entries[key] = (body, encoding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Статистика: размер, попадания, промахи, доля попаданий"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(body) for body, _ in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class _Flight:
+    """Расчёт в процессе: ожидающие получают result или error"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Не более одного одновременного расчёта на ключ"""
+
+    def __init__(self, timeout: float = 30.0):
+        """
+        Args:
+            timeout: Сколько ждать чужой расчёт, сек (дольше — считаем сами)
+        """
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+
+        self.leaders = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Результат fn() для ключа; одновременные вызовы с тем же ключом ждут
+        первый (исключение первого пробрасывается всем ожидающим)
+
+        Returns:
+            (результат, True — получен из чужого расчёта)
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            if not flight.done.wait(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                return fn(), False
+            with self._lock:
+                self.shared += 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "shared": self.shared,
+                "timeouts": self.timeouts,
+            }
@@ -0,0 +1,86 @@
+"""
+Скользящее окно активных MAC (последние window_sec секунд) для /api/stats/realtime.
+
+Колесо времени (timing wheel): window_sec + 1 слотов по одной секунде,
+в слоте — MAC, последнее наблюдение которых пришлось на эту секунду.
+Продвижение окна очищает только истёкшие слоты, поэтому стоимость
+истечения — O(число истёкших MAC), без прохода по всем активным и без
+обращения к таблице устройств хранилища.
+
+Не потокобезопасно само по себе: вызовы идут под _lock хранилища.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+# mac -> (секунда слота, timestamp наблюдения, rssi, randomized)
+WindowEntry = Tuple[int, int, int, bool]
+
+
+class SlidingWindow:
+    """Последнее наблюдение каждого MAC за window_sec секунд"""
+
+    def __init__(self, window_sec: int = 60):
+        """
+        Args:
+            window_sec: Длина окна, сек (окно — [now - window_sec, now])
+        """
+        self.window_sec = window_sec
+        self._size = window_sec + 1
+        self._wheel: List[Set[str]] = [set() for _ in range(self._size)]
+        self._entries: Dict[str, WindowEntry] = {}
+        # Последняя секунда, до которой окно продвинуто
+        self._now: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        for slot in self._wheel:
+            slot.clear()
+        self._entries.clear()
+        self._now = None
+
+    def advance(self, now: int) -> None:
+        """Сдвиг окна к секунде now: удаление наблюдений старше now - window_sec"""
+        if self._now is None:
+            self._now = now
+            return
+        if now <= self._now:
+            return
+        if now - self._now >= self._size:
+            # Истекло всё окно
+            self.clear()
+            self._now = now
+            return
+        # Слоты секунд (self._now - window_sec, now - window_sec] истекают
+        for second in range(self._now - self.window_sec, now - self.window_sec):
+            slot = self._wheel[second % self._size]
+            for mac in slot:
+                del self._entries[mac]
+            slot.clear()
+        self._now = now
+
+    def observe(self, mac: str, timestamp: int, rssi: int, randomized: bool) -> None:
+        """
+        Наблюдение MAC (вызывать после advance(now))
+
+        Наблюдения старше окна игнорируются; timestamp из будущего (часы
+        роутера впереди) занимает слот текущей секунды.
+        """
+        now = self._now
+        if now is None or timestamp < now - self.window_sec:
+            return
+        second = min(timestamp, now)
+        previous = self._entries.get(mac)
+        if previous is not None:
+            if previous[1] > timestamp:
+                return
+            self._wheel[previous[0] % self._size].discard(mac)
+        self._wheel[second % self._size].add(mac)
+        self._entries[mac] = (second, timestamp, rssi, randomized)
+
+    def items(self) -> List[Tuple[str, int, int, bool]]:
+        """[(mac, timestamp, rssi, randomized)] по возрастанию timestamp"""
+        return sorted(
+            ((mac, ts, rssi, randomized) for mac, (_, ts, rssi, randomized) in self._entries.items()),
+            key=lambda item: item[1],
+        )
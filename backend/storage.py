@@ -3,29 +3,73 @@ In-memory хранилище для данных Wi-Fi мониторинга
 """
 import time
 from collections import deque
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Optional
-import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import metrics
+from device_index import DeviceIndex, DeviceQuery
+from sliding_window import SlidingWindow
+
+LOCK_WAIT_SECONDS = metrics.histogram(
+    "wifi_storage_lock_wait_seconds", "Ожидание блокировки WiFiDataStorage"
+)
+LOCK_HOLD_SECONDS = metrics.histogram(
+    "wifi_storage_lock_hold_seconds", "Удержание блокировки WiFiDataStorage"
+)
+EVICTIONS = metrics.counter(
+    "wifi_storage_evictions_total", "Устройства, вытесненные при достижении max_devices"
+)
 
 
 class WiFiDataStorage:
     """Потокобезопасное хранилище данных Wi-Fi мониторинга"""
     
-    def __init__(self, max_devices: int = 10000, max_timestamps: int = 1000):
+    def __init__(
+        self,
+        max_devices: int = 10000,
+        max_timestamps: int = 1000,
+        realtime_window_sec: int = 60,
+        journal_size: int = 1000,
+    ):
         """
         Инициализация хранилища
         
         Args:
             max_devices: Максимальное количество уникальных устройств
             max_timestamps: Максимальное количество временных меток
+            realtime_window_sec: Длина окна активных MAC для /api/stats/realtime
+            journal_size: Сколько последних изменений (версий) хранит журнал для changes_since()
         """
         self.max_devices = max_devices
         self.max_timestamps = max_timestamps
-        self._lock = threading.Lock()
+        # RLock: consistent_read() держит блокировку, а чтения внутри берут её повторно.
+        # Время ожидания и удержания пишется в метрики (/metrics)
+        self._lock = metrics.InstrumentedLock(LOCK_WAIT_SECONDS, LOCK_HOLD_SECONDS)
+        
+        # Версия данных: монотонно растёт при каждом изменении
+        # (add_data, clear, переклассификация). Ключ кеша ответов API.
+        self.version: int = 0
+        # Время последнего изменения (unix time) — для Last-Modified
+        self.modified_at: float = time.time()
         
         # Структуры данных:
         # devices: {mac: {latest_rssi, latest_timestamp, first_seen, last_seen, count}}
         self.devices: Dict[str, Dict] = {}
+        # Индексы по devices (сортировка, фильтры) для постраничной выдачи
+        self._index = DeviceIndex()
+        
+        # Максимальный timestamp среди принятых данных (не убывает до clear())
+        self.max_last_seen: int = 0
+        
+        # Журнал изменений устройств: (версия, изменённые MAC, вытесненные MAC)
+        # для дельта-синхронизации клиентов (changes_since). Изменения версий
+        # <= _journal_floor уже вытеснены из журнала — для них нужна полная выгрузка.
+        self._journal: deque = deque(maxlen=max(1, journal_size))
+        self._journal_floor: int = 0
+        
+        # Активные MAC за последние realtime_window_sec секунд (колесо времени)
+        self._window = SlidingWindow(realtime_window_sec)
         
         # timestamps: deque с последними временными метками и данными
         self.timestamps: deque = deque(maxlen=max_timestamps)
@@ -44,6 +88,43 @@ class WiFiDataStorage:
         self.last_snapshot_count: int = 0
         # История снимков: [{t, count}, ...] для графика
         self.snapshot_history: deque = deque(maxlen=5000)
+        
+        # Сколько исходных MAC представлено записями devices. Без кластеризации
+        # рандомных MAC совпадает с len(devices); с ней — кластер считается
+        # по числу MAC-участников (поле "members").
+        self.raw_unique_devices: int = 0
+        # Кол-во исходных (до кластеризации) уникальных MAC в последнем снимке
+        self.last_snapshot_raw_count: int = 0
+        
+        # Подписчики на изменения: (callback, active) — callback вызывается после
+        # каждого add_data() с дельтой (вне блокировки, в потоке ingest)
+        self._listeners: List[Tuple[Callable[[Dict], None], Optional[Callable[[], bool]]]] = []
+    
+    def add_listener(
+        self,
+        callback: Callable[[Dict], None],
+        active: Optional[Callable[[], bool]] = None,
+    ) -> None:
+        """
+        Подписка на дельты add_data()
+        
+        Дельта: {"version", "devices": [изменённые устройства], "removed": [вытесненные MAC],
+        "snapshot": {"t", "count"}, "summary": get_snapshot_summary()}
+        
+        Args:
+            callback: Вызывается в потоке ingest — должен быть быстрым и не бросать исключений
+            active: Нужна ли сейчас дельта подписчику (например, есть ли клиенты);
+                проверяется под блокировкой на каждом батче — должна быть дешёвой.
+                Если ни одному подписчику дельта не нужна, она не собирается.
+                None — нужна всегда
+        """
+        with self._lock:
+            self._listeners = self._listeners + [(callback, active)]
+    
+    def remove_listener(self, callback: Callable[[Dict], None]) -> None:
+        """Отписка от дельт (связанные методы сравниваются по ==, не по is)"""
+        with self._lock:
+            self._listeners = [entry for entry in self._listeners if entry[0] != callback]
     
     def add_data(self, data: List[Dict]) -> None:
         """
@@ -52,8 +133,12 @@ class WiFiDataStorage:
         Args:
             data: Список словарей с ключами m (MAC), r (RSSI), t (timestamp)
         """
+        delta = None
         with self._lock:
+            touched = set()
+            removed = []
             current_time = datetime.utcnow()
+            self._bump_version()
             
             # Обновление статистики
             self.statistics["total_messages"] += 1
@@ -64,6 +149,7 @@ class WiFiDataStorage:
             # Обработка каждого устройства
             timestamp_data = {}
             now_ts = int(time.time())
+            self._window.advance(now_ts)
             for item in data:
                 mac = item.get("m", "").lower()
                 rssi = item.get("r", 0)
@@ -73,22 +159,28 @@ class WiFiDataStorage:
 
                 if not mac:
                     continue
+                if timestamp > self.max_last_seen:
+                    self.max_last_seen = timestamp
+                touched.add(mac)
                 
                 # Извлекаем дополнительные поля классификации (если есть)
                 vendor = item.get("vendor")
                 device_type = item.get("device_type")
                 device_brand = item.get("device_brand")
                 randomized = item.get("randomized", False)
+                # Псевдо-устройство из кластера рандомных MAC (mac_clustering.py)
+                is_cluster = "raw_mac" in item
                 
                 # Обновление информации об устройстве
                 if mac not in self.devices:
                     if len(self.devices) >= self.max_devices:
                         # Удаляем самое старое устройство
-                        oldest_mac = min(
-                            self.devices.keys(),
-                            key=lambda m: self.devices[m].get("last_seen", 0)
-                        )
-                        del self.devices[oldest_mac]
+                        oldest_mac = self._index.oldest()
+                        evicted = self.devices.pop(oldest_mac)
+                        removed.append(oldest_mac)
+                        EVICTIONS.inc()
+                        self._index.remove(oldest_mac, evicted)
+                        self.raw_unique_devices -= evicted.get("members", 1)
                     
                     self.devices[mac] = {
                         "first_seen": timestamp,
@@ -101,8 +193,13 @@ class WiFiDataStorage:
                         "device_brand": device_brand,
                         "randomized": randomized
                     }
+                    if is_cluster:
+                        self.devices[mac]["members"] = 0
+                    else:
+                        self.raw_unique_devices += 1
                     self.statistics["total_devices"] = len(self.devices)
                 else:
+                    self._index.remove(mac, self.devices[mac])
                     self.devices[mac]["last_seen"] = max(
                         self.devices[mac]["last_seen"],
                         timestamp
@@ -122,6 +219,11 @@ class WiFiDataStorage:
                     self.devices[mac]["randomized"] = randomized
                 
                 self.devices[mac]["count"] += 1
+                if is_cluster and (item.get("cluster_new_member") or not self.devices[mac]["members"]):
+                    self.devices[mac]["members"] += 1
+                    self.raw_unique_devices += 1
+                self._index.add(mac, self.devices[mac])
+                self._window.observe(mac, timestamp, rssi, bool(self.devices[mac]["randomized"]))
                 
                 # Сохранение данных для временной метки
                 if timestamp not in timestamp_data:
@@ -141,13 +243,16 @@ class WiFiDataStorage:
             
             # Подсчёт уникальных MAC в этом батче (дедупликация)
             unique_macs_in_batch = set()
+            unique_raw_macs_in_batch = set()
             for item in data:
                 mac = (item.get("m") or "").lower()
                 if mac:
                     unique_macs_in_batch.add(mac)
+                    unique_raw_macs_in_batch.add(item.get("raw_mac") or mac)
             
             batch_unique_count = len(unique_macs_in_batch)
             self.last_snapshot_count = batch_unique_count
+            self.last_snapshot_raw_count = len(unique_raw_macs_in_batch)
             if batch_unique_count > self.peak_snapshot_count:
                 self.peak_snapshot_count = batch_unique_count
             
@@ -161,6 +266,27 @@ class WiFiDataStorage:
             if snapshot_ts <= 0:
                 snapshot_ts = now_ts
             self.snapshot_history.append({"t": snapshot_ts, "count": batch_unique_count})
+            self._journal_append(touched, removed)
+            
+            listeners = [
+                callback for callback, active in self._listeners
+                if active is None or active()
+            ]
+            if listeners:
+                delta = {
+                    "version": self.version,
+                    "devices": [
+                        self._device_dict(mac, self.devices[mac])
+                        for mac in touched if mac in self.devices
+                    ],
+                    "removed": [mac for mac in removed if mac not in self.devices],
+                    "snapshot": {"t": snapshot_ts, "count": batch_unique_count},
+                    "summary": self._snapshot_summary_locked(),
+                }
+        
+        if delta is not None:
+            for callback in listeners:
+                callback(delta)
     
     def get_devices(self, limit: Optional[int] = None) -> List[Dict]:
         """
@@ -173,59 +299,219 @@ class WiFiDataStorage:
             Список устройств с информацией
         """
         with self._lock:
-            devices_list = []
-            for mac, info in self.devices.items():
-                device_dict = {
-                    "mac": mac,
-                    "first_seen": info["first_seen"],
-                    "last_seen": info["last_seen"],
-                    "count": info["count"],
-                    "best_rssi": info["best_rssi"],
-                    "latest_rssi": info["latest_rssi"]
-                }
-                # Добавляем поля классификации (если есть)
-                if "vendor" in info:
-                    device_dict["vendor"] = info["vendor"]
-                if "device_type" in info:
-                    device_dict["device_type"] = info["device_type"]
-                if "device_brand" in info:
-                    device_dict["device_brand"] = info["device_brand"]
-                if "randomized" in info:
-                    device_dict["randomized"] = info["randomized"]
-                devices_list.append(device_dict)
+            # Индекс уже упорядочен по last_seen — без сортировки всего списка
+            macs, _ = self._index.query(DeviceQuery(limit=limit or None), self.devices)
+            return [self._device_dict(mac, self.devices[mac]) for mac in macs]
+    
+    def get_device(self, mac: str) -> Optional[Dict]:
+        """
+        Одно устройство по MAC (O(1), короткая блокировка)
+        
+        Args:
+            mac: MAC адрес (регистр не важен)
             
-            # Сортировка по последнему времени обнаружения
-            devices_list.sort(key=lambda x: x["last_seen"], reverse=True)
+        Returns:
+            Копия записи устройства или None
+        """
+        mac = mac.lower()
+        with self._lock:
+            info = self.devices.get(mac)
+            return self._device_dict(mac, info) if info is not None else None
+    
+    def get_devices_by_mac(self, macs: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Пакетный поиск устройств по MAC (одна блокировка на весь список)
+        
+        Args:
+            macs: MAC адреса (регистр не важен)
+            
+        Returns:
+            {mac: запись устройства} только для найденных
+        """
+        keys = {mac.lower() for mac in macs if mac}
+        with self._lock:
+            return {
+                mac: self._device_dict(mac, self.devices[mac])
+                for mac in keys if mac in self.devices
+            }
+    
+    def query_devices(self, query: DeviceQuery) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Страница устройств с фильтрами и сортировкой (по индексам)
+        
+        Args:
+            query: Фильтры, сортировка, размер страницы и курсор
             
-            if limit:
-                devices_list = devices_list[:limit]
+        Returns:
+            (устройства страницы, курсор следующей страницы или None)
+        """
+        with self._lock:
+            macs, next_cursor = self._index.query(query, self.devices)
+            return [self._device_dict(mac, self.devices[mac]) for mac in macs], next_cursor
+    
+    def iter_devices(self, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+        """
+        Все устройства пачками по chunk_size (для экспорта)
+        
+        Блокировка берётся на каждую пачку отдельно (keyset по first_seen —
+        поле не меняется при обновлении устройства, поэтому устройство не
+        попадает в выгрузку дважды), ingest между пачками не блокируется.
+        """
+        cursor = None
+        while True:
+            devices, cursor = self.query_devices(
+                DeviceQuery(sort="first_seen", descending=False, limit=chunk_size, cursor=cursor)
+            )
+            if devices:
+                yield devices
+            if cursor is None:
+                return
+    
+    @staticmethod
+    def _device_dict(mac: str, info: Dict) -> Dict:
+        """Копия записи устройства для выдачи наружу"""
+        device_dict = {
+            "mac": mac,
+            "first_seen": info["first_seen"],
+            "last_seen": info["last_seen"],
+            "count": info["count"],
+            "best_rssi": info["best_rssi"],
+            "latest_rssi": info["latest_rssi"]
+        }
+        # Добавляем поля классификации (если есть)
+        for key in ("vendor", "device_type", "device_brand", "randomized", "members"):
+            if key in info:
+                device_dict[key] = info[key]
+        return device_dict
+    
+    def get_dashboard(self, limit: int = 100, recent_limit: int = 20) -> Dict:
+        """
+        Данные дашборда одним согласованным чтением (одна блокировка)
+        
+        Агрегаты поддерживаются инкрементально в add_data()/вытеснении,
+        поэтому стоимость не зависит от числа устройств (кроме limit).
+        
+        Args:
+            limit: Количество последних устройств (по last_seen)
+            recent_limit: Количество последних временных меток
             
-            return devices_list
+        Returns:
+            {"version", "statistics", "devices", "recent", "aggregates"}
+        """
+        with self._lock:
+            macs, _ = self._index.query(DeviceQuery(limit=limit or None), self.devices)
+            recent_start = max(0, len(self.timestamps) - recent_limit)
+            return {
+                "version": self.version,
+                "statistics": self._statistics_locked(),
+                "devices": [self._device_dict(mac, self.devices[mac]) for mac in macs],
+                "recent": [self.timestamps[i] for i in range(recent_start, len(self.timestamps))],
+                "aggregates": self._index.aggregates(),
+            }
     
-    def get_statistics(self) -> Dict:
-        """Получение статистики"""
+    def count_seen_within(self, timeframe_sec: int, now_ts: Optional[int] = None) -> Dict:
+        """
+        Количество устройств, замеченных за последние timeframe_sec секунд
+        
+        Конец окна — max(now_ts, max_last_seen): данные с часами роутера
+        впереди серверных не теряются. Подсчёт — по индексу last_seen (O(log n)).
+        
+        Args:
+            timeframe_sec: Длина окна, сек
+            now_ts: Текущее время (по умолчанию time.time())
+            
+        Returns:
+            {"count", "start_ts", "end_ts"}
+        """
+        if now_ts is None:
+            now_ts = int(time.time())
         with self._lock:
+            end_ts = max(now_ts, self.max_last_seen)
+            start_ts = end_ts - timeframe_sec
             return {
-                **self.statistics,
-                "current_devices": len(self.devices),
-                "timestamps_count": len(self.timestamps),
-                "peak_snapshot_count": self.peak_snapshot_count,
-                "last_snapshot_count": self.last_snapshot_count,
+                "count": self._index.count_last_seen(start_ts, end_ts),
+                "start_ts": start_ts,
+                "end_ts": end_ts,
             }
     
+    def get_statistics(self) -> Dict:
+        """Получение статистики"""
+        with self._lock:
+            return self._statistics_locked()
+    
+    def _statistics_locked(self) -> Dict:
+        return {
+            **self.statistics,
+            "current_devices": len(self.devices),
+            "timestamps_count": len(self.timestamps),
+            "peak_snapshot_count": self.peak_snapshot_count,
+            "last_snapshot_count": self.last_snapshot_count,
+            "raw_devices": self.raw_unique_devices,
+        }
+    
     def get_snapshot_summary(self) -> Dict:
         """
         Возвращает сводку по снимкам:
         - peak_all_time: макс. уникальных устройств в одном батче за всё время
         - last_snapshot: кол-во уникальных устройств в последнем батче
         - total_unique: общее кол-во уникальных MAC за всё время
+        - total_unique_raw / last_snapshot_raw: то же до кластеризации
+          рандомных MAC (без кластеризации совпадают)
         """
         with self._lock:
-            return {
-                "peak_all_time": self.peak_snapshot_count,
-                "last_snapshot": self.last_snapshot_count,
-                "total_unique": len(self.devices),
-            }
+            return self._snapshot_summary_locked()
+    
+    def _snapshot_summary_locked(self) -> Dict:
+        return {
+            "peak_all_time": self.peak_snapshot_count,
+            "last_snapshot": self.last_snapshot_count,
+            "total_unique": len(self.devices),
+            "last_snapshot_raw": self.last_snapshot_raw_count,
+            "total_unique_raw": self.raw_unique_devices,
+        }
+    
+    def get_snapshots(self, start_ts: int, end_ts: int) -> List[Dict]:
+        """
+        Снимки истории с t в [start_ts, end_ts], упорядоченные по t
+        
+        При буферизации роутера порядок поступления != порядок по t, поэтому
+        снимки сортируются; при совпадении t остаётся снимок с макс. count.
+        Под блокировкой — только копия ссылок истории.
+        """
+        return self.select_snapshots(self.get_snapshot_history(), start_ts, end_ts)
+    
+    @staticmethod
+    def select_snapshots(history: Iterable[Dict], start_ts: int, end_ts: int) -> List[Dict]:
+        """Снимки копии истории (get_snapshot_history) с t в [start_ts, end_ts], как get_snapshots"""
+        snapshots = [s for s in history if start_ts <= s["t"] <= end_ts]
+        points: List[Dict] = []
+        for s in sorted(snapshots, key=lambda s: s["t"]):
+            if points and points[-1]["t"] == s["t"]:
+                if s["count"] > points[-1]["count"]:
+                    points[-1] = s
+            else:
+                points.append(s)
+        return points
+    
+    def get_realtime_window(self, now_ts: Optional[int] = None) -> List[Tuple[str, int, int, bool]]:
+        """
+        Активные MAC окна realtime_window_sec: последнее наблюдение каждого
+        
+        Окно поддерживается в add_data() — таблица устройств не читается.
+        
+        Returns:
+            [(mac, timestamp, rssi, randomized)] по возрастанию timestamp
+        """
+        if now_ts is None:
+            now_ts = int(time.time())
+        with self._lock:
+            self._window.advance(now_ts)
+            return self._window.items()
+    
+    def get_snapshot_history(self) -> List[Dict]:
+        """Копия истории снимков в порядке поступления (не больше maxlen записей)"""
+        with self._lock:
+            return list(self.snapshot_history)
     
     def get_recent_data(self, limit: int = 100) -> List[Dict]:
         """
@@ -295,10 +581,153 @@ class WiFiDataStorage:
             
             return len(unique_macs)
     
+    def reclassify_devices(
+        self,
+        classify_fn: Callable[[str, bool], Dict],
+        slice_size: int = 500,
+        pause_sec: float = 0.0,
+    ) -> int:
+        """
+        Переклассификация уже сохранённых устройств (после смены правил).
+        
+        Идёт срезами по slice_size MAC: классификация — вне блокировки,
+        применение результатов — под короткой блокировкой на срез, так что
+        add_data() не ждёт весь проход.
+        
+        Args:
+            classify_fn: (mac, randomized) -> {"vendor", "device_type", "device_brand"}
+            slice_size: Размер среза
+            pause_sec: Пауза между срезами (уступить ingest)
+            
+        Returns:
+            Количество обновлённых устройств
+        """
+        with self._lock:
+            macs = [mac for mac, info in self.devices.items() if "members" not in info]
+        
+        updated = 0
+        for start in range(0, len(macs), slice_size):
+            chunk = macs[start:start + slice_size]
+            with self._lock:
+                flags = [(mac, self.devices[mac].get("randomized", False)) for mac in chunk if mac in self.devices]
+            results = [(mac, classify_fn(mac, randomized)) for mac, randomized in flags]
+            with self._lock:
+                for mac, cls in results:
+                    info = self.devices.get(mac)
+                    if info is None:
+                        continue
+                    self._index.remove(mac, info)
+                    info["vendor"] = cls.get("vendor")
+                    info["device_type"] = cls.get("device_type")
+                    info["device_brand"] = cls.get("device_brand")
+                    self._index.add(mac, info)
+                    updated += 1
+                if results:
+                    self._bump_version()
+                    self._journal_append([mac for mac, _ in results], ())
+            if pause_sec:
+                time.sleep(pause_sec)
+        return updated
+    
+    def _journal_append(self, changed: Iterable[str], removed: Iterable[str]) -> None:
+        """Запись изменений текущей версии в журнал (вызывается под _lock после _bump_version)"""
+        if len(self._journal) == self._journal.maxlen:
+            self._journal_floor = self._journal[0][0]
+        self._journal.append((self.version, tuple(changed), tuple(removed)))
+    
+    def changes_since(self, since: int) -> Optional[Dict]:
+        """
+        Устройства, изменённые после версии since (дельта-синхронизация)
+        
+        Args:
+            since: Версия из предыдущего ответа клиента
+            
+        Returns:
+            {"version", "devices": [добавленные/обновлённые], "removed": [MAC]}
+            или None, если since старше журнала (или из другого процесса) —
+            нужна полная выгрузка
+        """
+        with self._lock:
+            if since < self._journal_floor or since > self.version:
+                return None
+            changed = set()
+            removed = set()
+            # С конца журнала до версии since: стоимость — O(изменений), не O(устройств)
+            for version, batch_changed, batch_removed in reversed(self._journal):
+                if version <= since:
+                    break
+                changed.update(batch_changed)
+                removed.update(batch_removed)
+            # Итог по текущему состоянию: вытесненный и снова добавленный MAC — изменён
+            return {
+                "version": self.version,
+                "devices": [self._device_dict(mac, self.devices[mac]) for mac in changed if mac in self.devices],
+                "removed": sorted(mac for mac in changed | removed if mac not in self.devices),
+            }
+    
+    def _bump_version(self) -> None:
+        """Отметка изменения данных (вызывается под _lock)"""
+        self.version += 1
+        self.modified_at = time.time()
+    
+    @contextmanager
+    def consistent_read(self) -> Iterator[int]:
+        """
+        Несколько чтений как одно согласованное: внутри блока любые методы
+        чтения видят одну версию данных (add_data() ждёт выхода из блока)
+        
+        Блок должен быть коротким — он задерживает приём данных.
+        
+        Yields:
+            Версия данных, которую видят чтения внутри блока
+        """
+        with self._lock:
+            yield self.version
+    
+    def get_version(self) -> int:
+        """Текущая версия данных (для кеширования ответов)"""
+        return self.version
+
+    def get_sizes(self) -> Dict[str, int]:
+        """Размеры структур (для /metrics): устройства, метки, история снимков, журнал, окно"""
+        with self._lock:
+            return {
+                "devices": len(self.devices),
+                "timestamps": len(self.timestamps),
+                "snapshot_history": len(self.snapshot_history),
+                "journal": len(self._journal),
+                "realtime_window": len(self._window),
+            }
+
+    def set_lock_profiling(self, enabled: bool, reset: bool = False) -> None:
+        """
+        Профиль блокировки по вызывающим методам (ожидание, удержание, кто кого
+        блокирует); включается и выключается на лету
+
+        Args:
+            enabled: Включить запись профиля
+            reset: Начать профиль заново
+        """
+        self._lock.set_profiling(enabled, reset)
+
+    def get_lock_profile(self) -> Dict:
+        """Отчёт профиля блокировки ({"enabled": False} — профилирование выключено)"""
+        profile = self._lock.profile
+        if profile is None:
+            return {"enabled": False}
+        return {"enabled": True, **profile.report()}
+
     def clear(self) -> None:
         """Очистка всех данных"""
         with self._lock:
+            self._bump_version()
+            # Все устройства удалены: дельта невозможна, клиентам нужна полная выгрузка
+            self._journal.clear()
+            self._journal_floor = self.version
             self.devices.clear()
+            self._index.clear()
+            self._window.clear()
+            self.max_last_seen = 0
             self.timestamps.clear()
             self.snapshot_history.clear()
             self.statistics = {
@@ -309,3 +738,5 @@ class WiFiDataStorage:
             }
             self.peak_snapshot_count = 0
             self.last_snapshot_count = 0
+            self.raw_unique_devices = 0
+            self.last_snapshot_raw_count = 0
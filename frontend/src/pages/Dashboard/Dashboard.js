@@ -1,15 +1,32 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import MetricCard from '../../components/MetricCard/MetricCard';
 import TimeframeSelector from '../../components/TimeframeSelector/TimeframeSelector';
 import RSSIChart from '../../components/RSSIChart/RSSIChart';
 import DevicesTable from '../../components/DevicesTable/DevicesTable';
-import { getDeviceTimeseries, getDevicesCount, getDevices, getStatsSummary } from '../../services/api';
+import { queryPanels, subscribeToUpdates } from '../../services/api';
 import './Dashboard.css';
 
 const ROUTERS_KEY = 'myd_routers';
 
+// Не чаще одного обновления графика/счётчика по push-событиям
+const STREAM_REFRESH_MIN_MS = 10000;
+
 const periodLabels = { '1h': '1 час', '6h': '6 часов', '12h': '12 часов', '1d': '1 день', '30d': '30 дней' };
 
+// Применение дельты списка устройств: изменённые — в начало (самые свежие по last_seen)
+const mergeDevices = (prev, changed, removed) => {
+  if (changed.length === 0 && removed.size === 0) return prev;
+  const byMac = new Map(changed.map((d) => [d.mac, d]));
+  const rest = prev.filter((d) => !byMac.has(d.mac) && !removed.has(d.mac));
+  return [...changed, ...rest];
+};
+
+// Панели графика и счётчика периода
+const periodPanels = (timeframe) => [
+  { id: 'chart', panel: 'timeseries', params: { timeframe } },
+  { id: 'count', panel: 'count', params: { timeframe } },
+];
+
 const loadRouters = () => {
   try {
     const stored = JSON.parse(localStorage.getItem(ROUTERS_KEY));
@@ -35,6 +52,8 @@ const Dashboard = () => {
   const [summary, setSummary] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Версия хранилища последнего загруженного списка устройств (для devices.since)
+  const devicesVersion = useRef(null);
 
   const selectedRouter = routers.find((r) => r.id === selectedRouterId) || routers[0];
   const isActiveRouter = selectedRouter?.isPrimary;
@@ -46,42 +65,35 @@ const Dashboard = () => {
       setDevicesCount(null);
       setDevices([]);
       setSummary(null);
+      devicesVersion.current = null;
       return;
     }
 
     try {
       setError(null);
 
-      const [timeseriesResponse, countResponse, devicesResponse, summaryResponse] = await Promise.all([
-        getDeviceTimeseries(timeframe).catch((err) => {
-          console.warn('Timeseries error:', err);
-          return null;
-        }),
-        getDevicesCount(timeframe).catch((err) => {
-          console.warn('Devices count error:', err);
-          return null;
-        }),
-        getDevices().catch((err) => {
-          console.warn('Devices error:', err);
-          return { devices: [] };
-        }),
-        getStatsSummary().catch((err) => {
-          console.warn('Summary error:', err);
-          return null;
-        }),
+      // Все панели одним GET по одному состоянию хранилища (ETag/304 — повторный опрос
+      // без изменений дёшев); список устройств после первой загрузки — только изменения
+      const since = devicesVersion.current;
+      const { results, errors } = await queryPanels([
+        ...periodPanels(timeframe),
+        { id: 'devices', panel: 'devices', params: since !== null ? { since } : {} },
+        { id: 'summary', panel: 'summary' },
       ]);
-
-      if (timeseriesResponse) setTimeseries(timeseriesResponse);
-      if (countResponse) setDevicesCount(countResponse);
-
-      if (devicesResponse) {
-        const devicesList = Array.isArray(devicesResponse)
-          ? devicesResponse
-          : devicesResponse.devices || devicesResponse.data || [];
-        setDevices(devicesList);
+      Object.entries(errors || {}).forEach(([id, message]) => console.warn(`Panel ${id} error:`, message));
+
+      if (results.chart) setTimeseries(results.chart);
+      if (results.count) setDevicesCount(results.count);
+      if (results.devices) {
+        const page = results.devices;
+        if (since === null || page.full) {
+          setDevices(page.devices);
+        } else {
+          setDevices((prev) => mergeDevices(prev, page.devices, new Set(page.removed || [])));
+        }
+        devicesVersion.current = page.version;
       }
-
-      if (summaryResponse) setSummary(summaryResponse);
+      if (results.summary) setSummary(results.summary);
       setLoading(false);
     } catch (err) {
       console.error('Error fetching data:', err);
@@ -97,6 +109,51 @@ const Dashboard = () => {
     return () => clearInterval(intervalId);
   }, [fetchData]);
 
+  // Push-обновления: сводка и таблица применяются из дельты сразу,
+  // график и счётчик периода перезапрашиваются (с ETag — дёшево) не чаще STREAM_REFRESH_MIN_MS
+  useEffect(() => {
+    if (!isActiveRouter) return undefined;
+    let lastRefresh = 0;
+    let refreshTimer = null;
+
+    const scheduleRefresh = () => {
+      if (refreshTimer) return;
+      const wait = Math.max(0, lastRefresh + STREAM_REFRESH_MIN_MS - Date.now());
+      refreshTimer = setTimeout(() => {
+        refreshTimer = null;
+        lastRefresh = Date.now();
+        queryPanels(periodPanels(timeframe))
+          .then(({ results }) => {
+            if (results.chart) setTimeseries(results.chart);
+            if (results.count) setDevicesCount(results.count);
+          })
+          .catch((err) => console.warn('Stream refresh error:', err));
+      }, wait);
+    };
+
+    const unsubscribe = subscribeToUpdates({
+      onHello: () => {
+        // (Пере)подключение: события между опросами могли быть пропущены
+        lastRefresh = Date.now();
+        fetchData();
+      },
+      onBatch: (delta) => {
+        if (delta.summary) setSummary(delta.summary);
+        const changed = delta.devices || [];
+        const removed = new Set(delta.removed || []);
+        if (changed.length > 0 || removed.size > 0) {
+          setDevices((prev) => mergeDevices(prev, changed, removed));
+        }
+        scheduleRefresh();
+      },
+    });
+
+    return () => {
+      unsubscribe();
+      if (refreshTimer) clearTimeout(refreshTimer);
+    };
+  }, [isActiveRouter, timeframe, fetchData]);
+
   const peakAllTime = summary?.peak_all_time ?? 0;
   const activeDevicesPeriod = devicesCount?.count ?? 0;
   const lastSnapshotCount = summary?.last_snapshot ?? 0;
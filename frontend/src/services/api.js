@@ -2,12 +2,58 @@ import axios from 'axios';
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5000/api';
 
+// Push-поток обновлений (SSE, отдельный порт бэкенда)
+const STREAM_URL = process.env.REACT_APP_STREAM_URL || 'http://localhost:5001/api/stream';
+
 const apiClient = axios.create({
   baseURL: API_BASE_URL,
   timeout: 10000,
   headers: {
     'Content-Type': 'application/json',
   },
+  // 304 Not Modified — не ошибка: данные берутся из etagCache
+  validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+});
+
+/**
+ * Условные запросы: последний ответ каждого GET хранится вместе с ETag.
+ * Повторный опрос отправляет If-None-Match; если данные на сервере не
+ * изменились, приходит пустой 304 и подставляется сохранённый ответ.
+ */
+const etagCache = new Map();
+
+const etagCacheKey = (config) => apiClient.getUri(config);
+
+apiClient.interceptors.request.use((config) => {
+  if ((config.method || 'get').toLowerCase() === 'get') {
+    const cached = etagCache.get(etagCacheKey(config));
+    if (cached) {
+      config.headers['If-None-Match'] = cached.etag;
+    }
+  }
+  return config;
+});
+
+apiClient.interceptors.response.use((response) => {
+  const { config } = response;
+  if ((config.method || 'get').toLowerCase() !== 'get') {
+    return response;
+  }
+  const key = etagCacheKey(config);
+  if (response.status === 304) {
+    const cached = etagCache.get(key);
+    if (cached) {
+      return { ...response, status: 200, data: cached.data };
+    }
+    return response;
+  }
+  const etag = response.headers && response.headers.etag;
+  if (etag) {
+    etagCache.set(key, { etag, data: response.data });
+  } else {
+    etagCache.delete(key);
+  }
+  return response;
 });
 
 /**
@@ -27,12 +73,14 @@ export const getRealtimeStats = async () => {
 /**
  * Временной ряд: уникальные устройства во времени (по last_seen по бакетам)
  * @param {string} timeframe - 10m|30m|1h|1d|30d
- * @returns {Promise<Object>} { timeframe, start_ts, end_ts, bucket_sec, points: [{t, count}] }
+ * @param {Object} range - { start, end, maxPoints, downsample } (опционально, unix ts)
+ * @returns {Promise<Object>} { timeframe, start_ts, end_ts, bucket_sec, raw_points, downsampled, points: [{t, count}] }
  */
-export const getDeviceTimeseries = async (timeframe = '1h') => {
+export const getDeviceTimeseries = async (timeframe = '1h', range = {}) => {
   try {
+    const { start, end, maxPoints, downsample } = range;
     const response = await apiClient.get('/stats/devices_timeseries', {
-      params: { timeframe },
+      params: { timeframe, start, end, max_points: maxPoints, downsample },
     });
     return response.data;
   } catch (error) {
@@ -74,11 +122,12 @@ export const getStatsSummary = async () => {
 
 /**
  * Получение списка устройств
+ * @param {Object} [params] - Фильтры и сортировка (см. getDevicesPage)
  * @returns {Promise<Array>} Список устройств
  */
-export const getDevices = async () => {
+export const getDevices = async (params = {}) => {
   try {
-    const response = await apiClient.get('/devices');
+    const response = await apiClient.get('/devices', { params });
     // Обработка разных форматов ответа
     if (Array.isArray(response.data)) {
       return response.data;
@@ -90,6 +139,63 @@ export const getDevices = async () => {
   }
 };
 
+/**
+ * Страница устройств: фильтрация и сортировка на сервере
+ * @param {Object} params - { limit, cursor, sort: last_seen|first_seen|rssi|count, order: desc|asc,
+ *   device_type, device_brand, vendor (через запятую), randomized, rssi_min, rssi_max,
+ *   last_seen_from, last_seen_to }
+ * @returns {Promise<Object>} { devices, count, next_cursor } — next_cursor передаётся в следующий запрос
+ */
+export const getDevicesPage = async (params = {}) => {
+  try {
+    const response = await apiClient.get('/devices', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching devices page:', error);
+    throw error;
+  }
+};
+
+/**
+ * Несколько панелей одним запросом по одному согласованному состоянию хранилища
+ * (GET /api/query — с ETag: повторный опрос без новых данных получает 304)
+ * @param {Array<Object>} queries - [{ id, panel: summary|statistics|count|timeseries|realtime|devices, params }]
+ * @returns {Promise<Object>} { version, results: { id: данные }, errors: { id: сообщение } }
+ */
+export const queryPanels = async (queries) => {
+  try {
+    const params = {
+      panels: queries.map(({ id, panel }) => (id && id !== panel ? `${id}:${panel}` : panel)).join(','),
+    };
+    queries.forEach(({ id, panel, params: panelParams = {} }) => {
+      Object.entries(panelParams).forEach(([name, value]) => {
+        if (value !== undefined && value !== null) params[`${id || panel}.${name}`] = value;
+      });
+    });
+    const response = await apiClient.get('/query', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching panels:', error);
+    throw error;
+  }
+};
+
+/**
+ * Изменения списка устройств после версии since (дельта-синхронизация)
+ * @param {number} since - version из предыдущего ответа /devices
+ * @returns {Promise<Object>} { devices, removed, version, full } — при full=true devices содержит весь
+ *   список и заменяет локальный целиком
+ */
+export const getDevicesSince = async (since) => {
+  try {
+    const response = await apiClient.get('/devices', { params: { since } });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching device changes:', error);
+    throw error;
+  }
+};
+
 /**
  * Статистика системы (для определения статуса роутера)
  * @returns {Promise<Object>} Общая статистика
@@ -104,4 +210,30 @@ export const getStatistics = async () => {
   }
 };
 
+/**
+ * Подписка на push-обновления после каждого батча (Server-Sent Events)
+ * @param {Object} handlers
+ * @param {Function} handlers.onBatch - (delta) => void; delta: { version, devices, removed, snapshot, summary }
+ * @param {Function} [handlers.onHello] - ({ version, summary }) => void; при (пере)подключении —
+ *   пора загрузить полное состояние через REST
+ * @param {Function} [handlers.onError] - (event) => void; EventSource переподключается сам
+ * @returns {Function} Отписка (закрывает соединение)
+ */
+export const subscribeToUpdates = ({ onBatch, onHello, onError } = {}) => {
+  if (typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(STREAM_URL);
+  source.addEventListener('hello', (event) => {
+    if (onHello) onHello(JSON.parse(event.data));
+  });
+  source.addEventListener('batch', (event) => {
+    if (onBatch) onBatch(JSON.parse(event.data));
+  });
+  source.onerror = (event) => {
+    if (onError) onError(event);
+  };
+  return () => source.close();
+};
+
 export default apiClient;
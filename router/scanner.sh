@@ -5,7 +5,9 @@
 # - Monitor interface: mon0 (or from /etc/scanner.conf)
 # - Captures Probe Requests via tcpdump (BPF: type mgt subtype probe-req)
 # - Channel hopping: 1 / 6 / 11
-# - Sends JSON to MQTT: {"t":unix_ts,"d":[{"m":"..","r":-63,"x":1},...],"c":N}
+# - Sends JSON to MQTT: {"t":unix_ts,"id":"router","d":[{"m":"..","r":-63,"x":1},...],"c":N}
+# - ROUTER_ID: идентификатор роутера в payload (по умолчанию hostname) — по нему
+#   backend различает сенсоры на общем топике
 # - CYCLE_TIME: отправка каждые N сек (по умолчанию 600 = 10 минут)
 # - Локальный буфер: если MQTT недоступен, данные сохраняются и досылаются позже
 # ---------------------------
@@ -28,6 +30,11 @@ if [ -z "$INTERFACE" ] || [ -z "$MQTT_HOST" ] || [ -z "$MQTT_TOPIC" ]; then
 fi
 
 # ---- Defaults ----
+# ROUTER_ID: уникальный id роутера (сенсора); допустимы буквы, цифры, . _ -
+ROUTER_ID=${ROUTER_ID:-"$(uci -q get system.@system[0].hostname 2>/dev/null || cat /proc/sys/kernel/hostname)"}
+ROUTER_ID="$(echo "$ROUTER_ID" | tr -cd 'A-Za-z0-9._-')"
+[ -z "$ROUTER_ID" ] && ROUTER_ID="router"
+
 # CYCLE_TIME: интервал отправки в секундах (по умолчанию 600 = каждые 10 минут)
 # Роутер агрегирует данные и отправляет раз в CYCLE_TIME секунд — для графика с шагом 10 мин
 CYCLE_TIME=${CYCLE_TIME:-600}
@@ -202,7 +209,7 @@ while true; do
 
     # Build JSON payload from captured lines
     JSON_PAYLOAD="$(
-    awk -v ts="$TS" '
+    awk -v ts="$TS" -v id="$ROUTER_ID" '
     {
         # RSSI: look for -NNdBm (tcpdump radiotap prints like -40dBm)
         if (match($0, /-[0-9]+dBm/)) {
@@ -238,7 +245,7 @@ while true; do
     }
     END {
         c = 0
-        printf "{\"t\":%d,\"d\":[", ts
+        printf "{\"t\":%d,\"id\":\"%s\",\"d\":[", ts, id
         first = 1
         for (m in max_rssi) {
             if (!first) printf ","
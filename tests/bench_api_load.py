@@ -0,0 +1,201 @@
+"""
+Нагрузочный тест API: запросы/с и p99 задержки основных endpoint'ов
+для режимов сервера werkzeug (dev) и waitress (api_server.py).
+
+Сервер поднимается в этом же процессе поверх хранилища с синтетическими
+устройствами (как в main.py — общий WiFiDataStorage); фоновый ingest
+раз в --ingest-interval сек меняет версию хранилища, чтобы кеши ответов
+не давали нереалистично 100% попаданий.
+
+Клиенты — потоки с keep-alive соединениями (http.client).
+
+Запуск:
+  python tests/bench_api_load.py                          # оба режима
+  python tests/bench_api_load.py --mode waitress --clients 64 --duration 10
+  python tests/bench_api_load.py --url http://localhost:5000   # уже запущенный сервер
+                                                               # (без API_RATE_LIMIT)
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from api_server import APIServer
+import dashboard_api
+from dashboard_api import app, init_api
+from storage import WiFiDataStorage
+
+DEFAULT_ENDPOINTS = [
+    "/api/dashboard",
+    "/api/stats/summary",
+    "/api/stats/count?timeframe=1h",
+    "/api/stats/devices_timeseries?timeframe=1h",
+    "/api/devices?limit=100",
+    "/api/devices",
+]
+
+
+def synthetic_batch(rng: random.Random, macs: List[str], size: int, ts: int) -> List[Dict]:
+    return [
+        {
+            "m": mac,
+            "r": -rng.randint(30, 95),
+            "t": ts,
+            "vendor": rng.choice(["Apple", "Samsung", "Intel", None]),
+            "device_type": rng.choice(["smartphone", "laptop", "other"]),
+            "device_brand": None,
+            "randomized": bool(int(mac[1], 16) & 2),
+        }
+        for mac in rng.sample(macs, min(size, len(macs)))
+    ]
+
+
+def fill_storage(storage: WiFiDataStorage, devices: int, seed: int = 1) -> List[str]:
+    """Наполнение хранилища: devices уникальных MAC, снимки за последний час"""
+    rng = random.Random(seed)
+    macs = [":".join(f"{rng.randrange(256):02x}" for _ in range(6)) for _ in range(devices)]
+    now = int(time.time())
+    for start in range(0, devices, 200):
+        storage.add_data(synthetic_batch(rng, macs[start:start + 200], 200, now - 3600 + start % 3600))
+    return macs
+
+
+def run_clients(host: str, port: int, path: str, clients: int, duration: float) -> Dict:
+    """Нагрузка на один endpoint: clients потоков, duration секунд"""
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    errors = [0] * clients
+    deadline = time.perf_counter() + duration
+
+    def worker(i: int) -> None:
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        own = latencies[i]
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors[i] += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                errors[i] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            own.append(time.perf_counter() - t0)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(clients)]
+    t_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+
+    all_latencies = sorted(x for own in latencies for x in own)
+    n = len(all_latencies)
+    return {
+        "path": path,
+        "requests": n,
+        "errors": sum(errors),
+        "rps": n / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": statistics.median(all_latencies) * 1000 if n else None,
+        "p99_ms": all_latencies[min(n - 1, int(n * 0.99))] * 1000 if n else None,
+    }
+
+
+def run_mode(mode: Optional[str], args, storage: Optional[WiFiDataStorage], macs: List[str]) -> List[Dict]:
+    server = None
+    stop_ingest = threading.Event()
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        server = APIServer(app, "127.0.0.1", 0, mode=mode, threads=args.threads)
+        threading.Thread(target=server.run, daemon=True).start()
+        host, port = "127.0.0.1", server.port
+        print(f"Сервер: {server.describe()}")
+
+        if args.ingest_interval > 0:
+            def ingest() -> None:
+                rng = random.Random(2)
+                while not stop_ingest.wait(args.ingest_interval):
+                    storage.add_data(synthetic_batch(rng, macs, 200, int(time.time())))
+            threading.Thread(target=ingest, daemon=True).start()
+
+    results = []
+    try:
+        for path in args.endpoints:
+            run_clients(host, port, path, min(args.clients, 4), 0.5)  # прогрев
+            result = run_clients(host, port, path, args.clients, args.duration)
+            result["mode"] = mode or args.url
+            results.append(result)
+            p50 = f"{result['p50_ms']:.1f}" if result["p50_ms"] is not None else "—"
+            p99 = f"{result['p99_ms']:.1f}" if result["p99_ms"] is not None else "—"
+            print(f"  {path:<45} {result['rps']:>9,.0f} {p50:>9} {p99:>9} {result['errors']:>7}")
+    finally:
+        stop_ingest.set()
+        if server is not None:
+            server.close()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--mode", nargs="*", default=["werkzeug", "waitress"],
+                        help="Режимы сервера (werkzeug, waitress)")
+    parser.add_argument("--url", help="Тестировать уже запущенный сервер вместо встроенного")
+    parser.add_argument("--endpoints", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--devices", type=int, default=5000, help="Устройств в хранилище")
+    parser.add_argument("--clients", type=int, default=32, help="Одновременных клиентов")
+    parser.add_argument("--duration", type=float, default=5.0, help="Секунд на endpoint")
+    parser.add_argument("--threads", type=int, default=8, help="Потоков waitress")
+    parser.add_argument("--ingest-interval", type=float, default=1.0,
+                        help="Интервал фонового add_data, сек (0 — без ingest)")
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    # Лог каждого запроса (werkzeug) и переполнения очереди (waitress) искажают замер
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)
+
+    storage = macs = None
+    if not args.url:
+        storage = WiFiDataStorage(max_devices=max(args.devices, 10000))
+        macs = fill_storage(storage, args.devices)
+        init_api(storage)
+        # Все клиенты теста — один IP: лимит на клиента (API_RATE_LIMIT) отключается
+        dashboard_api.rate_limiter.rate = 0
+
+    print("=" * 80)
+    print(f"Нагрузочный тест API: {args.clients} клиентов, {args.duration:.0f} с на endpoint, "
+          f"{args.devices if not args.url else '?'} устройств")
+    print("=" * 80)
+    print(f"  {'endpoint':<45} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+
+    results = []
+    for mode in ([None] if args.url else args.mode):
+        results.extend(run_mode(mode, args, storage, macs))
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"clients": args.clients, "duration": args.duration,
+                       "devices": args.devices, "results": results}, f, indent=2)
+        print(f"\nРезультаты сохранены: {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
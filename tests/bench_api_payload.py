@@ -0,0 +1,156 @@
+"""
+Бенчмарк размера и сериализации ответа /api/devices при 10k и 100k устройств.
+
+Измеряет для полного и компактного (?compact=1) формата:
+1. Размер JSON и время сериализации: stdlib json (провайдер Flask по
+   умолчанию) против orjson (fast_json.py, если установлен)
+2. Размер и время сжатия gzip / brotli (если установлен)
+3. Полный запрос через Flask test client (построение + сериализация + сжатие)
+
+Запуск:
+  python tests/bench_api_payload.py
+  python tests/bench_api_payload.py --sizes 10000 100000 --repeat 5 --json payload.json
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import fast_json
+import dashboard_api
+from dashboard_api import app, format_device, init_api
+from storage import WiFiDataStorage
+
+
+def fill_storage(devices: int, seed: int = 1) -> WiFiDataStorage:
+    rng = random.Random(seed)
+    storage = WiFiDataStorage(max_devices=devices)
+    now = int(time.time())
+    vendors = ["Apple", "Samsung Electronics", "Intel Corporate", "Xiaomi", None]
+    types = ["smartphone", "laptop", "tablet", "other"]
+    batch = []
+    for i in range(devices):
+        first = rng.randrange(256)
+        batch.append({
+            "m": f"{first:02x}:" + ":".join(f"{rng.randrange(256):02x}" for _ in range(4)) + f":{i % 256:02x}",
+            "r": -rng.randint(30, 95),
+            "t": now - rng.randrange(86400),
+            "vendor": rng.choice(vendors),
+            "device_type": rng.choice(types),
+            "device_brand": rng.choice(["apple", "samsung", None]),
+            "randomized": bool(first & 2),
+        })
+        if len(batch) == 1000:
+            storage.add_data(batch)
+            batch = []
+    if batch:
+        storage.add_data(batch)
+    return storage
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    """Минимальное время (мс) из repeat запусков"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def stdlib_dumps(obj: Dict) -> bytes:
+    # Как DefaultJSONProvider Flask: компактно, sort_keys, ensure_ascii
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+def measure(storage: WiFiDataStorage, repeat: int) -> List[Dict]:
+    rows = []
+    devices = storage.get_devices()
+    for compact in (False, True):
+        payload = {"devices": [format_device(d, compact) for d in devices], "count": len(devices)}
+        raw = fast_json.dumps(payload)
+        row = {
+            "devices": len(devices),
+            "format": "compact" if compact else "full",
+            "json_bytes": len(raw),
+            "build_ms": best_of(lambda: [format_device(d, compact) for d in devices], repeat),
+            "stdlib_json_ms": best_of(lambda: stdlib_dumps(payload), repeat),
+            f"{fast_json.backend_name()}_ms": best_of(lambda: fast_json.dumps(payload), repeat),
+            "gzip_bytes": len(gzip.compress(raw, compresslevel=fast_json.GZIP_LEVEL)),
+            "gzip_ms": best_of(lambda: fast_json.compress(raw, "gzip"), repeat),
+        }
+        if "br" in fast_json.supported_encodings():
+            row["br_bytes"] = len(fast_json.compress(raw, "br"))
+            row["br_ms"] = best_of(lambda: fast_json.compress(raw, "br"), repeat)
+        rows.append(row)
+    return rows
+
+
+def measure_requests(storage: WiFiDataStorage, repeat: int) -> List[Dict]:
+    """Полный запрос /api/devices (без 304 и кеша: каждый раз новая версия)"""
+    init_api(storage)
+    dashboard_api.rate_limiter.rate = 0  # запросы подряд от одного клиента
+    client = app.test_client()
+    rows = []
+    for query in ("", "?compact=1"):
+        for encoding in ("identity",) + fast_json.supported_encodings():
+            def request() -> int:
+                storage.version += 1  # обход кеша ответов и ETag
+                return len(client.get("/api/devices" + query, headers={"Accept-Encoding": encoding}).data)
+            size = request()
+            rows.append({
+                "request": "/api/devices" + query,
+                "encoding": encoding,
+                "bytes": size,
+                "ms": best_of(request, repeat),
+            })
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк размера и сериализации ответов API")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    print("=" * 72)
+    print(f"Бенчмарк ответов API (сериализатор: {fast_json.backend_name()}, "
+          f"сжатие: {', '.join(fast_json.supported_encodings())})")
+    print("=" * 72)
+
+    results = {"serializer": fast_json.backend_name(), "payload": [], "requests": []}
+    for size in args.sizes:
+        storage = fill_storage(size)
+        print(f"\n{size:,} устройств")
+        for row in measure(storage, args.repeat):
+            results["payload"].append(row)
+            fast_ms = row[f"{fast_json.backend_name()}_ms"]
+            line = (f"  {row['format']:<8} JSON {row['json_bytes'] / 1024:>9,.0f} KiB | "
+                    f"build {row['build_ms']:>7.1f} ms | stdlib {row['stdlib_json_ms']:>7.1f} ms | "
+                    f"{fast_json.backend_name()} {fast_ms:>7.1f} ms | "
+                    f"gzip {row['gzip_bytes'] / 1024:>7,.0f} KiB {row['gzip_ms']:>6.1f} ms")
+            if "br_bytes" in row:
+                line += f" | br {row['br_bytes'] / 1024:>7,.0f} KiB {row['br_ms']:>6.1f} ms"
+            print(line)
+        for row in measure_requests(storage, args.repeat):
+            row["devices"] = size
+            results["requests"].append(row)
+            print(f"  GET {row['request']:<22} {row['encoding']:<9} "
+                  f"{row['bytes'] / 1024:>9,.0f} KiB {row['ms']:>8.1f} ms")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nРезультаты сохранены: {args.json_out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
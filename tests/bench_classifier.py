@@ -0,0 +1,317 @@
+"""
+Бенчмарк классификатора устройств (device_classifier.py)
+
+Работает офлайн против вендоренного снимка OUI (tests/data/oui_snapshot.txt).
+
+Измеряет:
+1. Cold-start: инициализация _get_mac_lookup() + первый поиск vendor;
+   warm-start: первый проход classify при заполненном кеше на диске
+2. Пропускную способность classify, vendor_by_oui, _classify_by_vendor,
+   _short_vendor_name на синтетическом и записанном корпусах MAC
+3. Совпадение классификации с golden-файлом (tests/data/classifier_golden.json)
+
+Запуск:
+  python tests/bench_classifier.py
+  python tests/bench_classifier.py --recorded capture.ndjson   # свой дамп mosquitto_sub
+  python tests/bench_classifier.py --update-golden              # осознанно обновить golden
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from device_classifier import (
+    classify,
+    configure_classification_cache,
+    configure_oui_database,
+    vendor_by_oui,
+    _classify_by_vendor,
+    _get_mac_lookup,
+    _short_vendor_name,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+DEFAULT_OUI_SNAPSHOT = os.path.join(DATA_DIR, 'oui_snapshot.txt')
+DEFAULT_GOLDEN = os.path.join(DATA_DIR, 'classifier_golden.json')
+DEFAULT_RECORDED = os.path.join(DATA_DIR, 'mac_corpus_sample.ndjson')
+
+# Состав синтетического корпуса (доли)
+SYNTHETIC_MIX = {
+    "randomized": 0.40,  # LAA-бит, vendor неизвестен
+    "known_vendor": 0.45,  # OUI из снимка
+    "unknown_oui": 0.15,  # глобальный OUI, которого нет в снимке
+}
+GOLDEN_SEED = 42
+GOLDEN_SIZE = 1000
+
+
+def load_snapshot_prefixes(path: str) -> List[str]:
+    """Список OUI-префиксов (6 hex, upper) из файла "PREFIX:Vendor"."""
+    prefixes = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            prefix = line.split(':', 1)[0].strip()
+            if len(prefix) == 6:
+                prefixes.append(prefix.upper())
+    return prefixes
+
+
+def _format_mac(octets: Sequence[int]) -> str:
+    return ":".join(f"{o:02x}" for o in octets)
+
+
+def synthetic_corpus(size: int, prefixes: List[str], seed: int) -> List[Dict]:
+    """
+    Детерминированный корпус с известным составом вендоров.
+
+    Returns:
+        Список {"m", "r", "x", "kind"}
+    """
+    rng = random.Random(seed)
+    known = set(prefixes)
+    kinds = list(SYNTHETIC_MIX.keys())
+    weights = list(SYNTHETIC_MIX.values())
+    corpus = []
+
+    for _ in range(size):
+        kind = rng.choices(kinds, weights)[0]
+        tail = [rng.randrange(256) for _ in range(3)]
+        if kind == "known_vendor":
+            prefix = rng.choice(prefixes)
+            head = [int(prefix[i:i + 2], 16) for i in range(0, 6, 2)]
+            flag = 0
+        elif kind == "randomized":
+            # LAA-бит установлен, multicast-бит сброшен
+            head = [(rng.randrange(256) | 0x02) & 0xFE] + [rng.randrange(256) for _ in range(2)]
+            flag = rng.choice([1, None])
+        else:
+            while True:
+                head = [rng.randrange(256) & 0xFC] + [rng.randrange(256) for _ in range(2)]
+                if "".join(f"{o:02X}" for o in head) not in known:
+                    break
+            flag = 0
+        corpus.append({
+            "m": _format_mac(head + tail),
+            "r": -rng.randint(30, 95),
+            "x": flag,
+            "kind": kind,
+        })
+    return corpus
+
+
+def recorded_corpus(paths: List[str]) -> List[Dict]:
+    """
+    Корпус из записанных MQTT payload (по одному JSON на строку, формат A или B)
+    или из простого списка MAC (по одному на строку).
+    """
+    corpus = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line[0] not in '[{':
+                    corpus.append({"m": line, "r": 0, "x": None, "kind": "recorded"})
+                    continue
+                payload = json.loads(line)
+                items = payload.get("d", []) if isinstance(payload, dict) else payload
+                for item in items:
+                    if isinstance(item, dict) and item.get("m"):
+                        corpus.append({
+                            "m": item["m"],
+                            "r": int(item.get("r", 0) or 0),
+                            "x": item.get("x"),
+                            "kind": "recorded",
+                        })
+    return corpus
+
+
+def measure(name: str, func: Callable, items: Sequence, repeat: int) -> Dict:
+    """Прогон func по всем items repeat раз; возвращает лучший/медианный результат."""
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            func(item)
+        runs.append(time.perf_counter() - t0)
+    best = min(runs)
+    result = {
+        "name": name,
+        "ops": len(items),
+        "best_sec": best,
+        "median_sec": statistics.median(runs),
+        "ops_per_sec": len(items) / best if best > 0 else 0.0,
+        "us_per_op": best / len(items) * 1e6 if items else 0.0,
+    }
+    print(f"  {name:<22} {result['ops_per_sec']:>12,.0f} ops/s  "
+          f"{result['us_per_op']:>8.2f} µs/op  (n={len(items)})")
+    return result
+
+
+def measure_cold_start(oui_path: str, probe_mac: str, repeat: int) -> Dict:
+    """Стоимость _get_mac_lookup() + первого vendor_by_oui (загрузка базы)."""
+    init_times, first_lookup_times = [], []
+    for _ in range(repeat):
+        configure_oui_database(oui_path)
+        t0 = time.perf_counter()
+        _get_mac_lookup()
+        t1 = time.perf_counter()
+        vendor_by_oui(probe_mac)
+        t2 = time.perf_counter()
+        init_times.append(t1 - t0)
+        first_lookup_times.append(t2 - t1)
+    result = {
+        "name": "cold_start",
+        "init_ms": min(init_times) * 1e3,
+        "first_lookup_ms": min(first_lookup_times) * 1e3,
+        "total_ms": min(a + b for a, b in zip(init_times, first_lookup_times)) * 1e3,
+    }
+    print(f"  {'cold_start':<22} init {result['init_ms']:.2f} ms, "
+          f"первый lookup {result['first_lookup_ms']:.2f} ms")
+    return result
+
+
+def measure_warm_start(oui_path: str, corpus: List[Dict]) -> Dict:
+    """
+    Первый проход classify по корпусу: без кеша (пустой SQLite)
+    и после рестарта с заполненным кешем (MacLookup не инициализирован).
+    """
+    passes = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "classification_cache.sqlite3")
+        for label in ("empty_cache", "warm_cache"):
+            configure_oui_database(oui_path)
+            configure_classification_cache(db_path)
+            t0 = time.perf_counter()
+            for item in corpus:
+                classify(item["m"], item["r"], item["x"])
+            passes[label] = time.perf_counter() - t0
+            configure_classification_cache(None)  # flush + close
+    result = {
+        "name": "warm_start",
+        "ops": len(corpus),
+        "empty_cache_ms": passes["empty_cache"] * 1e3,
+        "warm_cache_ms": passes["warm_cache"] * 1e3,
+    }
+    print(f"  {'warm_start':<22} первый проход: пустой кеш {result['empty_cache_ms']:.1f} ms, "
+          f"тёплый кеш {result['warm_cache_ms']:.1f} ms (n={len(corpus)})")
+    return result
+
+
+def classify_corpus(corpus: List[Dict]) -> Dict[str, List]:
+    """MAC → [randomized, vendor, device_type, device_brand]"""
+    out = {}
+    for item in corpus:
+        cls = classify(item["m"], item["r"], item["x"])
+        out[item["m"]] = [cls["randomized"], cls["vendor"], cls["device_type"], cls["device_brand"]]
+    return out
+
+
+def check_golden(path: str, actual: Dict[str, List], update: bool) -> bool:
+    """Сравнение с golden-файлом. При update=True — перезапись."""
+    if update or not os.path.exists(path):
+        # Одна строка на MAC — удобно смотреть diff при изменении правил
+        lines = [
+            f"{json.dumps(mac)}: {json.dumps(actual[mac], ensure_ascii=False)}"
+            for mac in sorted(actual)
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("{\n" + ",\n".join(lines) + "\n}\n")
+        print(f"  Golden записан: {path} ({len(actual)} MAC)")
+        return True
+
+    with open(path, encoding='utf-8') as f:
+        expected = json.load(f)
+
+    mismatches = [
+        (mac, expected.get(mac), actual.get(mac))
+        for mac in sorted(set(expected) | set(actual))
+        if expected.get(mac) != actual.get(mac)
+    ]
+    if not mismatches:
+        print(f"  ✓ Классификация совпадает с golden ({len(expected)} MAC)")
+        return True
+
+    print(f"  ✗ Расхождений с golden: {len(mismatches)}")
+    for mac, exp, act in mismatches[:20]:
+        print(f"    {mac}: ожидалось {exp}, получено {act}")
+    return False
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк device_classifier")
+    parser.add_argument("--oui", default=DEFAULT_OUI_SNAPSHOT, help="Файл OUI (PREFIX:Vendor)")
+    parser.add_argument("--size", type=int, default=20000, help="Размер синтетического корпуса")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--recorded", nargs="*", default=[DEFAULT_RECORDED],
+                        help="Файлы с записанными payload (NDJSON) или MAC")
+    parser.add_argument("--golden", default=DEFAULT_GOLDEN)
+    parser.add_argument("--update-golden", action="store_true")
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("Бенчмарк классификатора устройств")
+    print("=" * 60)
+    print(f"OUI снимок: {args.oui}")
+
+    prefixes = load_snapshot_prefixes(args.oui)
+    synthetic = synthetic_corpus(args.size, prefixes, args.seed)
+    recorded = recorded_corpus(args.recorded) if args.recorded else []
+    print(f"Синтетический корпус: {len(synthetic)} MAC, записанный: {len(recorded)} MAC")
+    print()
+
+    results = {"oui_snapshot": os.path.basename(args.oui), "benchmarks": []}
+
+    print("1. Cold-start...")
+    results["benchmarks"].append(measure_cold_start(args.oui, synthetic[0]["m"], args.repeat))
+    results["benchmarks"].append(measure_warm_start(args.oui, synthetic))
+
+    print()
+    print("2. Пропускная способность...")
+    configure_oui_database(args.oui)
+    _get_mac_lookup()
+
+    for corpus_name, corpus in (("synthetic", synthetic), ("recorded", recorded)):
+        if not corpus:
+            continue
+        macs = [c["m"] for c in corpus]
+        vendors = [v for v in (vendor_by_oui(m) for m in macs) if v]
+        print(f" [{corpus_name}] vendor определён у {len(vendors)}/{len(macs)}")
+        for name, func, items in (
+            ("classify", lambda c: classify(c["m"], c["r"], c["x"]), corpus),
+            ("vendor_by_oui", vendor_by_oui, macs),
+            ("_classify_by_vendor", _classify_by_vendor, vendors),
+            ("_short_vendor_name", _short_vendor_name, vendors),
+        ):
+            if not items:
+                continue
+            bench = measure(name, func, items, args.repeat)
+            bench["corpus"] = corpus_name
+            results["benchmarks"].append(bench)
+
+    print()
+    print("3. Golden-проверка...")
+    golden_corpus = synthetic_corpus(GOLDEN_SIZE, prefixes, GOLDEN_SEED) + recorded_corpus([DEFAULT_RECORDED])
+    golden_ok = check_golden(args.golden, classify_corpus(golden_corpus), args.update_golden)
+    results["golden_ok"] = golden_ok
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены: {args.json_out}")
+
+    return 0 if golden_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,398 @@
+"""
+Офлайн набор бенчмарков горячих путей: хранилище, приём MQTT, API.
+
+Брокер и сеть не нужны; данные синтетические с фиксированным seed,
+поэтому прогоны на разных коммитах сравнимы.
+
+Случаи:
+1. storage.add_data — размеры батча × заполненность хранилища (обновление
+   известных устройств) и вытеснение при полном хранилище (новые MAC)
+2. storage.get_devices (все / limit), счётчики окон (count_unique_in_window,
+   count_seen_within, get_realtime_window)
+3. classify — записанный корпус MAC (tests/data/mac_corpus_sample.ndjson)
+   против вендоренного снимка OUI, кеш классификации в памяти
+4. MQTTConsumer._parse_data — формат A (массив) и формат B (объект)
+5. Каждый endpoint Flask через test client (список маршрутов берётся
+   из app.url_map; изменяющие данные POST пропускаются). Перед каждым
+   запросом версия хранилища увеличивается — кеш ответов не попадает.
+
+Каждый случай: калибровка числа вызовов на раунд (не меньше --min-time),
+--repeat раундов; в отчёте время одного вызова (min, median, stdev).
+
+Запуск:
+  python tests/bench_suite.py --json bench.json
+  python tests/bench_suite.py --quick --filter add_data
+  python tests/bench_suite.py --json new.json --compare bench.json --threshold 10
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import dashboard_api
+import fast_json
+from dashboard_api import app, init_api
+from device_classifier import classify, configure_classification_cache, configure_oui_database
+from mqtt_consumer import MQTTConsumer
+from storage import WiFiDataStorage
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+OUI_SNAPSHOT = os.path.join(DATA_DIR, 'oui_snapshot.txt')
+MAC_CORPUS = os.path.join(DATA_DIR, 'mac_corpus_sample.ndjson')
+
+SEED = 1
+VENDORS = ["Apple", "Samsung Electronics", "Intel Corporate", "Xiaomi", None]
+TYPES = ["smartphone", "laptop", "tablet", "other"]
+
+# POST endpoint'ы, изменяющие состояние, не измеряются
+SKIP_ROUTES = {
+    ("POST", "/api/clear"),
+    ("POST", "/api/rules/reload"),
+    ("POST", "/api/debug/lock-profile"),
+}
+
+# Случай: (имя, фабрика вызова). Фабрика готовит состояние и возвращает функцию без аргументов
+Case = Tuple[str, Callable[[], Callable[[], object]]]
+
+
+def make_device(rng: random.Random, i: int, now: int) -> Dict:
+    first = rng.randrange(256)
+    return {
+        "m": f"{first:02x}:{rng.randrange(256):02x}:{rng.randrange(256):02x}:"
+             f"{(i >> 16) & 255:02x}:{(i >> 8) & 255:02x}:{i & 255:02x}",
+        "r": -rng.randint(30, 95),
+        "t": now - rng.randrange(3600),
+        "vendor": rng.choice(VENDORS),
+        "device_type": rng.choice(TYPES),
+        "device_brand": rng.choice(["apple", "samsung", None]),
+        "randomized": bool(first & 2),
+    }
+
+
+def filled_storage(devices: int, max_devices: Optional[int] = None) -> Tuple[WiFiDataStorage, List[str]]:
+    """Хранилище с devices синтетическими устройствами (seed фиксирован) и их MAC"""
+    rng = random.Random(SEED)
+    storage = WiFiDataStorage(max_devices=max_devices or max(devices, 1))
+    now = int(time.time())
+    macs = []
+    batch = []
+    for i in range(devices):
+        device = make_device(rng, i, now)
+        macs.append(device["m"])
+        batch.append(device)
+        if len(batch) == 1000:
+            storage.add_data(batch)
+            batch = []
+    if batch:
+        storage.add_data(batch)
+    return storage, macs
+
+
+# ── Хранилище ──────────────────────────────────────────────────────────
+
+def add_data_update(fill: int, batch_size: int) -> Callable[[], object]:
+    """Батч обновлений уже известных устройств (установившийся режим ingest)"""
+    storage, macs = filled_storage(fill, max_devices=fill * 2)
+    rng = random.Random(SEED + 1)
+    batches = []
+    for _ in range(64):
+        batches.append([
+            {"m": rng.choice(macs), "r": -rng.randint(30, 95), "t": 0, "device_type": "smartphone"}
+            for _ in range(batch_size)
+        ])
+    cycle = iter_forever(batches)
+    return lambda: storage.add_data(next(cycle))
+
+
+def add_data_evict(capacity: int, batch_size: int) -> Callable[[], object]:
+    """Батч новых MAC при полном хранилище: каждый вытесняет самое старое устройство"""
+    storage, _ = filled_storage(capacity)
+    rng = random.Random(SEED + 2)
+    counter = iter(range(1 << 24, 1 << 62))
+
+    def run() -> None:
+        storage.add_data([make_device(rng, next(counter), int(time.time())) for _ in range(batch_size)])
+    return run
+
+
+def iter_forever(items: List) -> Iterator:
+    while True:
+        yield from items
+
+
+def storage_cases(fills: List[int], batches: List[int], devices: int) -> List[Case]:
+    cases: List[Case] = []
+    for fill in fills:
+        for batch in batches:
+            cases.append((f"add_data[fill={fill},batch={batch}]",
+                          lambda fill=fill, batch=batch: add_data_update(fill, batch)))
+    for batch in batches:
+        cases.append((f"add_data_evict[capacity={devices},batch={batch}]",
+                      lambda batch=batch: add_data_evict(devices, batch)))
+
+    state: Dict[str, WiFiDataStorage] = {}
+
+    def reader(method: Callable[[WiFiDataStorage], object]) -> Callable[[], Callable[[], object]]:
+        def factory() -> Callable[[], object]:
+            if "storage" not in state:
+                state["storage"] = filled_storage(devices)[0]
+            storage = state["storage"]
+            return lambda: method(storage)
+        return factory
+
+    cases += [
+        (f"get_devices[devices={devices}]", reader(lambda s: s.get_devices())),
+        (f"get_devices[devices={devices},limit=100]", reader(lambda s: s.get_devices(limit=100))),
+        (f"count_unique_in_window[devices={devices},60s]", reader(lambda s: s.count_unique_in_window(60))),
+        (f"count_seen_within[devices={devices},3600s]", reader(lambda s: s.count_seen_within(3600))),
+        (f"get_realtime_window[devices={devices}]", reader(lambda s: s.get_realtime_window())),
+    ]
+    return cases
+
+
+# ── Приём MQTT ─────────────────────────────────────────────────────────
+
+def load_corpus() -> List:
+    """Записанные payload (форматы A и B) из tests/data"""
+    with open(MAC_CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def classify_corpus() -> Callable[[], object]:
+    configure_oui_database(OUI_SNAPSHOT)
+    configure_classification_cache(None)
+    items = [
+        item
+        for payload in load_corpus()
+        for item in (payload if isinstance(payload, list) else payload.get("d", []))
+    ]
+
+    def run() -> None:
+        for item in items:
+            classify(item["m"], item["r"], item.get("x"))
+    # Первый проход заполняет кеш классификации — измеряется установившийся режим
+    run()
+    return run
+
+
+def parse_payload(fmt: str, devices: int) -> Callable[[], object]:
+    rng = random.Random(SEED)
+    now = int(time.time())
+    items = [{"m": make_device(rng, i, now)["m"], "r": -rng.randint(30, 95), "x": i & 1} for i in range(devices)]
+    if fmt == "A":
+        data = [dict(item, t=now) for item in items]
+    else:
+        data = {"t": now, "id": "bench", "d": items, "c": len(items)}
+    return lambda: MQTTConsumer._parse_data(data)
+
+
+def ingest_cases() -> List[Case]:
+    return [
+        ("classify[corpus]", classify_corpus),
+        ("parse_data[format=A,devices=100]", lambda: parse_payload("A", 100)),
+        ("parse_data[format=B,devices=100]", lambda: parse_payload("B", 100)),
+    ]
+
+
+# ── API ────────────────────────────────────────────────────────────────
+
+def api_requests(storage: WiFiDataStorage, macs: List[str]) -> List[Tuple[str, str, Optional[Dict]]]:
+    """(метод, URL, JSON тело) для каждого маршрута app.url_map"""
+    args = {"mac": macs[0], "dataset": "devices"}
+    bodies = {
+        "/api/devices/lookup": {"macs": macs[:100]},
+        "/api/query": {"queries": [
+            {"id": "devices", "panel": "devices", "params": {"limit": 100}},
+            {"id": "realtime", "panel": "realtime"},
+            {"id": "count", "panel": "count", "params": {"timeframe": "1h"}},
+            {"id": "timeseries", "panel": "timeseries", "params": {"timeframe": "1h"}},
+        ]},
+    }
+    # Обязательные query параметры GET (те же панели, что в теле POST /api/query)
+    query_strings = {
+        "/api/query": "?panels=devices,realtime,count,timeseries"
+                      "&devices.limit=100&count.timeframe=1h&timeseries.timeframe=1h",
+    }
+    # Варианты с параметрами для основных endpoint'ов
+    extra = [
+        ("GET", "/api/devices?limit=100", None),
+        ("GET", "/api/devices?limit=100&compact=1", None),
+        ("GET", "/api/devices?limit=100&device_type=smartphone&sort=rssi", None),
+        ("GET", "/api/stats/devices_timeseries?timeframe=24h", None),
+    ]
+    requests = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint == "static":
+            continue
+        url = rule.rule
+        for name in rule.arguments:
+            url = url.replace(f"<{name}>", str(args.get(name, "")))
+        for method in sorted((rule.methods or set()) - {"HEAD", "OPTIONS"}):
+            if (method, rule.rule) in SKIP_ROUTES:
+                continue
+            if method == "POST" and rule.rule not in bodies:
+                continue
+            if method == "GET":
+                requests.append((method, url + query_strings.get(rule.rule, ""), None))
+                continue
+            requests.append((method, url, bodies.get(rule.rule)))
+    return requests + extra
+
+
+def api_cases(devices: int) -> List[Case]:
+    storage, macs = filled_storage(devices)
+    init_api(storage)
+    dashboard_api.rate_limiter.rate = 0  # запросы подряд от одного клиента
+    client = app.test_client()
+    cases: List[Case] = []
+    for method, url, body in api_requests(storage, macs):
+        def factory(method=method, url=url, body=body) -> Callable[[], object]:
+            def run() -> None:
+                storage.version += 1  # обход кеша ответов и ETag
+                response = client.open(url, method=method, json=body)
+                response.get_data()  # дочитать потоковые ответы (export)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method} {url}: HTTP {response.status_code}")
+            return run
+        cases.append((f"api[{method} {url}]", factory))
+    return cases
+
+
+# ── Измерение ──────────────────────────────────────────────────────────
+
+def measure(fn: Callable[[], object], repeat: int, min_time: float) -> Dict:
+    """Время одного вызова (сек): калибровка числа вызовов на раунд, repeat раундов"""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    rounds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - t0) / number)
+    return {
+        "number": number,
+        "rounds": repeat,
+        "min_us": min(rounds) * 1e6,
+        "median_us": statistics.median(rounds) * 1e6,
+        "stdev_us": (statistics.stdev(rounds) if len(rounds) > 1 else 0.0) * 1e6,
+    }
+
+
+def git_revision() -> Dict:
+    root = os.path.join(os.path.dirname(__file__), '..')
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+
+def compare(results: Dict[str, Dict], baseline_path: str, threshold: float) -> int:
+    """Сравнение медиан с базовым прогоном; число случаев медленнее базы больше чем на threshold %"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_results = baseline.get("results", {})
+    print(f"\nСравнение с {baseline_path} (коммит {baseline.get('meta', {}).get('commit')})")
+    regressions = 0
+    for name, result in results.items():
+        base = base_results.get(name)
+        if base is None:
+            print(f"  {name:<64} {'новый':>10}")
+            continue
+        delta = (result["median_us"] / base["median_us"] - 1) * 100 if base["median_us"] else 0.0
+        mark = ""
+        if delta > threshold:
+            mark = "  << медленнее"
+            regressions += 1
+        elif delta < -threshold:
+            mark = "  быстрее"
+        print(f"  {name:<64} {base['median_us']:>10.1f} -> {result['median_us']:>10.1f} µs "
+              f"{delta:>+7.1f}%{mark}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн бенчмарки хранилища, ingest и API")
+    parser.add_argument("--devices", type=int, default=10000, help="Устройств для чтений, API и вытеснения")
+    parser.add_argument("--fill", type=int, nargs="*", default=[1000, 10000, 50000],
+                        help="Заполненность хранилища для add_data")
+    parser.add_argument("--batch", type=int, nargs="*", default=[1, 10, 100, 1000], help="Размеры батча add_data")
+    parser.add_argument("--repeat", type=int, default=5, help="Раундов на случай")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Минимальная длительность раунда, сек")
+    parser.add_argument("--quick", action="store_true", help="Меньше данных и раундов (проверка, не замеры)")
+    parser.add_argument("--filter", help="Только случаи, содержащие подстроку")
+    parser.add_argument("--json", dest="json_out", help="Сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON базового прогона для сравнения")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Порог замедления медианы, %% (код возврата 1 при превышении)")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.devices, args.fill, args.batch = 2000, [1000], [1, 100]
+        args.repeat, args.min_time = 3, 0.01
+
+    # INFO-логи endpoint'ов (timeseries и др.) искажают замеры
+    logging.disable(logging.INFO)
+    cases = storage_cases(args.fill, args.batch, args.devices) + ingest_cases() + api_cases(args.devices)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case[0]]
+
+    meta = {
+        **git_revision(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "serializer": fast_json.backend_name(),
+        "params": {"devices": args.devices, "fill": args.fill, "batch": args.batch,
+                   "repeat": args.repeat, "min_time": args.min_time, "seed": SEED},
+    }
+    print("=" * 96)
+    print(f"Бенчмарки (коммит {meta['commit']}{' +изменения' if meta['dirty'] else ''}, "
+          f"Python {meta['python']}, {meta['serializer']})")
+    print("=" * 96)
+
+    results: Dict[str, Dict] = {}
+    for name, factory in cases:
+        result = measure(factory(), args.repeat, args.min_time)
+        results[name] = result
+        print(f"  {name:<64} {result['median_us']:>10.1f} µs  "
+              f"(min {result['min_us']:.1f}, ±{result['stdev_us']:.1f}, n={result['number']})")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты сохранены: {args.json_out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\nЗамедление больше {args.threshold:g}%: {regressions} случаев")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,637 @@
+"""
+Генератор нагрузки: N роутеров шлют батчи {"t", "d", "c"} как scanner.sh.
+
+Модель роутера:
+- свой id в payload ("id": "router-NNN", как ROUTER_ID в scanner.sh) — по нему
+  backend различает сенсоры на общем топике
+- своя популяция устройств: MAC известных вендоров (OUI из
+  tests/data/oui_snapshot.txt) и рандомные MAC (locally administered,
+  "x": 1), доля — --randomized; рандомные MAC периодически меняются
+- цикл --interval сек с джиттером --jitter (доля интервала), старт роутеров
+  разнесён случайно
+- обрывы связи: с вероятностью --outage-rate на цикл роутер теряет брокер
+  на --outage-cycles циклов, копит батчи в буфере (BUFFER_MAX = 10, старые
+  удаляются) и после восстановления досылает их от новых к старым — как
+  flush_buffer в scanner.sh (старые timestamp, порядок нарушен)
+
+Приёмник (--sink):
+- standin — брокер-заглушка в процессе: очередь и один поток доставки,
+  вызывающий MQTTConsumer._on_message (как сетевой поток paho); брокер не нужен
+- mqtt — публикация в mosquitto (--broker); по умолчанию consumer и API
+  запускаются в процессе и подписываются на тот же брокер
+
+С --url нагрузка идёт на уже запущенный сервис (только --sink mqtt):
+приём считается по /metrics (wifi_mqtt_messages_total), задержка
+очереди — как отставание принятых от опубликованных.
+
+Отчёт раз в --report-interval сек и итог:
+- опубликовано / принято сообщений и устройств в секунду
+- сообщения в пути и задержка очереди (публикация -> начало обработки),
+  время обработки сообщения (p50/p99/max)
+- задержка API (p50/p99) по endpoint'ам, опрашиваемым --api-clients потоками
+- проверка: каждый опубликовавший роутер — отдельный сенсор в /api/stats/freshness
+  (иначе код выхода 1)
+
+Запуск:
+  python tests/load_generator.py --routers 50 --duration 60
+  python tests/load_generator.py --routers 200 --interval 2 --devices 80 --json load.json
+  python tests/load_generator.py --sink mqtt --broker localhost:1883
+  python tests/load_generator.py --sink mqtt --url http://localhost:5000   # запущенный main.py
+"""
+import argparse
+import heapq
+import http.client
+import json
+import logging
+import os
+import queue
+import random
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from config import MQTT_BROKER_HOST, MQTT_BROKER_PORT, MQTT_TOPIC
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+OUI_SNAPSHOT = os.path.join(DATA_DIR, 'oui_snapshot.txt')
+
+# Как в scanner.sh
+BUFFER_MAX = 10
+
+DEFAULT_ENDPOINTS = [
+    "/api/dashboard",
+    "/api/stats/realtime",
+    "/api/stats/count?timeframe=1h",
+    "/api/devices?limit=100",
+]
+
+Publish = Callable[[str, bytes], None]
+
+
+def load_ouis(path: str = OUI_SNAPSHOT) -> List[str]:
+    """OUI вида "aa:bb:cc" из снимка базы (строки "AABBCC:Vendor")"""
+    ouis = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            prefix = line.split(":", 1)[0].strip()
+            if len(prefix) == 6:
+                ouis.append(":".join(prefix[i:i + 2] for i in (0, 2, 4)).lower())
+    return ouis
+
+
+def random_tail(rng: random.Random) -> str:
+    return ":".join(f"{rng.randrange(256):02x}" for _ in range(3))
+
+
+def randomized_mac(rng: random.Random) -> str:
+    # Locally administered (бит 0x02), unicast (бит 0x01 сброшен)
+    first = (rng.randrange(256) | 0x02) & 0xFE
+    return f"{first:02x}:" + ":".join(f"{rng.randrange(256):02x}" for _ in range(5))
+
+
+class Router:
+    """Модель роутера со сканером: популяция устройств, буфер при обрывах связи"""
+
+    def __init__(self, index: int, rng: random.Random, ouis: List[str], args):
+        self.name = f"router-{index:03d}"
+        self.rng = rng
+        self.args = args
+        population = max(1, args.population)
+        randomized = int(population * args.randomized)
+        # Устройство: [mac, базовый rssi, рандомный MAC]
+        self.devices: List[List] = [
+            [f"{rng.choice(ouis)}:{random_tail(rng)}", -rng.randint(35, 90), False]
+            for _ in range(population - randomized)
+        ] + [
+            [randomized_mac(rng), -rng.randint(35, 90), True]
+            for _ in range(randomized)
+        ]
+        self.buffer: Deque[bytes] = deque(maxlen=BUFFER_MAX)
+        self.offline_cycles = 0
+        self.published = False
+
+    def batch(self, ts: int) -> bytes:
+        """Payload одного цикла сканирования (формат B)"""
+        rng = self.rng
+        size = min(len(self.devices), max(0, int(rng.gauss(self.args.devices, self.args.devices * 0.2))))
+        items = []
+        for device in rng.sample(self.devices, size):
+            if device[2] and rng.random() < self.args.rotate:
+                device[0] = randomized_mac(rng)
+            items.append({"m": device[0], "r": max(-100, min(-20, device[1] + rng.randint(-6, 6))),
+                          "x": 1 if device[2] else 0})
+        return json.dumps({"t": ts, "id": self.name, "d": items, "c": len(items)},
+                          separators=(",", ":")).encode("utf-8")
+
+    def cycle(self, publish: Publish, stats: "LoadStats") -> None:
+        """Один цикл: батч сразу, в буфер (обрыв) или досылка буфера после восстановления"""
+        payload = self.batch(int(time.time()))
+        if self.offline_cycles == 0 and self.rng.random() < self.args.outage_rate:
+            self.offline_cycles = self.args.outage_cycles
+        if self.offline_cycles > 0:
+            self.offline_cycles -= 1
+            if len(self.buffer) == self.buffer.maxlen:
+                stats.buffer_dropped += 1
+            self.buffer.append(payload)
+            stats.buffered += 1
+            return
+        publish(MQTT_TOPIC, payload)
+        stats.on_publish(payload)
+        self.published = True
+        # flush_buffer: ls -t — от новых к старым
+        while self.buffer:
+            old = self.buffer.pop()
+            publish(MQTT_TOPIC, old)
+            stats.on_publish(old, resend=True)
+
+
+class LoadStats:
+    """Счётчики генератора и задержки очереди (по содержимому payload)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.published = 0
+        self.published_devices = 0
+        self.resent = 0
+        self.buffered = 0
+        self.buffer_dropped = 0
+        self.late_sec = 0.0
+        # payload -> времена публикации (досылка может повторить те же байты)
+        self._sent: Dict[bytes, Deque[float]] = defaultdict(deque)
+        self.lag: List[float] = []
+        self.processing: List[float] = []
+
+    def on_publish(self, payload: bytes, resend: bool = False) -> None:
+        now = time.perf_counter()
+        devices = payload.count(b'"m":')
+        with self._lock:
+            self.published += 1
+            self.published_devices += devices
+            self.resent += resend
+            self._sent[payload].append(now)
+
+    def on_deliver(self, payload: bytes, started: float, finished: float) -> None:
+        with self._lock:
+            sent = self._sent.get(payload)
+            if not sent:
+                return
+            lag = started - sent.popleft()
+            if not sent:
+                del self._sent[payload]
+            self.lag.append(lag)
+            self.processing.append(finished - started)
+
+    def take_latencies(self) -> Tuple[List[float], List[float]]:
+        with self._lock:
+            lag, processing = self.lag, self.processing
+            self.lag, self.processing = [], []
+            return lag, processing
+
+
+def track_consumer(consumer, stats: LoadStats) -> None:
+    """Обёртка _on_message: задержка очереди и время обработки каждого сообщения"""
+    on_message = consumer._on_message
+
+    def tracked(client, userdata, msg) -> None:
+        started = time.perf_counter()
+        on_message(client, userdata, msg)
+        stats.on_deliver(msg.payload, started, time.perf_counter())
+
+    consumer._on_message = tracked
+    consumer.client.on_message = tracked
+
+
+class _Message:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic: str, payload: bytes):
+        self.topic = topic
+        self.payload = payload
+        self.qos = 1
+        self.retain = False
+
+
+class StandInBroker:
+    """
+    Брокер-заглушка в процессе: publish() кладёт сообщение в очередь,
+    один поток доставки вызывает on_message(client, userdata, msg) —
+    как сетевой поток paho у MQTTConsumer
+    """
+
+    def __init__(self, on_message: Callable):
+        self._on_message = on_message
+        self._queue: "queue.Queue[Optional[_Message]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._deliver, name="standin-broker", daemon=True)
+        self._thread.start()
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        self._queue.put(_Message(topic, payload))
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def _deliver(self) -> None:
+        while True:
+            msg = self._queue.get()
+            if msg is None:
+                return
+            self._on_message(self, None, msg)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def mqtt_publisher(broker: str) -> Tuple[Publish, Callable[[], None]]:
+    """publish() в mosquitto (QoS 1, как scanner.sh) и функция закрытия"""
+    import paho.mqtt.client as mqtt
+
+    host, _, port = broker.partition(":")
+    if hasattr(mqtt, "CallbackAPIVersion"):
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"loadgen-{os.getpid()}")
+    else:
+        client = mqtt.Client(client_id=f"loadgen-{os.getpid()}")
+    client.max_queued_messages_set(0)
+    client.connect(host, int(port or 1883), keepalive=60)
+    client.loop_start()
+
+    def publish(topic: str, payload: bytes) -> None:
+        client.publish(topic, payload, qos=1)
+
+    def close() -> None:
+        client.loop_stop()
+        client.disconnect()
+    return publish, close
+
+
+# ── API ────────────────────────────────────────────────────────────────
+
+def http_get(host: str, port: int, path: str, timeout: float = 30) -> Tuple[int, bytes]:
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def freshness_sensors(host: str, port: int) -> List[str]:
+    """Сенсоры из /api/stats/freshness"""
+    status, body = http_get(host, port, "/api/stats/freshness")
+    if status != 200:
+        return []
+    return [s["sensor"] for s in json.loads(body).get("sensors", [])]
+
+
+def scrape_counters(host: str, port: int) -> Dict[str, float]:
+    """Сумма значений метрик /metrics по имени (без меток)"""
+    status, body = http_get(host, port, "/metrics")
+    if status != 200:
+        return {}
+    totals: Dict[str, float] = defaultdict(float)
+    for line in body.decode("utf-8").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        name_labels, _, value = line.rpartition(" ")
+        name = name_labels.split("{", 1)[0]
+        try:
+            totals[name] += float(value)
+        except ValueError:
+            continue
+    return totals
+
+
+class APIProbe:
+    """Потоки, опрашивающие endpoint'ы по кругу; задержки по endpoint'у"""
+
+    def __init__(self, host: str, port: int, endpoints: List[str], clients: int):
+        self.host, self.port = host, port
+        self.endpoints = endpoints
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), daemon=True) for i in range(clients)
+        ]
+
+    def start(self) -> None:
+        for t in self._threads:
+            t.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=35)
+
+    def _run(self, offset: int) -> None:
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        i = offset
+        while not self._stop.is_set():
+            path = self.endpoints[i % len(self.endpoints)]
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                if ok:
+                    self.latencies[path].append(elapsed)
+                else:
+                    self.errors[path] += 1
+        conn.close()
+
+    def take(self) -> Tuple[Dict[str, List[float]], Dict[str, int]]:
+        with self._lock:
+            latencies, errors = self.latencies, self.errors
+            self.latencies, self.errors = defaultdict(list), defaultdict(int)
+            return latencies, errors
+
+
+def percentiles(values: List[float]) -> Dict:
+    """p50/p99/max в мс (None — нет данных)"""
+    if not values:
+        return {"count": 0, "p50_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(values)
+    n = len(ordered)
+    return {
+        "count": n,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p99_ms": ordered[min(n - 1, int(n * 0.99))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def fmt_ms(value: Optional[float]) -> str:
+    return f"{value:.1f}" if value is not None else "—"
+
+
+# ── Запуск ─────────────────────────────────────────────────────────────
+
+def run_routers(routers: List[Router], publish: Publish, stats: LoadStats, args, stop: threading.Event) -> None:
+    """Планировщик циклов всех роутеров (один поток, куча по времени следующего цикла)"""
+    start = time.perf_counter()
+    schedule = [(start + random.Random(i).uniform(0, args.interval), i) for i in range(len(routers))]
+    heapq.heapify(schedule)
+    while schedule and not stop.is_set():
+        due, i = heapq.heappop(schedule)
+        delay = due - time.perf_counter()
+        if delay > 0 and stop.wait(delay):
+            return
+        stats.late_sec = max(stats.late_sec, -delay)
+        router = routers[i]
+        router.cycle(publish, stats)
+        jitter = router.rng.uniform(-args.jitter, args.jitter) * args.interval
+        heapq.heappush(schedule, (due + args.interval + jitter, i))
+
+
+def setup(args, stats: LoadStats, closers: List[Callable[[], None]]) -> Tuple[str, int, Publish]:
+    """Приёмник нагрузки и адрес API: (host, port, publish); функции закрытия — в closers"""
+    if args.url:
+        parts = urlsplit(args.url)
+        publish, close = mqtt_publisher(args.broker)
+        closers.append(close)
+        return parts.hostname, parts.port or 80, publish
+
+    from api_server import APIServer
+    import dashboard_api
+    from dashboard_api import app, init_api
+    import mqtt_consumer
+    from storage import WiFiDataStorage
+
+    storage = WiFiDataStorage(max_devices=args.max_devices)
+    init_api(storage)
+    dashboard_api.rate_limiter.rate = 0  # опрос API из одного адреса
+    server = APIServer(app, "127.0.0.1", 0, mode=args.mode)
+    threading.Thread(target=server.run, daemon=True).start()
+    closers.append(server.close)
+
+    consumer = mqtt_consumer.MQTTConsumer(storage)
+    track_consumer(consumer, stats)
+    if args.sink == "standin":
+        broker = StandInBroker(consumer._on_message)
+        closers.append(broker.close)
+        return "127.0.0.1", server.port, broker.publish
+
+    # Встроенный consumer подключается к тому же брокеру, что и генератор
+    broker_host, _, broker_port = args.broker.partition(":")
+    mqtt_consumer.MQTT_BROKER_HOST = broker_host
+    mqtt_consumer.MQTT_BROKER_PORT = int(broker_port or 1883)
+    consumer.start()
+    closers.append(consumer.stop)
+    publish, close = mqtt_publisher(args.broker)
+    closers.append(close)
+    return "127.0.0.1", server.port, publish
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Генератор нагрузки: N роутеров -> MQTT ingest -> API")
+    parser.add_argument("--routers", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=10.0, help="Цикл сканирования роутера, сек")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Джиттер цикла (доля интервала)")
+    parser.add_argument("--devices", type=int, default=40, help="Устройств в батче (среднее)")
+    parser.add_argument("--population", type=int, default=300, help="Устройств в зоне роутера")
+    parser.add_argument("--randomized", type=float, default=0.4, help="Доля рандомных MAC")
+    parser.add_argument("--rotate", type=float, default=0.05,
+                        help="Вероятность смены рандомного MAC за цикл")
+    parser.add_argument("--outage-rate", type=float, default=0.01, help="Вероятность обрыва связи за цикл")
+    parser.add_argument("--outage-cycles", type=int, default=5, help="Длительность обрыва, циклов")
+    parser.add_argument("--duration", type=float, default=60.0, help="Длительность нагрузки, сек")
+    parser.add_argument("--sink", choices=("standin", "mqtt"), default="standin")
+    parser.add_argument("--broker", default=f"{MQTT_BROKER_HOST}:{MQTT_BROKER_PORT}",
+                        help="host:port mosquitto (--sink mqtt)")
+    parser.add_argument("--url", help="Запущенный сервис (API + consumer) вместо встроенного")
+    parser.add_argument("--mode", default="auto", help="Режим встроенного API сервера (auto, waitress, werkzeug)")
+    parser.add_argument("--max-devices", type=int, default=10000, help="max_devices встроенного хранилища")
+    parser.add_argument("--endpoints", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("--api-clients", type=int, default=2, help="Потоков опроса API (0 — без опроса)")
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Ожидание обработки очереди после остановки, сек")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_out", help="Сохранить итог в JSON")
+    args = parser.parse_args(argv)
+
+    if args.url and args.sink != "mqtt":
+        parser.error("--url требует --sink mqtt (сервис принимает данные через брокер)")
+
+    # Логи каждого сообщения и запроса не нужны — только предупреждения
+    logging.disable(logging.INFO)
+
+    stats = LoadStats()
+    closers: List[Callable[[], None]] = []
+    try:
+        host, port, publish = setup(args, stats, closers)
+    except OSError as e:
+        print(f"Не удалось подключиться к брокеру {args.broker}: {e}", file=sys.stderr)
+        for close in reversed(closers):
+            close()
+        return 2
+
+    rng = random.Random(args.seed)
+    ouis = load_ouis()
+    routers = [Router(i, random.Random(rng.random()), ouis, args) for i in range(args.routers)]
+    expected_rate = args.routers / args.interval
+    print("=" * 96)
+    print(f"Роутеров: {args.routers}, цикл {args.interval:g} с (±{args.jitter:.0%}), "
+          f"~{args.devices} устройств/батч, рандомных MAC {args.randomized:.0%}, "
+          f"обрывы {args.outage_rate:.1%}/цикл по {args.outage_cycles} циклов")
+    print(f"Приёмник: {args.sink}{' -> ' + args.url if args.url else ''}, "
+          f"ожидаемо ~{expected_rate:,.1f} сообщ/с, ~{expected_rate * args.devices:,.0f} устройств/с")
+    print("=" * 96)
+
+    probe = APIProbe(host, port, args.endpoints, args.api_clients) if args.api_clients > 0 else None
+    base = scrape_counters(host, port)
+    stop = threading.Event()
+    generator = threading.Thread(target=run_routers, args=(routers, publish, stats, args, stop), daemon=True)
+    t_start = time.perf_counter()
+    generator.start()
+    if probe is not None:
+        probe.start()
+
+    all_lag: List[float] = []
+    all_processing: List[float] = []
+    api_latencies: Dict[str, List[float]] = defaultdict(list)
+    api_errors: Dict[str, int] = defaultdict(int)
+    intervals = []
+    previous = {"t": t_start, "published": 0, "devices": 0, "counters": base}
+
+    def report(final: bool = False) -> None:
+        now = time.perf_counter()
+        elapsed = now - previous["t"]
+        counters = scrape_counters(host, port)
+        ingested = counters.get("wifi_mqtt_messages_total", 0) - previous["counters"].get("wifi_mqtt_messages_total", 0)
+        ingested_devices = (counters.get("wifi_ingested_devices_total", 0)
+                            - previous["counters"].get("wifi_ingested_devices_total", 0))
+        lag, processing = stats.take_latencies()
+        all_lag.extend(lag)
+        all_processing.extend(processing)
+        if probe is not None:
+            latencies, errors = probe.take()
+            for path, values in latencies.items():
+                api_latencies[path].extend(values)
+            for path, count in errors.items():
+                api_errors[path] += count
+            api_all = [x for values in latencies.values() for x in values]
+        else:
+            api_all = []
+        backlog = stats.published - (counters.get("wifi_mqtt_messages_total", 0) - base.get("wifi_mqtt_messages_total", 0))
+        row = {
+            "t": round(now - t_start, 1),
+            "published_per_sec": (stats.published - previous["published"]) / elapsed,
+            "ingested_per_sec": ingested / elapsed,
+            "ingested_devices_per_sec": ingested_devices / elapsed,
+            "backlog": backlog,
+            "lag": percentiles(lag),
+            "api": percentiles(api_all),
+        }
+        intervals.append(row)
+        previous.update(t=now, published=stats.published, devices=stats.published_devices, counters=counters)
+        print(f"  {row['t']:>6.1f}s  публ. {row['published_per_sec']:>7.1f}/s  "
+              f"принято {row['ingested_per_sec']:>7.1f}/s ({row['ingested_devices_per_sec']:>8,.0f} устр/s)  "
+              f"в пути {backlog:>5.0f}  лаг p99 {fmt_ms(row['lag']['p99_ms']):>7} ms  "
+              f"API p99 {fmt_ms(row['api']['p99_ms']):>7} ms{'  (итог)' if final else ''}")
+
+    try:
+        deadline = t_start + args.duration
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(args.report_interval, remaining))
+            report()
+    except KeyboardInterrupt:
+        print("Прервано")
+    finally:
+        stop.set()
+        generator.join(timeout=5)
+    load_sec = time.perf_counter() - t_start
+
+    # Дождаться обработки опубликованного (очередь consumer'а)
+    drain_start = time.perf_counter()
+    while time.perf_counter() - drain_start < args.drain_timeout:
+        ingested_total = (scrape_counters(host, port).get("wifi_mqtt_messages_total", 0)
+                          - base.get("wifi_mqtt_messages_total", 0))
+        if ingested_total >= stats.published:
+            break
+        time.sleep(0.2)
+    drain_sec = time.perf_counter() - drain_start
+    if probe is not None:
+        probe.stop()
+    report(final=True)
+
+    counters = scrape_counters(host, port)
+    # Каждый опубликовавший роутер — отдельный сенсор свежести (различаются по id в payload)
+    expected_sensors = {router.name for router in routers if router.published}
+    seen_sensors = expected_sensors & set(freshness_sensors(host, port))
+    ingested_total = counters.get("wifi_mqtt_messages_total", 0) - base.get("wifi_mqtt_messages_total", 0)
+    ingested_devices = counters.get("wifi_ingested_devices_total", 0) - base.get("wifi_ingested_devices_total", 0)
+    summary = {
+        "params": {k: v for k, v in vars(args).items() if k != "json_out"},
+        "load_sec": load_sec,
+        "drain_sec": drain_sec,
+        "published": stats.published,
+        "published_devices": stats.published_devices,
+        "resent": stats.resent,
+        "buffered": stats.buffered,
+        "buffer_dropped": stats.buffer_dropped,
+        "scheduler_late_max_ms": stats.late_sec * 1000,
+        "ingested": ingested_total,
+        "ingested_devices": ingested_devices,
+        "ingest_errors": counters.get("wifi_mqtt_errors_total", 0) - base.get("wifi_mqtt_errors_total", 0),
+        "ingest_per_sec": ingested_total / (load_sec + drain_sec),
+        "ingest_devices_per_sec": ingested_devices / (load_sec + drain_sec),
+        "queue_lag": percentiles(all_lag),
+        "processing": percentiles(all_processing),
+        "freshness_sensors": {"expected": len(expected_sensors), "seen": len(seen_sensors)},
+        "api": {
+            path: {**percentiles(api_latencies.get(path, [])), "errors": api_errors.get(path, 0)}
+            for path in args.endpoints
+        } if probe is not None else {},
+        "intervals": intervals,
+    }
+    for close in reversed(closers):
+        close()
+
+    print("\nИтог")
+    print(f"  Опубликовано: {stats.published:,} сообщений ({stats.published_devices:,} устройств), "
+          f"досылок {stats.resent:,}, потеряно в буфере {stats.buffer_dropped:,}")
+    print(f"  Принято: {ingested_total:,.0f} сообщений ({ingested_devices:,.0f} устройств), "
+          f"{summary['ingest_per_sec']:,.1f} сообщ/с, {summary['ingest_devices_per_sec']:,.0f} устр/с, "
+          f"ошибок {summary['ingest_errors']:,.0f}; догрузка очереди {drain_sec:.1f} с")
+    sensors_ok = seen_sensors == expected_sensors
+    print(f"  Сенсоров в /api/stats/freshness: {len(seen_sensors)} из {len(expected_sensors)} роутеров"
+          f"{'' if sensors_ok else ' — роутеры неразличимы или данные не дошли'}")
+    for label, key in (("Задержка очереди", "queue_lag"), ("Обработка сообщения", "processing")):
+        p = summary[key]
+        if p["count"]:
+            print(f"  {label}: p50 {fmt_ms(p['p50_ms'])} ms, p99 {fmt_ms(p['p99_ms'])} ms, "
+                  f"max {fmt_ms(p['max_ms'])} ms")
+    if summary["api"]:
+        print(f"  {'API':<45} {'запросов':>9} {'p50, ms':>9} {'p99, ms':>9} {'ошибок':>7}")
+        for path, p in summary["api"].items():
+            print(f"  {path:<45} {p['count']:>9,} {fmt_ms(p['p50_ms']):>9} {fmt_ms(p['p99_ms']):>9} {p['errors']:>7}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"\nРезультаты сохранены: {args.json_out}")
+    return 0 if sensors_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())